@@ -0,0 +1,271 @@
+"""Streaming extraction of uploaded project archives.
+
+The request body is pushed chunk by chunk into a bounded pipe and a worker
+thread extracts from the other end, so a tar, tar.gz or tar.zst archive is
+never held in memory. Zip archives keep their directory at the end of the
+file, so they are spooled to a temp file first and their members extracted
+in parallel. Every member path is checked against the destination root, and
+links, devices and other special entries are skipped.
+"""
+import asyncio
+import hashlib
+import os
+import queue
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PIPE_MAX_CHUNKS = 64
+COPY_BUFFER_SIZE = 1024 * 1024
+MAX_ARCHIVE_FILES = int(os.environ.get("MAX_ARCHIVE_FILES", 200_000))
+MAX_ARCHIVE_BYTES = int(os.environ.get("MAX_ARCHIVE_BYTES", 20 * 1024 ** 3))
+ZIP_WORKERS = 8
+
+class ArchiveError(Exception):
+    """Raised for archives that cannot or must not be extracted"""
+
+class StreamPipe:
+    """Bounded byte pipe: an async producer feeds chunks, a thread reads them like a file"""
+
+    def __init__(self, max_chunks=PIPE_MAX_CHUNKS):
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.buffer = b""
+        self.eof = False
+        self.closed = False
+
+    def feed(self, data):
+        """Blocking put; returns False once the reader has given up"""
+        while not self.closed:
+            try:
+                self.chunks.put(data, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def finish(self):
+        self.feed(None)
+
+    def close(self):
+        self.closed = True
+
+    def _fill(self, size):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            data = self.chunks.get()
+            if data is None:
+                self.eof = True
+            else:
+                self.buffer += data
+
+    def peek(self, size):
+        self._fill(size)
+        return self.buffer[:size]
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readable(self):
+        return True
+
+def detect_format(head, filename=None):
+    name = (filename or "").lower()
+    if head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06") or name.endswith(".zip"):
+        return "zip"
+    if head.startswith(b"\x1f\x8b"):
+        return "tar.gz"
+    if head.startswith(b"\x28\xb5\x2f\xfd"):
+        return "tar.zst"
+    if head[257:262] == b"ustar" or name.endswith(".tar"):
+        return "tar"
+    raise ArchiveError("Unsupported archive format; expected zip, tar, tar.gz or tar.zst")
+
+def safe_destination(root, member_name):
+    """Resolve an archive member inside root, or return None if it would escape"""
+    name = member_name.replace("\\", "/")
+    if name.startswith("/") or (len(name) > 1 and name[1] == ":"):
+        return None
+    parts = [p for p in name.split("/") if p not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    destination = os.path.abspath(os.path.join(root, *parts))
+    if os.path.commonpath([root, destination]) != root:
+        return None
+    return destination
+
+class ArchiveExtractor:
+    """Extracts one archive into root, reporting each file as it lands via on_file(path, size, sha256)"""
+
+    def __init__(self, root, on_file=None, max_files=MAX_ARCHIVE_FILES, max_bytes=MAX_ARCHIVE_BYTES):
+        self.root = os.path.abspath(root)
+        self.on_file = on_file
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.files = 0
+        self.bytes = 0
+        self.skipped = []
+        self.lock = threading.Lock()
+
+    def _reserve(self, size):
+        # Member readers never return more than the declared size, so
+        # checking declared sizes is enough to stop zip and tar bombs
+        with self.lock:
+            self.files += 1
+            self.bytes += size
+            if self.files > self.max_files:
+                raise ArchiveError(f"Archive has more than {self.max_files} files")
+            if self.bytes > self.max_bytes:
+                raise ArchiveError(f"Archive expands to more than {self.max_bytes} bytes")
+
+    def _check_inside(self, destination):
+        real_root = os.path.realpath(self.root)
+        if os.path.commonpath([real_root, os.path.realpath(os.path.dirname(destination))]) != real_root:
+            raise ArchiveError(f"Refusing to write outside the destination: {destination}")
+
+    def _write(self, source, destination, executable=False):
+        """Copy a member stream to destination through a temp file; returns (size, sha256)"""
+        # A symlinked directory already in the workspace must not lead outside it;
+        # check before creating anything, and again in case a link appeared meanwhile
+        self._check_inside(destination)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        self._check_inside(destination)
+        temp_path = f"{destination}.{uuid.uuid4().hex[:8]}.part"
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as f:
+                while True:
+                    data = source.read(COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    size += len(data)
+                    hasher.update(data)
+                    f.write(data)
+            if executable:
+                os.chmod(temp_path, 0o755)
+            os.replace(temp_path, destination)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return size, hasher.hexdigest()
+
+    def _landed(self, destination, size, digest):
+        if self.on_file:
+            self.on_file(destination, size, digest)
+
+    def extract_tar(self, fileobj, compression=""):
+        if compression == "zst":
+            if zstandard is None:
+                raise ArchiveError("zstd archives need the zstandard package")
+            fileobj = zstandard.ZstdDecompressor().stream_reader(fileobj)
+            compression = ""
+        try:
+            # "r|" reads the archive strictly sequentially, without seeking
+            with tarfile.open(fileobj=fileobj, mode=f"r|{compression}") as archive:
+                for member in archive:
+                    destination = safe_destination(self.root, member.name)
+                    if destination is None:
+                        self.skipped.append(member.name)
+                        continue
+                    if member.isdir():
+                        os.makedirs(destination, exist_ok=True)
+                        continue
+                    if not member.isfile():
+                        self.skipped.append(member.name)
+                        continue
+                    self._reserve(member.size)
+                    source = archive.extractfile(member)
+                    size, digest = self._write(source, destination, bool(member.mode & 0o111))
+                    self._landed(destination, size, digest)
+        except tarfile.TarError as e:
+            raise ArchiveError(f"Invalid tar archive: {str(e)}")
+
+    def extract_zip(self, path):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = archive.infolist()
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Invalid zip archive: {str(e)}")
+
+        jobs = []
+        for info in members:
+            destination = safe_destination(self.root, info.filename)
+            mode = info.external_attr >> 16
+            # Only Unix-made zips record a file type; skip symlinks and other specials
+            if destination is None or (stat.S_IFMT(mode) and not (stat.S_ISREG(mode) or stat.S_ISDIR(mode))):
+                self.skipped.append(info.filename)
+                continue
+            if info.is_dir():
+                os.makedirs(destination, exist_ok=True)
+                continue
+            self._reserve(info.file_size)
+            jobs.append((info, destination, bool(mode & 0o111)))
+
+        local = threading.local()
+
+        def extract_member(job):
+            info, destination, executable = job
+            # ZipFile handles are not safe to share between threads
+            if not hasattr(local, "archive"):
+                local.archive = zipfile.ZipFile(path)
+            with local.archive.open(info) as source:
+                size, digest = self._write(source, destination, executable)
+            self._landed(destination, size, digest)
+
+        with ThreadPoolExecutor(max_workers=ZIP_WORKERS) as pool:
+            for _ in pool.map(extract_member, jobs):
+                pass
+
+    def extract_stream(self, pipe, filename=None, spool_dir=None):
+        """Extract from a StreamPipe; returns a summary dict"""
+        started = time.time()
+        try:
+            archive_format = detect_format(pipe.peek(512), filename)
+            if archive_format == "zip":
+                with tempfile.NamedTemporaryFile(dir=spool_dir, suffix=".zip") as spool:
+                    shutil.copyfileobj(pipe, spool, COPY_BUFFER_SIZE)
+                    spool.flush()
+                    self.extract_zip(spool.name)
+            else:
+                self.extract_tar(pipe, {"tar.gz": "gz", "tar.zst": "zst"}.get(archive_format, ""))
+        finally:
+            # Unblock the producer if extraction stopped early
+            pipe.close()
+
+        return {
+            "format": archive_format,
+            "files": self.files,
+            "bytes": self.bytes,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(time.time() - started, 3)
+        }
+
+async def extract_request_stream(stream, root, filename=None, on_file=None, spool_dir=None):
+    """Extract an async byte stream (e.g. request.stream()) into root"""
+    pipe = StreamPipe()
+    extractor = ArchiveExtractor(root, on_file)
+
+    extraction = asyncio.create_task(asyncio.to_thread(extractor.extract_stream, pipe, filename, spool_dir))
+    try:
+        async for data in stream:
+            if data and not await asyncio.to_thread(pipe.feed, data):
+                break
+    finally:
+        # Always end the stream, so a dropped upload fails as a truncated archive
+        await asyncio.to_thread(pipe.finish)
+    return await extraction
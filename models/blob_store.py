@@ -0,0 +1,225 @@
+"""Content-addressed store that deduplicates workspace files across sessions.
+
+Files are keyed by SHA-256 under objects/<aa>/<digest>. Workspace files are
+never linked to their blob: every session keeps its own writable inode, and
+only the data blocks are shared, through the filesystem's copy-on-write
+extents (reflinks, as on btrfs and XFS). The first copy of some content is
+cloned into the store; later copies are deduplicated against that blob with
+FIDEDUPERANGE, which the kernel only applies while both ranges are
+byte-for-byte identical. A write racing with ingestion therefore either
+lands before the comparison (and the range is left alone) or after it (and
+goes to a fresh block), so files can be ingested from a background thread
+while shells, kernels and tools keep writing to them.
+
+Blobs are read-only cache entries. Dropping one never changes a workspace
+file, so collect() simply removes blobs that have not been used for a while.
+On filesystems without reflink support ingestion is a no-op. Servers hand
+files to submit()/submit_tree(), which queue them for one background worker
+so request handlers never wait on cloning or hashing.
+"""
+import array
+import fcntl
+import hashlib
+import os
+import queue
+import stat
+import struct
+import threading
+import time
+import uuid
+
+HASH_READ_SIZE = 1024 * 1024
+BLOB_MODE = 0o444
+# From linux/fs.h
+FICLONE = 0x40049409
+FIDEDUPERANGE = 0xC0189436
+FILE_DEDUPE_RANGE_SAME = 0
+# Filesystems cap a single dedupe request; larger files are done in steps
+DEDUPE_STEP = 16 * 1024 * 1024
+DEDUPE_RANGE = struct.Struct("=QQHHI")
+DEDUPE_RANGE_INFO = struct.Struct("=qQQiI")
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(HASH_READ_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+def clone_file(source, destination):
+    """Create destination as a reflink copy of source; OSError if unsupported"""
+    with open(source, "rb") as src, open(destination, "xb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def dedupe_file(source, destination, size):
+    """Share source's blocks with destination where the contents are identical.
+
+    Returns the number of bytes deduplicated; stops at the first range that
+    differs.
+    """
+    deduped = 0
+    with open(source, "rb") as src, open(destination, "rb+") as dst:
+        offset = 0
+        while offset < size:
+            length = min(DEDUPE_STEP, size - offset)
+            request = array.array("B", DEDUPE_RANGE.pack(offset, length, 1, 0, 0)
+                                  + DEDUPE_RANGE_INFO.pack(dst.fileno(), offset, 0, 0, 0))
+            fcntl.ioctl(src.fileno(), FIDEDUPERANGE, request)
+            _, _, done, status, _ = DEDUPE_RANGE_INFO.unpack_from(request, DEDUPE_RANGE.size)
+            if status != FILE_DEDUPE_RANGE_SAME or done == 0:
+                break
+            deduped += done
+            offset += done
+    return deduped
+
+class BlobStore:
+    def __init__(self, root, min_size=1, max_age=7 * 24 * 3600):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.min_size = min_size
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.counters = {"files_ingested": 0, "blobs_created": 0, "deduped_bytes": 0}
+        self.pending = queue.Queue()
+        self.worker = None
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # Clones left behind by an interrupted ingest
+        for name in os.listdir(self.objects_dir):
+            if name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.objects_dir, name))
+                except OSError:
+                    pass
+
+    def _iter_blobs(self):
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                yield key, os.path.join(prefix_dir, key)
+
+    def blob_path(self, key):
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def _add_blob(self, path, digest):
+        """Clone path into the store; returns the digest of what was stored"""
+        temp_path = os.path.join(self.objects_dir, f"{uuid.uuid4().hex}.tmp")
+        try:
+            clone_file(path, temp_path)
+            # Hash the clone, not the workspace file, which may have changed since
+            # the caller hashed it
+            actual = hash_file(temp_path)
+            os.chmod(temp_path, BLOB_MODE)
+            blob = self.blob_path(actual)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            with self.lock:
+                if not os.path.exists(blob):
+                    os.replace(temp_path, blob)
+                    self.counters["blobs_created"] += 1
+            return actual
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def ingest(self, path, digest=None):
+        """Share path's blocks with its blob; returns the digest or None if skipped"""
+        try:
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode) or st.st_size < self.min_size:
+                return None
+            digest = digest or hash_file(path)
+            blob = self.blob_path(digest)
+            if not os.path.exists(blob):
+                # First copy of this content: its blocks are already shared with the new blob
+                digest = self._add_blob(path, digest)
+                deduped = st.st_size
+            else:
+                deduped = dedupe_file(blob, path, st.st_size)
+                if not deduped:
+                    return None
+                # Recently used blobs survive collect()
+                os.utime(blob)
+            with self.lock:
+                self.counters["files_ingested"] += 1
+                self.counters["deduped_bytes"] += deduped
+            return digest
+        except OSError:
+            # No reflink support, different filesystem, file vanished: keep the private copy
+            return None
+
+    def ingest_tree(self, directory, skip_dirs=(".git",)):
+        """Ingest every regular file under directory; returns (files ingested, bytes shared)"""
+        ingested = shared = 0
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d not in skip_dirs]
+            for name in files:
+                path = os.path.join(root, name)
+                if self.ingest(path):
+                    ingested += 1
+                    try:
+                        shared += os.lstat(path).st_size
+                    except OSError:
+                        continue
+        return ingested, shared
+
+    def submit(self, path, digest=None):
+        """Queue one file for ingestion on the background worker"""
+        self._enqueue((self.ingest, path, digest))
+
+    def submit_tree(self, directory):
+        """Queue a whole directory for ingestion on the background worker"""
+        self._enqueue((self.ingest_tree, directory))
+
+    def _enqueue(self, job):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._work, daemon=True)
+                self.worker.start()
+        self.pending.put(job)
+
+    def _work(self):
+        while True:
+            function, *args = self.pending.get()
+            try:
+                function(*args)
+            except Exception:
+                # ingest() already keeps private copies on OSError; never let the worker die
+                pass
+
+    def collect(self):
+        """Delete blobs that have not been cloned or deduplicated against for max_age seconds"""
+        removed = freed = 0
+        cutoff = time.time() - self.max_age
+        with self.lock:
+            for _, path in list(self._iter_blobs()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+                    freed += st.st_size
+        return {"removed": removed, "freed_bytes": freed}
+
+    def stats(self):
+        blobs = stored = 0
+        for _, path in self._iter_blobs():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            blobs += 1
+            stored += st.st_size
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            "blobs": blobs,
+            "stored_bytes": stored,
+            "queued": self.pending.qsize(),
+            **counters
+        }
@@ -20,6 +20,19 @@ import logging
 import tiktoken
 import time
 import re
+import threading
+import queue
+import select
+import signal
+import struct
+import base64
+import hashlib
+import mmap
+from array import array
+from itertools import accumulate
+import fnmatch
+from collections import deque, OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -29,6 +42,20 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.document_loaders import TextLoader, DirectoryLoader
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import LLMChainExtractor
+from workspace_walker import walk_workspace, filter_paths
+from chunked_uploads import ChunkedUploadStore, UploadError, save_upload_file
+from blob_store import BlobStore
+from archive_extract import ArchiveError, extract_request_stream
+import session_snapshots
+from patch_apply import PatchError, parse_unified_diff, apply_hunks, apply_line_edits, write_atomically, sha256_bytes
+
+# PTY support is only available on POSIX systems
+try:
+    import pty
+    import fcntl
+    import termios
+except ImportError:
+    pty = None
 
 # Load environment variables
 load_dotenv()
@@ -73,6 +100,9 @@ class WorkspaceInfo(BaseModel):
     current_directory: str
     available_files: List[Dict[str, Any]]
     directories: List[Dict[str, Any]]
+    total_files: int = 0
+    total_directories: int = 0
+    next_cursor: Optional[str] = None
     
 class UploadResponse(BaseModel):
     success: bool
@@ -112,12 +142,35 @@ class ExecuteCommandRequest(BaseModel):
     session_id: str
     working_dir: Optional[str] = None
     timeout: Optional[int] = 30
+    persistent: Optional[bool] = False
+    limits: Optional[Dict[str, Any]] = None
+
+class ExecutePythonRequest(BaseModel):
+    code: str
+    session_id: str
+    timeout: Optional[int] = 30
+    reset: Optional[bool] = False
+
+class ApplyPatchRequest(BaseModel):
+    session_id: str
+    patch: Optional[str] = None
+    edits: Optional[List[Dict[str, Any]]] = None
+    expected_hashes: Optional[Dict[str, str]] = None
+    dry_run: Optional[bool] = False
 
 class GitHubCloneRequest(BaseModel):
     repository_url: str
     session_id: str
     directory_name: Optional[str] = None
     branch: Optional[str] = None
+    depth: Optional[int] = None
+    filter_blobs: Optional[bool] = False
+
+class ChunkedUploadRequest(BaseModel):
+    session_id: str
+    path: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
 
 class ModelConfig(BaseModel):
     name: str
@@ -150,15 +203,49 @@ os.makedirs(WORKSPACE_ROOT, exist_ok=True)
 VECTOR_DB_DIR = os.path.join(os.getcwd(), "vectordb")
 os.makedirs(VECTOR_DB_DIR, exist_ok=True)
 
+# Staging area for resumable chunked uploads
+UPLOAD_STAGING_DIR = os.path.join(os.getcwd(), "upload_staging")
+upload_store = ChunkedUploadStore(UPLOAD_STAGING_DIR)
+
+# Content-addressed store that deduplicates identical files across sessions
+BLOB_STORE_DIR = os.path.join(os.getcwd(), "blob_store")
+BLOB_GC_INTERVAL = int(os.environ.get("BLOB_GC_INTERVAL", 600))
+blob_store = BlobStore(BLOB_STORE_DIR)
+
 # Cache for embedding models
 embedding_models = {}
 
+# Parked sessions: snapshots can live on slower, larger storage than the workspace
+SNAPSHOT_DIR = os.environ.get("SESSION_SNAPSHOT_DIR", os.path.join(os.getcwd(), "snapshots"))
+os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+SESSION_COLD_SECONDS = int(os.environ.get("SESSION_COLD_SECONDS", 3600))
+SESSION_EVICT_INTERVAL = int(os.environ.get("SESSION_EVICT_INTERVAL", 300))
+# Session fields that are persisted in snapshots (the vector store is reloaded from disk)
+SNAPSHOT_SESSION_KEYS = ("messages", "context", "tools_history", "project_structure")
+# One lock per parked session, so restoring or snapshotting a session never waits on another
+session_locks = {}
+session_locks_guard = threading.Lock()
+
+def session_lock(session_id):
+    with session_locks_guard:
+        return session_locks.setdefault(session_id, threading.RLock())
+
 # Session management
 def get_or_create_session(session_id: Optional[str] = None):
     """Get existing session or create a new one"""
     if not session_id:
         session_id = str(uuid.uuid4())
     
+    # Parked sessions are restored the first time they are used again; only
+    # sessions that have a snapshot take a lock
+    if session_id not in sessions and session_snapshots.find_snapshot(SNAPSHOT_DIR, session_id):
+        with session_lock(session_id):
+            if session_id not in sessions:
+                try:
+                    restore_session(session_id)
+                except Exception as e:
+                    logger.error(f"Error restoring session {session_id}: {str(e)}")
+    
     if session_id not in sessions:
         # Create a session-specific workspace folder
         session_workspace = os.path.join(WORKSPACE_ROOT, session_id)
@@ -195,20 +282,192 @@ def get_or_create_session(session_id: Optional[str] = None):
     
     return session_id, sessions[session_id]
 
+async def get_or_create_session_async(session_id: Optional[str] = None):
+    """get_or_create_session for async handlers; a snapshot restore runs off the event loop"""
+    if session_id and session_id not in sessions:
+        return await asyncio.to_thread(get_or_create_session, session_id)
+    return get_or_create_session(session_id)
+
+def snapshot_session(session_id, evict=False):
+    """Pack a session's workspace, vector index and metadata into one compressed archive.
+    
+    With evict=True the session is also dropped from memory and its
+    directories removed; it is restored on next access.
+    """
+    with session_lock(session_id):
+        session = sessions.get(session_id)
+        if session is None:
+            return {"success": False, "error": f"Session {session_id} is not loaded"}
+        
+        workspace = session["context"]["workspace_root"]
+        vector_db = session["context"]["vector_db_path"]
+        metadata = {key: session.get(key) for key in SNAPSHOT_SESSION_KEYS}
+        metadata.update({"session_id": session_id, "snapshot_at": datetime.now().isoformat(), "evicted": evict})
+        
+        started = time.time()
+        path = os.path.join(SNAPSHOT_DIR, session_id + session_snapshots.snapshot_extension())
+        for stale in session_snapshots.SNAPSHOT_EXTENSIONS:
+            if os.path.exists(os.path.join(SNAPSHOT_DIR, session_id + stale)) and not path.endswith(stale):
+                os.remove(os.path.join(SNAPSHOT_DIR, session_id + stale))
+        size = session_snapshots.write_snapshot(path, metadata, {"workspace": workspace, "vectordb": vector_db})
+        
+        if evict:
+            kernel_pool.shutdown_session(session_id)
+            shell_manager.close(session_id)
+            del sessions[session_id]
+            shutil.rmtree(workspace, ignore_errors=True)
+            shutil.rmtree(vector_db, ignore_errors=True)
+    
+    return {
+        "success": True,
+        "snapshot": path,
+        "size": size,
+        "evicted": evict,
+        "elapsed_seconds": round(time.time() - started, 3)
+    }
+
+def restore_session(session_id):
+    """Load a parked session from its snapshot"""
+    path = session_snapshots.find_snapshot(SNAPSHOT_DIR, session_id)
+    if not path:
+        return {"success": False, "error": f"No snapshot for session {session_id}"}
+    
+    started = time.time()
+    workspace = os.path.join(WORKSPACE_ROOT, session_id)
+    vector_db = os.path.join(VECTOR_DB_DIR, session_id)
+    
+    with session_lock(session_id):
+        if session_id in sessions:
+            return {"success": True, "session_id": session_id, "elapsed_seconds": 0.0}
+        if os.path.isdir(workspace) and os.listdir(workspace):
+            # Files were never evicted (e.g. after a restart); only metadata is needed
+            metadata = session_snapshots.read_metadata(path)
+        else:
+            metadata = session_snapshots.extract_snapshot(
+                path, {"workspace": workspace, "vectordb": vector_db}, UPLOAD_STAGING_DIR
+            )
+            # Re-share restored files with the rest of the node
+            blob_store.submit_tree(workspace)
+        
+        session = {key: metadata.get(key) or default for key, default in
+                   (("messages", []), ("context", {}), ("tools_history", []), ("project_structure", {}))}
+        session["context"].update({
+            "current_directory": workspace,
+            "workspace_root": workspace,
+            "vector_db_path": vector_db
+        })
+        session["vector_store"] = None
+        sessions[session_id] = session
+        
+        # Snapshots written by eviction are consumed; explicit ones are kept
+        if metadata.get("evicted"):
+            os.remove(path)
+    
+    logger.info(f"Restored session {session_id} in {time.time() - started:.2f}s")
+    return {"success": True, "session_id": session_id, "elapsed_seconds": round(time.time() - started, 3)}
+
+def evict_cold_sessions(max_idle=SESSION_COLD_SECONDS):
+    """Park sessions idle for longer than max_idle, unless a terminal is attached"""
+    evicted = []
+    cutoff = datetime.now().timestamp() - max_idle
+    for session_id, session in list(sessions.items()):
+        context = session.get("context", {})
+        try:
+            last_activity = datetime.fromisoformat(context.get("last_activity")).timestamp()
+        except (TypeError, ValueError):
+            continue
+        if last_activity > cutoff or shell_manager.get(session_id):
+            continue
+        if not context.get("archive_indexing", {}).get("done", True):
+            continue
+        try:
+            snapshot_session(session_id, evict=True)
+            evicted.append(session_id)
+        except Exception as e:
+            logger.error(f"Error evicting session {session_id}: {str(e)}")
+    if evicted:
+        logger.info(f"Parked {len(evicted)} cold sessions")
+    return evicted
+
 # File utilities
-def get_file_info(file_path):
+# Extensions classified without opening the file
+TEXT_EXTENSIONS = {
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.java', '.c', '.cpp', '.h', '.hpp',
+    '.cs', '.go', '.rs', '.rb', '.php', '.swift', '.kt', '.scala', '.md', '.json', '.yml',
+    '.yaml', '.sh', '.sql', '.txt', '.toml', '.ini', '.cfg', '.xml', '.csv', '.env', '.lock',
+}
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.pdf', '.zip', '.gz', '.tgz', '.zst',
+    '.tar', '.7z', '.so', '.dll', '.exe', '.bin', '.pyc', '.class', '.jar', '.whl', '.blend',
+    '.woff', '.woff2', '.ttf', '.otf', '.mp3', '.mp4', '.mov', '.wav', '.sqlite', '.db',
+}
+
+# Stat-derived metadata keyed by (device, inode, mtime, size); entries are
+# reused until the file changes
+FILE_METADATA_CACHE_SIZE = 50000
+file_metadata_cache = OrderedDict()
+file_metadata_lock = threading.Lock()
+
+DEFAULT_LISTING_PAGE_SIZE = 1000
+
+def _metadata_key(stats):
+    return (stats.st_dev, stats.st_ino, stats.st_mtime_ns, stats.st_size)
+
+def get_file_info(file_path, stats=None, classify=True):
     """Get detailed information about a file"""
-    stats = os.stat(file_path)
+    if stats is None:
+        stats = os.stat(file_path)
+    key = _metadata_key(stats)
+    
+    with file_metadata_lock:
+        cached = file_metadata_cache.get(key)
+        if cached is not None:
+            file_metadata_cache.move_to_end(key)
+    
+    # Only what depends on the inode is cached; hardlinks and renames keep the
+    # inode but not the name, so the extension is derived from the path every time
+    if cached is None:
+        cached = {
+            "size": stats.st_size,
+            "created": datetime.fromtimestamp(stats.st_ctime).isoformat(),
+            "modified": datetime.fromtimestamp(stats.st_mtime).isoformat(),
+            "content_binary": None,
+        }
+    extension = os.path.splitext(file_path)[1].lower()
+    is_binary = None
+    if classify:
+        if extension in TEXT_EXTENSIONS or extension in BINARY_EXTENSIONS:
+            is_binary = extension in BINARY_EXTENSIONS
+        else:
+            if cached["content_binary"] is None:
+                cached["content_binary"] = is_binary_file(file_path)
+            is_binary = cached["content_binary"]
+    
+    with file_metadata_lock:
+        file_metadata_cache[key] = cached
+        if len(file_metadata_cache) > FILE_METADATA_CACHE_SIZE:
+            file_metadata_cache.popitem(last=False)
+    
     return {
         "path": file_path,
         "name": os.path.basename(file_path),
-        "size": stats.st_size,
-        "created": datetime.fromtimestamp(stats.st_ctime).isoformat(),
-        "modified": datetime.fromtimestamp(stats.st_mtime).isoformat(),
-        "is_binary": is_binary_file(file_path),
-        "extension": os.path.splitext(file_path)[1].lower(),
+        "size": cached["size"],
+        "created": cached["created"],
+        "modified": cached["modified"],
+        "extension": extension,
+        "is_binary": is_binary,
     }
 
+def classify_binary(file_path, extension=None):
+    """Classify a file as binary, using its extension before sniffing content"""
+    if extension is None:
+        extension = os.path.splitext(file_path)[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        return False
+    if extension in BINARY_EXTENSIONS:
+        return True
+    return is_binary_file(file_path)
+
 def is_binary_file(file_path):
     """Check if a file is binary"""
     try:
@@ -218,6 +477,77 @@ def is_binary_file(file_path):
     except UnicodeDecodeError:
         return True
 
+def encode_listing_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_listing_cursor(cursor):
+    return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode()).decode()))
+
+def scan_directory(directory, sort_by="name", reverse=False, cursor=None, limit=None, classify=False):
+    """List a directory with a single scandir pass, sorted and paginated.
+    
+    Directories always come before files. The cursor is the sort key of the
+    last entry returned, so pages stay consistent while files are added.
+    """
+    sort_fields = {
+        "name": lambda e: e["name"].lower(),
+        "size": lambda e: e.get("size", 0),
+        "modified": lambda e: e["modified"],
+    }
+    if sort_by not in sort_fields:
+        raise ValueError(f"Unsupported sort field: {sort_by}")
+    sort_field = sort_fields[sort_by]
+    
+    directories = []
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    stats = entry.stat()
+                    directories.append({
+                        "name": entry.name,
+                        "path": entry.path,
+                        "modified": datetime.fromtimestamp(stats.st_mtime).isoformat()
+                    })
+                else:
+                    files.append(get_file_info(entry.path, entry.stat(), classify=classify))
+            except FileNotFoundError:
+                # Removed while we were listing
+                continue
+    
+    # One ordering across both groups so a single cursor can page through them
+    entry_key = lambda entry: (sort_field(entry), entry["name"])
+    directories.sort(key=entry_key, reverse=reverse)
+    files.sort(key=entry_key, reverse=reverse)
+    ordered = [(0, e) for e in directories] + [(1, e) for e in files]
+    sort_key = lambda item: (item[0], *entry_key(item[1]))
+    
+    if cursor:
+        after_group, *after_key = decode_listing_cursor(cursor)
+        after_key = tuple(after_key)
+        
+        def is_after(item):
+            if item[0] != after_group:
+                return item[0] > after_group
+            key = entry_key(item[1])
+            return key < after_key if reverse else key > after_key
+        
+        ordered = [item for item in ordered if is_after(item)]
+    
+    next_cursor = None
+    if limit is not None and len(ordered) > limit:
+        ordered = ordered[:limit]
+        next_cursor = encode_listing_cursor(sort_key(ordered[-1]))
+    
+    return {
+        "directories": [e for group, e in ordered if group == 0],
+        "files": [e for group, e in ordered if group == 1],
+        "total_directories": len(directories),
+        "total_files": len(files),
+        "next_cursor": next_cursor
+    }
+
 def get_file_language(file_path):
     """Determine the programming language of a file based on extension"""
     ext = os.path.splitext(file_path)[1].lower()
@@ -249,6 +579,143 @@ def get_file_language(file_path):
     }
     return language_map.get(ext, 'plaintext')
 
+# Ranged reads: files above READ_FILE_MAX_BYTES are previewed instead of
+# returned whole, and explicit ranges are capped at READ_RANGE_MAX_BYTES
+READ_FILE_MAX_BYTES = int(os.environ.get("READ_FILE_MAX_BYTES", 256 * 1024))
+READ_RANGE_MAX_BYTES = int(os.environ.get("READ_RANGE_MAX_BYTES", 1024 * 1024))
+READ_PREVIEW_LINES = 40
+LINE_INDEX_CACHE_SIZE = 64
+LINE_INDEX_SCAN_BLOCK = 1024 * 1024
+line_index_cache = OrderedDict()
+line_index_lock = threading.Lock()
+
+class LineIndex:
+    """Byte offsets of line starts, extended lazily as far as callers need"""
+    
+    def __init__(self):
+        self.offsets = array("Q", [0])
+        self.scanned_to = 0
+        self.complete = False
+        self.lock = threading.Lock()
+    
+    def ensure(self, data, line_count):
+        """Scan forward until line_count lines are indexed or the file ends"""
+        with self.lock:
+            size = len(data)
+            while not self.complete and len(self.offsets) <= line_count:
+                # Whole blocks at a time; the arithmetic stays in C iterators
+                block_end = min(self.scanned_to + LINE_INDEX_SCAN_BLOCK, size)
+                lines = data[self.scanned_to:block_end].split(b"\n")
+                starts = accumulate(map((1).__add__, map(len, lines[:-1])), initial=self.scanned_to)
+                next(starts)
+                self.offsets.extend(starts)
+                self.scanned_to = block_end - len(lines[-1])
+                if block_end == size:
+                    self.complete = True
+                    if self.offsets[-1] == size and len(self.offsets) > 1:
+                        # A final newline ends the last line rather than starting another
+                        self.offsets.pop()
+                elif len(lines) == 1:
+                    # A single line longer than the block: keep scanning from its start
+                    self.scanned_to = block_end
+    
+    def line_range(self, data, start_line, end_line):
+        """Byte range for 1-based inclusive lines; end_line may be None for end of file"""
+        self.ensure(data, end_line if end_line is not None else start_line)
+        if start_line > len(self.offsets):
+            return len(data), len(data)
+        start = self.offsets[start_line - 1]
+        if end_line is None or end_line >= len(self.offsets):
+            return start, len(data)
+        return start, self.offsets[end_line]
+
+def get_line_index(stats):
+    key = _metadata_key(stats)
+    with line_index_lock:
+        index = line_index_cache.get(key)
+        if index is None:
+            index = line_index_cache[key] = LineIndex()
+            if len(line_index_cache) > LINE_INDEX_CACHE_SIZE:
+                line_index_cache.popitem(last=False)
+        else:
+            line_index_cache.move_to_end(key)
+    return index
+
+def tail_range(data, lines):
+    """Byte offset where the last `lines` lines start, found by scanning backwards"""
+    end = len(data)
+    # A trailing newline terminates the last line rather than starting a new one
+    position = end - 1 if end and data[end - 1:end] == b"\n" else end
+    for _ in range(lines):
+        newline = data.rfind(b"\n", 0, position)
+        if newline == -1:
+            return 0
+        position = newline
+    return position + 1
+
+def read_file_range(file_path, offset=None, length=None, start_line=None, end_line=None, tail=None):
+    """Read part of a file through mmap, touching only the pages that are returned.
+    
+    Exactly one selection applies: byte offset/length, start_line/end_line,
+    the last `tail` lines, or, with none of them, the whole file if small and
+    a head/tail preview otherwise.
+    """
+    stats = os.stat(file_path)
+    size = stats.st_size
+    result = {"size": size, "truncated": False}
+    
+    with open(file_path, "rb") as f:
+        if size == 0:
+            data = b""
+        else:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if offset is not None or length is not None:
+                start = min(max(offset or 0, 0), size)
+                end = min(start + min(length if length is not None else READ_RANGE_MAX_BYTES, READ_RANGE_MAX_BYTES), size)
+                result.update({"mode": "bytes", "offset": start, "length": end - start,
+                               "next_offset": end if end < size else None})
+            elif start_line is not None or end_line is not None:
+                start_line = max(start_line or 1, 1)
+                if end_line is not None and end_line < start_line:
+                    raise ValueError("end_line must not be before start_line")
+                start, end = get_line_index(stats).line_range(data, start_line, end_line)
+                if end - start > READ_RANGE_MAX_BYTES:
+                    # Cut at the last whole line that fits
+                    end = data.rfind(b"\n", start, start + READ_RANGE_MAX_BYTES) + 1 or start + READ_RANGE_MAX_BYTES
+                    result["truncated"] = True
+                chunk = data[start:end]
+                lines_read = chunk.count(b"\n") + (1 if chunk and not chunk.endswith(b"\n") else 0)
+                result.update({"mode": "lines", "start_line": start_line, "end_line": start_line + lines_read - 1,
+                               "offset": start, "length": end - start})
+                return {**result, "content": chunk.decode("utf-8", errors="replace")}
+            elif tail is not None:
+                start = max(tail_range(data, max(tail, 1)), size - READ_RANGE_MAX_BYTES)
+                end = size
+                result.update({"mode": "tail", "lines": tail, "offset": start, "length": end - start})
+            elif size <= READ_FILE_MAX_BYTES:
+                result["mode"] = "full"
+                return {**result, "content": data[:].decode("utf-8", errors="replace")}
+            else:
+                # Too big to return whole: show both ends and how to ask for more
+                head_end = get_line_index(stats).line_range(data, 1, READ_PREVIEW_LINES)[1]
+                head_end = min(head_end, READ_FILE_MAX_BYTES // 2)
+                tail_start = max(tail_range(data, READ_PREVIEW_LINES), size - READ_FILE_MAX_BYTES // 2, head_end)
+                head = data[:head_end].decode("utf-8", errors="replace")
+                tail_text = data[tail_start:].decode("utf-8", errors="replace")
+                omitted = tail_start - head_end
+                marker = (f"\n... [{omitted} bytes omitted; read more with start_line/end_line, "
+                          f"offset/length or tail] ...\n")
+                return {**result, "mode": "preview", "truncated": True, "omitted_bytes": omitted,
+                        "content": head + marker + tail_text}
+            
+            content = data[start:end].decode("utf-8", errors="replace")
+        finally:
+            if size:
+                data.close()
+    
+    return {**result, "content": content}
+
 def count_tokens(text, model="gpt-4"):
     """Count the number of tokens in the text"""
     try:
@@ -278,17 +745,34 @@ def index_files(session_id, file_paths=None):
     _, session = get_or_create_session(session_id)
     workspace_root = session["context"]["workspace_root"]
     
+    # Only text files survive the walk; ignored, oversized and generated files are skipped
+    text_only = lambda path, stats: not classify_binary(path)
+    
     # If no files specified, index all text files in workspace
     if not file_paths:
-        files_to_index = []
-        for root, _, files in os.walk(workspace_root):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if not is_binary_file(file_path):
-                    files_to_index.append(file_path)
+        files_to_index = [entry.path for entry in walk_workspace(workspace_root, file_filter=text_only)]
     else:
-        files_to_index = [os.path.join(workspace_root, f) if not os.path.isabs(f) else f 
-                          for f in file_paths]
+        files_to_index = []
+        explicit = []
+        for f in file_paths:
+            path = os.path.join(workspace_root, f) if not os.path.isabs(f) else f
+            if os.path.isdir(path):
+                files_to_index.extend(entry.path for entry in walk_workspace(path, file_filter=text_only))
+            elif glob.has_magic(path):
+                # Walk the non-wildcard prefix and filter, so "repo/**/*" stays ignore-aware
+                base = path
+                while glob.has_magic(base):
+                    base = os.path.dirname(base)
+                # "**/" may also match zero directories
+                patterns = {path, path.replace("/**/", "/")}
+                files_to_index.extend(
+                    entry.path for entry in walk_workspace(base, file_filter=text_only)
+                    if any(fnmatch.fnmatch(entry.path, p) for p in patterns)
+                )
+            else:
+                explicit.append(path)
+        # Named files get the same ignore, size and generated-file rules as a walk
+        files_to_index.extend(entry.path for entry in filter_paths(workspace_root, explicit, file_filter=text_only))
     
     # Skip if no files to index
     if not files_to_index:
@@ -306,7 +790,7 @@ def index_files(session_id, file_paths=None):
         documents = []
         for file_path in files_to_index:
             try:
-                if os.path.exists(file_path) and not is_binary_file(file_path):
+                if os.path.exists(file_path) and not classify_binary(file_path):
                     with open(file_path, 'r', encoding='utf-8') as f:
                         content = f.read()
                     
@@ -337,18 +821,61 @@ def index_files(session_id, file_paths=None):
         
         # Save to session
         session["vector_store"] = vector_store
-        session["context"]["indexed_files"] = [os.path.relpath(f, workspace_root) for f in files_to_index]
+        # The vector store accumulates across calls, and so does the list of what it holds
+        indexed = [os.path.relpath(f, workspace_root) for f in files_to_index]
+        previous = session["context"].get("indexed_files") or []
+        session["context"]["indexed_files"] = list(dict.fromkeys(previous + indexed))
         session["context"]["last_indexed"] = datetime.now().isoformat()
         
         return {
             "success": True,
             "message": f"Indexed {len(files_to_index)} files with {len(documents)} chunks",
-            "files": session["context"]["indexed_files"]
+            "files": indexed
         }
     except Exception as e:
         logger.error(f"Error indexing files: {str(e)}")
         return {"success": False, "error": f"Error indexing files: {str(e)}"}
 
+INDEX_BATCH_SIZE = 256
+
+class StreamingIndexer:
+    """Indexes files in batches on a background thread while more are still arriving"""
+    
+    def __init__(self, session_id, batch_size=INDEX_BATCH_SIZE):
+        self.session_id = session_id
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.status = {"queued": 0, "indexed_batches": 0, "failed_batches": 0, "done": False}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def add(self, path):
+        self.status["queued"] += 1
+        self.queue.put(path)
+    
+    def close(self):
+        self.queue.put(None)
+    
+    def _run(self):
+        finished = False
+        while not finished:
+            batch = []
+            # Index a batch when it is full or the producer pauses
+            while len(batch) < self.batch_size:
+                try:
+                    path = self.queue.get(timeout=0.5 if batch else None)
+                except queue.Empty:
+                    break
+                if path is None:
+                    finished = True
+                    break
+                batch.append(path)
+            if batch:
+                result = index_files(self.session_id, batch)
+                key = "indexed_batches" if result.get("success") else "failed_batches"
+                self.status[key] += 1
+        self.status["done"] = True
+
 def search_code(session_id, query, top_k=5):
     """Search for code using vector similarity"""
     _, session = get_or_create_session(session_id)
@@ -389,11 +916,863 @@ def search_code(session_id, query, top_k=5):
         logger.error(f"Error searching code: {str(e)}")
         return {"success": False, "error": f"Error searching code: {str(e)}"}
 
+# Persistent shell sessions
+SHELL_IDLE_TIMEOUT = int(os.environ.get("SHELL_IDLE_TIMEOUT", 900))
+MAX_SHELL_SESSIONS = int(os.environ.get("MAX_SHELL_SESSIONS", 32))
+SHELL_SCROLLBACK_BYTES = 64 * 1024
+# Seconds a closed shell gets to exit on SIGHUP before it is killed
+SHELL_CLOSE_GRACE = 2.0
+
+# Per-session shell history lives outside the workspace so it is never indexed
+SHELL_HISTORY_DIR = os.path.join(os.getcwd(), "shell_history")
+os.makedirs(SHELL_HISTORY_DIR, exist_ok=True)
+
+class ShellSession:
+    """A long-lived interactive shell attached to a pseudo-terminal"""
+
+    def __init__(self, session_id, cwd, rows=24, cols=80):
+        self.session_id = session_id
+        self.cwd = cwd
+        self.created_at = time.time()
+        self.last_activity = time.time()
+        self.closed = False
+        self.scrollback = deque()
+        self.scrollback_size = 0
+        self.listeners = set()
+        self.lock = threading.Lock()
+        self.run_lock = threading.Lock()
+
+        shell = os.environ.get("SHELL", "/bin/bash")
+        env = dict(os.environ, TERM="xterm-256color", PS1="$ ", HISTFILE=os.path.join(SHELL_HISTORY_DIR, session_id))
+
+        pid, fd = pty.fork()
+        if pid == 0:
+            # Child: replace ourselves with the shell inside the workspace
+            try:
+                os.chdir(cwd)
+                os.execvpe(shell, [shell, "-i"], env)
+            finally:
+                os._exit(1)
+
+        self.pid = pid
+        self.fd = fd
+        self.resize(rows, cols)
+
+        self.reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader.start()
+
+    def _read_loop(self):
+        """Pump PTY output into the scrollback buffer and all listeners"""
+        while not self.closed:
+            try:
+                ready, _, _ = select.select([self.fd], [], [], 1.0)
+                if not ready:
+                    continue
+                data = os.read(self.fd, 65536)
+            except OSError:
+                data = b""
+            if not data:
+                # EOF/EIO means the shell has exited
+                self.closed = True
+                break
+
+            with self.lock:
+                self.scrollback.append(data)
+                self.scrollback_size += len(data)
+                while self.scrollback_size > SHELL_SCROLLBACK_BYTES and len(self.scrollback) > 1:
+                    self.scrollback_size -= len(self.scrollback.popleft())
+                listeners = list(self.listeners)
+
+            for listener in listeners:
+                try:
+                    listener(data)
+                except Exception as e:
+                    logger.warning(f"Shell listener error for {self.session_id}: {str(e)}")
+
+        for listener in list(self.listeners):
+            try:
+                listener(None)
+            except Exception:
+                pass
+
+    def add_listener(self, listener):
+        """Register a callback receiving raw output bytes (None on exit); returns scrollback"""
+        with self.lock:
+            self.listeners.add(listener)
+            return b"".join(self.scrollback)
+
+    def remove_listener(self, listener):
+        with self.lock:
+            self.listeners.discard(listener)
+
+    def write(self, data):
+        """Send raw input to the shell"""
+        if self.closed:
+            raise RuntimeError("Shell session has exited")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.last_activity = time.time()
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    def resize(self, rows, cols):
+        """Update the terminal window size"""
+        fcntl.ioctl(self.fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    def run(self, command, timeout=30):
+        """Run a command in the shell and capture its output and exit code"""
+        token = uuid.uuid4().hex[:12]
+        begin_marker = f"__SHELL_BEGIN_{token}__"
+        done_pattern = re.compile(rf"__SHELL_DONE_{token}_(\d+)__")
+        output = bytearray()
+        finished = threading.Event()
+
+        def collect(data):
+            if data is None:
+                finished.set()
+                return
+            output.extend(data)
+            if done_pattern.search(output.decode("utf-8", errors="replace")):
+                finished.set()
+
+        # Markers are split in the command line so the terminal echo never matches them;
+        # eval keeps cd/export/source effects in the shell for later commands
+        wrapped = (
+            f"printf '%s\\n' '__SHELL_BEGIN_''{token}__'; eval {shlex.quote(command)}; "
+            f"printf '\\n%s_%s__\\n' '__SHELL_DONE_''{token}' \"$?\"\n"
+        )
+
+        with self.run_lock:
+            started = time.time()
+            self.add_listener(collect)
+            try:
+                self.write(wrapped)
+                completed = finished.wait(timeout)
+            finally:
+                self.remove_listener(collect)
+
+            text = output.decode("utf-8", errors="replace").replace("\r\n", "\n")
+            done = done_pattern.search(text)
+
+            if not completed or not done:
+                if self.closed:
+                    return {"success": False, "error": "Shell exited while running command", "command": command}
+                # Interrupt the foreground job but keep the shell alive
+                self.write("\x03")
+                return {
+                    "success": False,
+                    "error": f"Command timed out after {timeout} seconds",
+                    "command": command
+                }
+
+            start = text.find(begin_marker)
+            stdout = text[start + len(begin_marker):done.start()] if start != -1 else text[:done.start()]
+            exit_code = int(done.group(1))
+            return {
+                "success": exit_code == 0,
+                "exit_code": exit_code,
+                "stdout": stdout.strip("\n"),
+                "stderr": "",
+                "command": command,
+                "duration": round(time.time() - started, 4),
+                "persistent": True
+            }
+
+    def close(self):
+        """Terminate the shell process and release the PTY"""
+        self.closed = True
+        try:
+            os.killpg(self.pid, signal.SIGHUP)
+        except OSError:
+            pass
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        # Reaped in the background so callers on the event loop never wait on it
+        threading.Thread(target=self._reap, daemon=True).start()
+
+    def _reap(self):
+        """Wait for the shell to exit, killing its process group after SHELL_CLOSE_GRACE"""
+        deadline = time.time() + SHELL_CLOSE_GRACE
+        try:
+            while not os.waitpid(self.pid, os.WNOHANG)[0]:
+                if time.time() >= deadline:
+                    try:
+                        os.killpg(self.pid, signal.SIGKILL)
+                    except OSError:
+                        pass
+                    os.waitpid(self.pid, 0)
+                    return
+                time.sleep(0.05)
+        except ChildProcessError:
+            pass
+
+class ShellSessionManager:
+    """Keeps one PTY shell per session, capped per node and reaped when idle"""
+
+    def __init__(self, max_sessions=MAX_SHELL_SESSIONS, idle_timeout=SHELL_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.shells = {}
+        self.lock = threading.Lock()
+
+    def get_or_create(self, session_id, cwd):
+        """Return the live shell for a session, spawning one if needed"""
+        if pty is None:
+            raise RuntimeError("Persistent shells require a POSIX system with PTY support")
+
+        with self.lock:
+            shell = self.shells.get(session_id)
+            if shell and not shell.closed:
+                shell.last_activity = time.time()
+                return shell
+            if shell:
+                shell.close()
+                del self.shells[session_id]
+
+            if len(self.shells) >= self.max_sessions:
+                self._reap_locked(force_oldest=True)
+            if len(self.shells) >= self.max_sessions:
+                raise RuntimeError(f"Shell session limit reached ({self.max_sessions})")
+
+            shell = ShellSession(session_id, cwd)
+            self.shells[session_id] = shell
+            return shell
+
+    def get(self, session_id):
+        return self.shells.get(session_id)
+
+    def close(self, session_id):
+        """Close a session's shell if it exists"""
+        with self.lock:
+            shell = self.shells.pop(session_id, None)
+        if shell:
+            shell.close()
+            return True
+        return False
+
+    def _reap_locked(self, force_oldest=False):
+        now = time.time()
+        reaped = []
+        for session_id, shell in list(self.shells.items()):
+            if shell.closed or (now - shell.last_activity > self.idle_timeout and not shell.listeners):
+                shell.close()
+                del self.shells[session_id]
+                reaped.append(session_id)
+
+        if force_oldest and not reaped and len(self.shells) >= self.max_sessions:
+            # Evict the least recently used shell nobody is attached to
+            detached = [(s.last_activity, sid) for sid, s in self.shells.items() if not s.listeners]
+            if detached:
+                _, session_id = min(detached)
+                self.shells.pop(session_id).close()
+                reaped.append(session_id)
+        return reaped
+
+    def reap_idle(self):
+        """Close shells that are dead or idle past the timeout"""
+        with self.lock:
+            reaped = self._reap_locked()
+        for session_id in reaped:
+            logger.info(f"Reaped idle shell for session {session_id}")
+        return reaped
+
+    def close_all(self):
+        with self.lock:
+            shells = list(self.shells.values())
+            self.shells.clear()
+        for shell in shells:
+            shell.close()
+
+    def stats(self):
+        return {
+            "active": len(self.shells),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout
+        }
+
+shell_manager = ShellSessionManager()
+
+# Warm Python kernels
+PYTHON_KERNEL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_kernel.py")
+PYTHON_KERNEL_PRELOAD = os.environ.get("PYTHON_KERNEL_PRELOAD", "numpy,pandas,sklearn")
+PYTHON_KERNEL_WARM_SIZE = int(os.environ.get("PYTHON_KERNEL_WARM_SIZE", 2))
+PYTHON_KERNEL_MAX_RUNS = int(os.environ.get("PYTHON_KERNEL_MAX_RUNS", 50))
+MAX_PYTHON_KERNELS = int(os.environ.get("MAX_PYTHON_KERNELS", 16))
+
+class PythonKernel:
+    """A pre-started Python worker process with common libraries already imported"""
+
+    def __init__(self):
+        env = dict(os.environ, PYTHON_KERNEL_PRELOAD=PYTHON_KERNEL_PRELOAD, PYTHONUNBUFFERED="1")
+        self.process = subprocess.Popen(
+            [sys.executable, PYTHON_KERNEL_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            start_new_session=True
+        )
+        self.buffer = b""
+        self.runs = 0
+        self.session_id = None
+        self.lock = threading.Lock()
+        self.info = self._read_message(timeout=120)
+
+    def _read_message(self, timeout):
+        """Read one JSON line from the worker, raising TimeoutError if none arrives"""
+        deadline = time.time() + timeout
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self.buffer:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError("Python kernel did not respond in time")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise RuntimeError("Python kernel exited unexpectedly")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def request(self, payload, timeout=30):
+        self.process.stdin.write((json.dumps(payload) + "\n").encode("utf-8"))
+        self.process.stdin.flush()
+        return self._read_message(timeout)
+
+    def bind(self, session_id, cwd):
+        """Attach the kernel to a session's workspace"""
+        self.session_id = session_id
+        return self.request({"op": "init", "cwd": cwd})
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.wait()
+
+class PythonKernelPool:
+    """Hands out warm kernels per session and recycles them after a number of runs"""
+
+    def __init__(self, warm_size=PYTHON_KERNEL_WARM_SIZE, max_runs=PYTHON_KERNEL_MAX_RUNS, max_kernels=MAX_PYTHON_KERNELS):
+        self.warm_size = warm_size
+        self.max_runs = max_runs
+        self.max_kernels = max_kernels
+        self.idle = deque()
+        self.kernels = {}
+        # session_id -> Future for a kernel being started or bound, so
+        # concurrent first calls share one kernel instead of each starting one
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.refilling = False
+
+    def refill(self):
+        """Top the idle pool back up to warm_size in the background"""
+        with self.lock:
+            if self.refilling:
+                return
+            self.refilling = True
+
+        def fill():
+            try:
+                while True:
+                    with self.lock:
+                        if len(self.idle) >= self.warm_size:
+                            break
+                    kernel = PythonKernel()
+                    with self.lock:
+                        self.idle.append(kernel)
+            except Exception as e:
+                logger.warning(f"Failed to warm Python kernel: {str(e)}")
+            finally:
+                with self.lock:
+                    self.refilling = False
+
+        threading.Thread(target=fill, daemon=True).start()
+
+    def _acquire(self, session_id, cwd):
+        with self.lock:
+            kernel = self.kernels.get(session_id)
+            if kernel and kernel.is_alive():
+                return kernel, False
+            waiting = self.pending.get(session_id)
+            if waiting is None:
+                if kernel:
+                    del self.kernels[session_id]
+                if len(self.kernels) + len(self.pending) >= self.max_kernels:
+                    raise RuntimeError(f"Python kernel limit reached ({self.max_kernels})")
+                kernel = None
+                while self.idle and kernel is None:
+                    candidate = self.idle.popleft()
+                    kernel = candidate if candidate.is_alive() else None
+                starting = self.pending[session_id] = Future()
+
+        if waiting is not None:
+            # Another call is already starting this session's kernel
+            return waiting.result(), False
+
+        cold = kernel is None
+        try:
+            if cold:
+                kernel = PythonKernel()
+            kernel.bind(session_id, cwd)
+        except BaseException as e:
+            with self.lock:
+                del self.pending[session_id]
+            starting.set_exception(e)
+            if kernel:
+                kernel.close()
+            raise
+        with self.lock:
+            del self.pending[session_id]
+            self.kernels[session_id] = kernel
+        starting.set_result(kernel)
+        self.refill()
+        return kernel, cold
+
+    def _retire(self, session_id, kernel):
+        with self.lock:
+            if self.kernels.get(session_id) is kernel:
+                del self.kernels[session_id]
+        kernel.close()
+
+    def execute(self, code, session_id, cwd, timeout=30, reset=False):
+        """Run a snippet in the session's kernel and report output, result and timings"""
+        started = time.perf_counter()
+        kernel, cold = self._acquire(session_id, cwd)
+        acquired = time.perf_counter()
+
+        with kernel.lock:
+            try:
+                if reset:
+                    kernel.request({"op": "reset"}, timeout)
+                result = kernel.request({"op": "exec", "code": code}, timeout)
+            except (TimeoutError, RuntimeError) as e:
+                # A hung or crashed kernel is discarded along with its state
+                self._retire(session_id, kernel)
+                message = f"Execution timed out after {timeout} seconds" if isinstance(e, TimeoutError) else str(e)
+                return {"success": False, "error": message, "kernel_reset": True}
+
+            kernel.runs += 1
+            recycled = kernel.runs >= self.max_runs
+            if recycled:
+                self._retire(session_id, kernel)
+
+        result["timings"] = {
+            "acquire_ms": round((acquired - started) * 1000, 3),
+            "exec_ms": result.pop("exec_ms", None),
+            "total_ms": round((time.perf_counter() - started) * 1000, 3),
+            "cold_start": cold
+        }
+        result["runs"] = kernel.runs
+        result["recycled"] = recycled
+        result["preloaded"] = kernel.info.get("preloaded", [])
+        return result
+
+    def shutdown_session(self, session_id):
+        with self.lock:
+            kernel = self.kernels.pop(session_id, None)
+        if kernel:
+            kernel.close()
+            return True
+        return False
+
+    def close_all(self):
+        with self.lock:
+            kernels = list(self.kernels.values()) + list(self.idle)
+            self.kernels.clear()
+            self.idle.clear()
+        for kernel in kernels:
+            kernel.close()
+
+    def stats(self):
+        return {
+            "idle": len(self.idle),
+            "active": len(self.kernels),
+            "warm_size": self.warm_size,
+            "max_runs": self.max_runs,
+            "max_kernels": self.max_kernels
+        }
+
+kernel_pool = PythonKernelPool()
+
+# Resource-limited command execution; a default of 0 leaves that limit off.
+# Without a cgroup, "processes" falls back to RLIMIT_NPROC, which caps every
+# process of the server's UID rather than just the command's own
+COMMAND_LIMITS = {
+    "cpu_seconds": int(os.environ.get("COMMAND_CPU_SECONDS", 120)),
+    "memory_bytes": int(os.environ.get("COMMAND_MEMORY_BYTES", 2 * 1024 ** 3)),
+    "open_files": int(os.environ.get("COMMAND_OPEN_FILES", 1024)),
+    "processes": int(os.environ.get("COMMAND_PROCESSES", 512)),
+}
+
+# Optional cgroup v2 directory (must be delegated to this user) under which
+# each command gets its own child group
+COMMAND_CGROUP_ROOT = os.environ.get("COMMAND_CGROUP_ROOT")
+
+class CommandLimitError(ValueError):
+    """Raised for per-request command limits that are not positive integers"""
+
+def resolve_command_limits(overrides=None):
+    """Merge per-request limits with the node defaults; requests may only tighten them.
+    
+    Overrides are clamped to 1..default. Limits the node leaves off (0)
+    cannot be set by a request.
+    """
+    limits = dict(COMMAND_LIMITS)
+    for key, value in (overrides or {}).items():
+        if key not in limits or value is None:
+            continue
+        if isinstance(value, (bool, float)) or not isinstance(value, (int, str)):
+            raise CommandLimitError(f"Limit {key} must be a positive integer")
+        try:
+            value = int(value)
+        except ValueError:
+            raise CommandLimitError(f"Limit {key} must be a positive integer")
+        if value < 1:
+            raise CommandLimitError(f"Limit {key} must be a positive integer")
+        if limits[key]:
+            limits[key] = min(value, limits[key])
+    return limits
+
+def cgroup_available():
+    return bool(
+        COMMAND_CGROUP_ROOT
+        and os.path.exists("/sys/fs/cgroup/cgroup.controllers")
+        and os.access(COMMAND_CGROUP_ROOT, os.W_OK)
+    )
+
+def create_command_cgroup(limits):
+    """Create a cgroup enforcing memory, CPU and pid limits for one command"""
+    path = os.path.join(COMMAND_CGROUP_ROOT, f"cmd-{uuid.uuid4().hex[:12]}")
+    os.mkdir(path)
+    settings = {
+        "memory.max": str(limits["memory_bytes"] or "max"),
+        "memory.swap.max": "0",
+        "pids.max": str(limits["processes"] or "max"),
+    }
+    for name, value in settings.items():
+        try:
+            with open(os.path.join(path, name), "w") as f:
+                f.write(value)
+        except OSError:
+            # Controller not enabled for this subtree
+            pass
+    return path
+
+def read_cgroup_stats(path):
+    """Collect CPU, peak memory and I/O accounting from a finished command's cgroup"""
+    stats = {}
+    try:
+        with open(os.path.join(path, "cpu.stat")) as f:
+            cpu = dict(line.split() for line in f if line.strip())
+        stats["cpu_user_seconds"] = int(cpu.get("user_usec", 0)) / 1e6
+        stats["cpu_system_seconds"] = int(cpu.get("system_usec", 0)) / 1e6
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(path, "memory.peak")) as f:
+            stats["max_rss_bytes"] = int(f.read().strip())
+    except (OSError, ValueError):
+        pass
+    try:
+        read_bytes = write_bytes = 0
+        with open(os.path.join(path, "io.stat")) as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        read_bytes += int(value)
+                    elif key == "wbytes":
+                        write_bytes += int(value)
+        stats["io_read_bytes"] = read_bytes
+        stats["io_write_bytes"] = write_bytes
+    except OSError:
+        pass
+    return stats
+
+COMMAND_RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "command_runner.py")
+
+def run_limited_command(command, cwd, timeout=30, limits=None):
+    """Run a shell command under rlimits (and a cgroup when available) and account for its usage"""
+    limits = resolve_command_limits(limits)
+    cgroup_path = create_command_cgroup(limits) if cgroup_available() else None
+    spec = {"command": command, "limits": limits, "cgroup": cgroup_path}
+    
+    # The launcher reports the command's rusage on a separate pipe
+    report_read, report_write = os.pipe()
+    started = time.time()
+    try:
+        process = subprocess.Popen(
+            [sys.executable, "-I", "-S", COMMAND_RUNNER_SCRIPT, json.dumps(spec), str(report_write)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            pass_fds=(report_write,)
+        )
+    finally:
+        os.close(report_write)
+    
+    timed_out = False
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        # The launcher kills the command's process group on SIGTERM
+        process.terminate()
+        try:
+            stdout, stderr = process.communicate(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            stdout, stderr = process.communicate()
+    
+    with os.fdopen(report_read) as f:
+        raw_report = f.read()
+    report = json.loads(raw_report) if raw_report else {"exit_code": process.returncode}
+    
+    usage = {"wall_seconds": round(time.time() - started, 4)}
+    for key in ("cpu_user_seconds", "cpu_system_seconds", "max_rss_bytes", "io_read_bytes", "io_write_bytes"):
+        if key in report:
+            usage[key] = round(report[key], 4) if isinstance(report[key], float) else report[key]
+    if cgroup_path:
+        usage.update({k: round(v, 4) if isinstance(v, float) else v for k, v in read_cgroup_stats(cgroup_path).items()})
+        try:
+            os.rmdir(cgroup_path)
+        except OSError:
+            pass
+    
+    exit_code = report["exit_code"]
+    limit_exceeded = None
+    cpu_used = usage.get("cpu_user_seconds", 0) + usage.get("cpu_system_seconds", 0)
+    # The shell reports a signalled child as 128 + signal number
+    if exit_code in (-signal.SIGXCPU, 128 + signal.SIGXCPU) or (not timed_out and cpu_used >= limits["cpu_seconds"]):
+        limit_exceeded = "cpu_seconds"
+    elif b"MemoryError" in stderr or b"Cannot allocate memory" in stderr:
+        limit_exceeded = "memory_bytes"
+    
+    return {
+        "exit_code": exit_code,
+        "stdout": stdout.decode("utf-8", errors="replace"),
+        "stderr": stderr.decode("utf-8", errors="replace"),
+        "timed_out": timed_out,
+        "limit_exceeded": limit_exceeded,
+        "resource_usage": usage,
+        "limits": limits,
+        "cgroup": cgroup_path is not None
+    }
+
+# Repository mirror cache
+REPO_MIRROR_DIR = os.path.join(os.getcwd(), "repo_mirrors")
+os.makedirs(REPO_MIRROR_DIR, exist_ok=True)
+REPO_MIRROR_MAX_BYTES = int(os.environ.get("REPO_MIRROR_MAX_BYTES", 10 * 1024 ** 3))
+REPO_MIRROR_REFRESH_SECONDS = int(os.environ.get("REPO_MIRROR_REFRESH_SECONDS", 300))
+
+# Local file:// repositories are only clonable when explicitly enabled
+ALLOWED_CLONE_PREFIXES = ("https://github.com/", "git@github.com:")
+if os.environ.get("ALLOW_LOCAL_CLONES", "").lower() in ("1", "true", "yes"):
+    ALLOWED_CLONE_PREFIXES += ("file://",)
+
+def run_git(args, cwd=None, timeout=600):
+    """Run a git command, raising RuntimeError with its stderr on failure"""
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+class RepositoryMirrorCache:
+    """Bare mirrors of remote repositories shared by every session's clones.
+    
+    Workspace clones are made from the local mirror, so repeat clones never
+    touch the network. Mirrors are refreshed in the background and evicted
+    least-recently-used once the cache exceeds its disk budget.
+    """
+
+    def __init__(self, root=REPO_MIRROR_DIR, max_bytes=REPO_MIRROR_MAX_BYTES, refresh_seconds=REPO_MIRROR_REFRESH_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _normalize(self, url):
+        url = url.strip().rstrip("/")
+        return url[:-4] if url.endswith(".git") else url
+
+    def mirror_path(self, url):
+        url = self._normalize(url)
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", url.rsplit("/", 1)[-1].rsplit(":", 1)[-1]) or "repo"
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, f"{name}-{digest}.git")
+
+    def _url_lock(self, url):
+        with self.lock:
+            return self.locks.setdefault(self._normalize(url), threading.Lock())
+
+    def _read_meta(self, path):
+        try:
+            with open(path + ".json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, path, meta):
+        tmp = path + ".json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path + ".json")
+
+    def ensure(self, url):
+        """Return (mirror path, whether it already existed), creating the mirror if needed"""
+        path = self.mirror_path(url)
+        with self._url_lock(url):
+            meta = self._read_meta(path)
+            if os.path.isdir(path):
+                self.hits += 1
+                meta["last_used"] = time.time()
+                self._write_meta(path, meta)
+                if time.time() - meta.get("last_fetched", 0) > self.refresh_seconds:
+                    threading.Thread(target=self.refresh, args=(url,), daemon=True).start()
+                return path, True
+
+            self.misses += 1
+            tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+            try:
+                run_git(["clone", "--mirror", "--quiet", url, tmp_path])
+                # Let workspace clones request partial (blobless) copies from the mirror
+                run_git(["config", "uploadpack.allowFilter", "true"], cwd=tmp_path)
+                os.rename(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+
+            now = time.time()
+            self._write_meta(path, {
+                "url": self._normalize(url),
+                "created": now,
+                "last_used": now,
+                "last_fetched": now,
+                "size": directory_size(path)
+            })
+
+        self.evict(keep=path)
+        return path, False
+
+    def refresh(self, url):
+        """Fetch new objects and refs into an existing mirror"""
+        path = self.mirror_path(url)
+        with self._url_lock(url):
+            if not os.path.isdir(path):
+                return False
+            try:
+                run_git(["fetch", "--prune", "--quiet", "origin"], cwd=path)
+            except Exception as e:
+                logger.warning(f"Failed to refresh mirror for {url}: {str(e)}")
+                return False
+            meta = self._read_meta(path)
+            meta.update({"last_fetched": time.time(), "size": directory_size(path)})
+            self._write_meta(path, meta)
+        return True
+
+    def clone(self, url, target_dir, branch=None, depth=None, filter_blobs=False):
+        """Clone url into target_dir from the local mirror; returns whether the mirror was reused"""
+        mirror, hit = self.ensure(url)
+        
+        args = ["clone", "--quiet"]
+        if branch:
+            args += ["--branch", branch]
+        if depth:
+            args += ["--depth", str(int(depth))]
+        if filter_blobs:
+            args += ["--filter=blob:none"]
+        # Shallow and partial clones need the transport protocol; plain local
+        # clones hardlink the mirror's object files instead of copying them
+        source = f"file://{mirror}" if depth or filter_blobs else mirror
+        
+        with self._url_lock(url):
+            try:
+                run_git(args + [source, target_dir])
+            except RuntimeError:
+                if not (hit and branch):
+                    raise
+                # The branch may be newer than our mirror
+                shutil.rmtree(target_dir, ignore_errors=True)
+                run_git(["fetch", "--prune", "--quiet", "origin"], cwd=mirror)
+                run_git(args + [source, target_dir])
+        
+        # Point the workspace clone at the real remote for pulls and lazy fetches
+        run_git(["remote", "set-url", "origin", url], cwd=target_dir)
+        return hit
+
+    def evict(self, keep=None):
+        """Remove least-recently-used mirrors until the cache fits its budget"""
+        mirrors = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".git") and os.path.isdir(path):
+                meta = self._read_meta(path)
+                mirrors.append((meta.get("last_used", 0), meta.get("size", 0), path, meta.get("url")))
+        
+        total = sum(size for _, size, _, _ in mirrors)
+        evicted = []
+        for _, size, path, url in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            lock = self._url_lock(url) if url else threading.Lock()
+            # Skip mirrors that are being cloned from right now
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+                try:
+                    os.remove(path + ".json")
+                except OSError:
+                    pass
+            finally:
+                lock.release()
+            total -= size
+            evicted.append(path)
+        return evicted
+
+    def stats(self):
+        mirrors = [n for n in os.listdir(self.root) if n.endswith(".git")]
+        total = sum(self._read_meta(os.path.join(self.root, n)).get("size", 0) for n in mirrors)
+        return {
+            "mirrors": len(mirrors),
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+repo_mirrors = RepositoryMirrorCache()
+
 # Tool definitions
 class Tools:
     @staticmethod
-    def read_file(file_path, session_workspace=None):
-        """Read content from a file."""
+    def read_file(file_path, session_workspace=None, offset=None, length=None, start_line=None, end_line=None, tail=None):
+        """Read content from a file, optionally only a byte range, line range or tail."""
         try:
             # Make sure the path is within the workspace
             abs_path = os.path.abspath(file_path)
@@ -404,25 +1783,25 @@ class Tools:
             if not os.path.exists(file_path):
                 return {"success": False, "error": f"File not found: {file_path}"}
                 
+            file_info = get_file_info(file_path)
+            
             # Check if file is binary
-            if is_binary_file(file_path):
+            if file_info["is_binary"]:
                 return {
                     "success": True, 
                     "content": f"[Binary file: {os.path.basename(file_path)}]",
                     "is_binary": True,
-                    "size": os.path.getsize(file_path)
+                    "size": file_info["size"]
                 }
-                
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
             
-            file_info = get_file_info(file_path)
+            selection = read_file_range(file_path, offset, length, start_line, end_line, tail)
             
             return {
                 "success": True, 
-                "content": content,
+                "content": selection.pop("content"),
                 "language": get_file_language(file_path),
-                "file_info": file_info
+                "file_info": file_info,
+                "range": selection
             }
         except Exception as e:
             return {"success": False, "error": f"Error reading file: {str(e)}"}
@@ -453,41 +1832,140 @@ class Tools:
             return {"success": False, "error": f"Error writing to file: {str(e)}"}
     
     @staticmethod
-    def list_directory(directory=".", session_workspace=None):
-        """List files in the specified directory."""
+    def apply_patch(session_workspace, patch=None, edits=None, expected_hashes=None, dry_run=False):
+        """Apply a unified diff and/or line-range edits to one or more files atomically."""
         try:
-            # Make sure the directory is within workspace
-            abs_path = os.path.abspath(directory)
-            if session_workspace and not abs_path.startswith(session_workspace) and directory != ".":
-                directory = os.path.join(session_workspace, directory)
+            if not patch and not edits:
+                return {"success": False, "error": "Provide a unified diff (patch) or line-range edits"}
             
-            # Check if directory exists
-            if not os.path.isdir(directory):
-                return {"success": False, "error": f"Directory not found: {directory}"}
+            def resolve(path):
+                abs_path = os.path.abspath(os.path.join(session_workspace, path))
+                if not abs_path.startswith(session_workspace + os.sep):
+                    raise PatchError(f"Access denied: {path} is outside of workspace", status=403, path=path)
+                return abs_path
             
-            # Get all items in directory
-            items = os.listdir(directory)
+            # path -> {"original": bytes or None, "lines": list or None (deleted)}
+            files = {}
             
-            # Separate directories and files with detailed info
-            directories = []
-            files = []
+            def load(path):
+                if path not in files:
+                    original = None
+                    if os.path.exists(path):
+                        with open(path, "rb") as f:
+                            original = f.read()
+                    try:
+                        text = original.decode("utf-8") if original is not None else ""
+                    except UnicodeDecodeError:
+                        raise PatchError(f"Cannot patch binary file {os.path.relpath(path, session_workspace)}", path=path)
+                    files[path] = {"original": original, "lines": text.splitlines(keepends=True),
+                                   "added": 0, "removed": 0}
+                return files[path]
             
-            for item in items:
-                item_path = os.path.join(directory, item)
-                if os.path.isdir(item_path):
-                    directories.append({
-                        "name": item,
-                        "path": item_path,
-                        "modified": datetime.fromtimestamp(os.path.getmtime(item_path)).isoformat()
-                    })
+            for file_patch in parse_unified_diff(patch) if patch else []:
+                old_path = resolve(file_patch["old_path"]) if file_patch["old_path"] else None
+                new_path = resolve(file_patch["new_path"]) if file_patch["new_path"] else None
+                source = load(old_path) if old_path else {"original": None, "lines": [], "added": 0, "removed": 0}
+                if old_path and source["original"] is None:
+                    raise PatchError(f"File not found: {file_patch['old_path']}", status=404, path=old_path)
+                
+                lines = apply_hunks(source["lines"], file_patch["hunks"])
+                for hunk in file_patch["hunks"]:
+                    source["added"] += sum(1 for tag, _ in hunk["lines"] if tag == "+")
+                    source["removed"] += sum(1 for tag, _ in hunk["lines"] if tag == "-")
+                
+                if new_path is None:
+                    source["lines"] = None
+                elif new_path == old_path:
+                    source["lines"] = lines
                 else:
-                    file_info = get_file_info(item_path)
-                    files.append(file_info)
+                    # Created or renamed file
+                    target = load(new_path)
+                    if target["original"] is not None and old_path is None:
+                        raise PatchError(f"File already exists: {file_patch['new_path']}", status=409, path=new_path)
+                    target.update({"lines": lines, "added": source["added"], "removed": source["removed"]})
+                    if old_path:
+                        source["lines"] = None
+            
+            by_file = {}
+            for edit in edits or []:
+                by_file.setdefault(resolve(edit["file_path"]), []).append(edit)
+            for path, file_edits in by_file.items():
+                entry = load(path)
+                if entry["lines"] is None:
+                    raise PatchError(f"Cannot edit {os.path.relpath(path, session_workspace)}: it is deleted by the patch", path=path)
+                entry["lines"] = apply_line_edits(entry["lines"], file_edits)
+                entry["added"] += sum(len(e.get("content", "").splitlines()) for e in file_edits)
+                entry["removed"] += sum(e.get("end_line", e["start_line"]) - e["start_line"] + 1 for e in file_edits)
+            
+            # Optimistic concurrency: refuse if any file changed since the caller read it
+            for rel_path, expected in (expected_hashes or {}).items():
+                path = resolve(rel_path)
+                entry = files.get(path) or load(path)
+                current = sha256_bytes(entry["original"]) if entry["original"] is not None else ""
+                if expected != current:
+                    raise PatchError(f"{rel_path} has changed (expected sha256 {expected}, found {current or 'no file'})",
+                                     status=409, path=path)
+            
+            changes = {}
+            results = []
+            for path, entry in files.items():
+                data = "".join(entry["lines"]).encode("utf-8") if entry["lines"] is not None else None
+                if data == entry["original"]:
+                    continue
+                changes[path] = data
+                results.append({
+                    "path": os.path.relpath(path, session_workspace),
+                    "action": "delete" if data is None else "create" if entry["original"] is None else "modify",
+                    "previous_sha256": sha256_bytes(entry["original"]) if entry["original"] is not None else None,
+                    "sha256": sha256_bytes(data) if data is not None else None,
+                    "lines_added": entry["added"],
+                    "lines_removed": entry["removed"]
+                })
+            
+            if not dry_run:
+                write_atomically(changes, {path: files[path]["original"] for path in changes})
+            
+            return {
+                "success": True,
+                "message": f"{'Checked' if dry_run else 'Applied'} changes to {len(results)} files",
+                "files": results,
+                "dry_run": dry_run
+            }
+        except PatchError as e:
+            result = {"success": False, "error": str(e), "status": e.status}
+            if e.path:
+                result["file_path"] = os.path.relpath(e.path, session_workspace)
+            return result
+        except Exception as e:
+            return {"success": False, "error": f"Error applying patch: {str(e)}"}
+    
+    @staticmethod
+    def list_directory(directory=".", session_workspace=None, sort_by="name", reverse=False, cursor=None, limit=None, classify=False):
+        """List files in the specified directory."""
+        try:
+            # Relative paths (and ".") are taken from the workspace root; after
+            # resolving links and "..", the result must still be inside it
+            if session_workspace:
+                workspace = os.path.realpath(session_workspace)
+                directory = os.path.realpath(os.path.join(workspace, directory))
+                if os.path.commonpath([directory, workspace]) != workspace:
+                    return {"success": False, "status": 400, "error": "Access denied: directory is outside of workspace"}
+                session_workspace = workspace
+            
+            # Check if directory exists
+            if not os.path.isdir(directory):
+                return {"success": False, "status": 404, "error": f"Directory not found: {directory}"}
+            
+            # Single scandir pass with cached per-file metadata
+            listing = scan_directory(directory, sort_by, reverse, cursor, limit, classify)
             
             return {
                 "success": True, 
-                "directories": directories,
-                "files": files,
+                "directories": listing["directories"],
+                "files": listing["files"],
+                "total_directories": listing["total_directories"],
+                "total_files": listing["total_files"],
+                "next_cursor": listing["next_cursor"],
                 "current_path": os.path.abspath(directory),
                 "parent_directory": os.path.dirname(os.path.abspath(directory)) if os.path.abspath(directory) != session_workspace else None
             }
@@ -504,11 +1982,10 @@ class Tools:
                 directory = os.path.join(session_workspace, directory)
             
             matches = []
-            for root, _, files in os.walk(directory):
-                for filename in files:
-                    if re.search(pattern, filename):
-                        file_path = os.path.join(root, filename)
-                        matches.append(get_file_info(file_path))
+            regex = re.compile(pattern)
+            for entry in walk_workspace(directory, max_file_size=None, skip_generated=False):
+                if regex.search(os.path.basename(entry.path)):
+                    matches.append(get_file_info(entry.path, entry.stat))
             
             return {
                 "success": True,
@@ -520,9 +1997,11 @@ class Tools:
             return {"success": False, "error": f"Error searching files: {str(e)}"}
     
     @staticmethod
-    def execute_command(command, working_dir=None, session_workspace=None, timeout=30):
+    def execute_command(command, working_dir=None, session_workspace=None, timeout=30, persistent=False, session_id=None, limits=None):
         """Execute a shell command in the workspace."""
         try:
+            explicit_dir = bool(working_dir)
+            
             # Set working directory
             if working_dir:
                 abs_path = os.path.abspath(working_dir)
@@ -535,36 +2014,50 @@ class Tools:
             if not os.path.isdir(working_dir):
                 return {"success": False, "error": f"Working directory not found: {working_dir}"}
             
-            # Execute command
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=working_dir
-            )
+            # Run inside the session's long-lived shell so cd/env/venv state carries over
+            if persistent:
+                shell = shell_manager.get_or_create(session_id or os.path.basename(session_workspace), session_workspace)
+                if explicit_dir:
+                    command = f"cd {shlex.quote(working_dir)} && {command}"
+                result = shell.run(command, timeout)
+                result["working_dir"] = working_dir
+                return result
             
-            try:
-                stdout, stderr = process.communicate(timeout=timeout)
-                return {
-                    "success": process.returncode == 0,
-                    "exit_code": process.returncode,
-                    "stdout": stdout,
-                    "stderr": stderr,
-                    "command": command,
-                    "working_dir": working_dir
-                }
-            except subprocess.TimeoutExpired:
-                process.kill()
+            # Execute command under per-command resource limits
+            result = run_limited_command(command, working_dir, timeout, limits)
+            
+            if result["timed_out"]:
                 return {
                     "success": False,
                     "error": f"Command timed out after {timeout} seconds",
-                    "command": command
+                    "command": command,
+                    "stdout": result["stdout"],
+                    "stderr": result["stderr"],
+                    "resource_usage": result["resource_usage"]
                 }
+            
+            return {
+                "success": result["exit_code"] == 0,
+                "exit_code": result["exit_code"],
+                "stdout": result["stdout"],
+                "stderr": result["stderr"],
+                "command": command,
+                "working_dir": working_dir,
+                "resource_usage": result["resource_usage"],
+                "limits": result["limits"],
+                "limit_exceeded": result["limit_exceeded"]
+            }
         except Exception as e:
             return {"success": False, "error": f"Error executing command: {str(e)}"}
     
+    @staticmethod
+    def execute_python(code, session_id, session_workspace, timeout=30, reset=False):
+        """Execute a Python snippet in a warm, per-session kernel."""
+        try:
+            return kernel_pool.execute(code, session_id, session_workspace, timeout, reset)
+        except Exception as e:
+            return {"success": False, "error": f"Error executing Python: {str(e)}"}
+    
     @staticmethod
     def create_project_structure(structure, base_dir, session_workspace=None):
         """Create a project structure from a nested dictionary."""
@@ -629,11 +2122,11 @@ class Tools:
         return index_files(session_id, file_paths)
         
     @staticmethod
-    def clone_github_repository(repository_url, session_workspace, directory_name=None, branch=None):
+    def clone_github_repository(repository_url, session_workspace, directory_name=None, branch=None, depth=None, filter_blobs=False):
         """Clone a GitHub repository into the workspace with timestamp."""
         try:
             # Validate the repository URL
-            if not repository_url.startswith(("https://github.com/", "git@github.com:")):
+            if not repository_url.startswith(ALLOWED_CLONE_PREFIXES):
                 return {"success": False, "error": "Invalid GitHub repository URL"}
             
             # Create timestamp for directory
@@ -642,13 +2135,14 @@ class Tools:
             # Use provided directory name or extract from URL
             if not directory_name:
                 # Extract repo name from URL
-                if repository_url.endswith(".git"):
-                    repository_url = repository_url[:-4]
+                repo_path = repository_url[:-4] if repository_url.endswith(".git") else repository_url
                 
-                if "github.com/" in repository_url:
-                    repo_name = repository_url.split("github.com/")[-1].split("/")[-1]
-                elif "github.com:" in repository_url:
-                    repo_name = repository_url.split("github.com:")[-1].split("/")[-1]
+                if "github.com/" in repo_path:
+                    repo_name = repo_path.split("github.com/")[-1].split("/")[-1]
+                elif "github.com:" in repo_path:
+                    repo_name = repo_path.split("github.com:")[-1].split("/")[-1]
+                elif repo_path.startswith("file://"):
+                    repo_name = repo_path.rstrip("/").split("/")[-1]
                 else:
                     repo_name = "repo"
                 
@@ -658,44 +2152,41 @@ class Tools:
             
             # Create target directory path
             target_dir = os.path.join(session_workspace, directory_name)
+            if os.path.exists(target_dir):
+                # Mirror clones are fast enough to repeat within the same second
+                directory_name = f"{directory_name}_{uuid.uuid4().hex[:6]}"
+                target_dir = os.path.join(session_workspace, directory_name)
             
-            # Prepare clone command
-            clone_cmd = f"git clone {repository_url} {target_dir}"
-            if branch:
-                clone_cmd += f" --branch {branch}"
-                
-            # Execute git clone
-            process = subprocess.Popen(
-                clone_cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            # Clone from the shared local mirror instead of the network
+            started = time.time()
+            mirror_hit = repo_mirrors.clone(repository_url, target_dir, branch, depth, filter_blobs)
+            clone_seconds = round(time.time() - started, 3)
             
-            stdout, stderr = process.communicate(timeout=120)  # 2 minute timeout
+            # Share the checkout's files with identical copies in other sessions
+            blob_store.submit_tree(target_dir)
             
-            if process.returncode == 0:
-                # Get directory listing after clone
-                listing = Tools.list_directory(target_dir, session_workspace)
-                
-                # Index files in the cloned repository for search
-                index_result = index_files(os.path.basename(session_workspace), 
-                                           [os.path.join(directory_name, "**/*")])
-                
-                return {
-                    "success": True,
-                    "message": f"Successfully cloned repository to {directory_name}",
-                    "directory": target_dir,
-                    "relative_path": directory_name,
-                    "listing": listing,
-                    "indexed": index_result.get("success", False)
-                }
-            else:
-                return {"success": False, "error": f"Failed to clone repository: {stderr}"}
+            # Get directory listing after clone
+            listing = Tools.list_directory(target_dir, session_workspace, limit=DEFAULT_LISTING_PAGE_SIZE)
+            
+            # Index files in the cloned repository for search
+            index_result = index_files(os.path.basename(session_workspace), 
+                                       [os.path.join(directory_name, "**/*")])
+            
+            return {
+                "success": True,
+                "message": f"Successfully cloned repository to {directory_name}",
+                "directory": target_dir,
+                "relative_path": directory_name,
+                "listing": listing,
+                "indexed": index_result.get("success", False),
+                "mirror_hit": mirror_hit,
+                "clone_seconds": clone_seconds
+            }
                 
         except subprocess.TimeoutExpired:
-            return {"success": False, "error": "Repository cloning timed out after 120 seconds"}
+            return {"success": False, "error": "Repository cloning timed out"}
+        except RuntimeError as e:
+            return {"success": False, "error": f"Failed to clone repository: {str(e)}"}
         except Exception as e:
             return {"success": False, "error": f"Error cloning repository: {str(e)}"}
 
@@ -826,7 +2317,7 @@ Please return the modified code.
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """Chat endpoint for interacting with the assistant"""
-    session_id, session = get_or_create_session(request.session_id)
+    session_id, session = await get_or_create_session_async(request.session_id)
     
     # Select model
     model_config = select_best_model("conversation", request.model)
@@ -882,17 +2373,14 @@ async def chat_endpoint(request: ChatRequest):
 @app.post("/upload", response_model=UploadResponse)
 async def upload_file_endpoint(file: UploadFile = File(...), session_id: str = Form(None)):
     """Upload a file to the workspace"""
-    _, session = get_or_create_session(session_id)
+    _, session = await get_or_create_session_async(session_id)
     workspace = session["context"]["workspace_root"]
     
     try:
-        # Save the file
+        # Stream the file to disk instead of reading it into memory
         file_path = os.path.join(workspace, file.filename)
-        with open(file_path, "wb") as f:
-            f.write(file.file.read())
-        
-        # Get file info
-        file_info = get_file_info(file_path)
+        size, digest = await save_upload_file(file, file_path)
+        blob_store.submit(file_path, digest)
         
         # Index the file for semantic search
         index_result = index_files(session_id, [file_path])
@@ -901,17 +2389,119 @@ async def upload_file_endpoint(file: UploadFile = File(...), session_id: str = F
             success=True,
             message=f"Successfully uploaded {file.filename}",
             file_path=file_path,
-            size=file_info["size"],
+            size=size,
             session_id=session_id
         )
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         return JSONResponse(status_code=500, content={"error": f"Error uploading file: {str(e)}"})
 
+@app.post("/upload/archive")
+async def upload_archive_endpoint(request: Request, session_id: str, directory: Optional[str] = None, filename: Optional[str] = None):
+    """Extract a zip/tar/tar.gz/tar.zst request body into the workspace while it streams in"""
+    _, session = await get_or_create_session_async(session_id)
+    workspace = session["context"]["workspace_root"]
+    
+    target_dir = os.path.abspath(os.path.join(workspace, directory or ""))
+    if target_dir != workspace and not target_dir.startswith(workspace + os.sep):
+        raise HTTPException(status_code=403, detail="Access denied: Cannot extract outside of workspace")
+    os.makedirs(target_dir, exist_ok=True)
+    
+    # Files are deduplicated and handed to the indexer as soon as they land
+    indexer = StreamingIndexer(session_id)
+    session["context"]["archive_indexing"] = indexer.status
+    
+    def on_file(path, size, digest):
+        blob_store.submit(path, digest)
+        indexer.add(path)
+    
+    try:
+        result = await extract_request_stream(request.stream(), target_dir, filename, on_file, UPLOAD_STAGING_DIR)
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        indexer.close()
+    
+    return {
+        "success": True,
+        "message": f"Extracted {result['files']} files to {os.path.relpath(target_dir, workspace)}",
+        "directory": target_dir,
+        "indexing": indexer.status,
+        **result
+    }
+
+@app.post("/upload/chunked")
+async def create_chunked_upload_endpoint(request: ChunkedUploadRequest):
+    """Start a resumable upload; chunks are then PUT at explicit offsets"""
+    _, session = await get_or_create_session_async(request.session_id)
+    workspace = session["context"]["workspace_root"]
+    
+    destination = os.path.abspath(os.path.join(workspace, request.path))
+    if not destination.startswith(workspace + os.sep):
+        raise HTTPException(status_code=403, detail="Access denied: Cannot upload outside of workspace")
+    
+    try:
+        upload = upload_store.create(destination, request.size, request.sha256, owner=request.session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    
+    return {
+        "success": True,
+        "upload_id": upload.upload_id,
+        "chunk_size": upload_store.chunk_size,
+        **upload.status()
+    }
+
+@app.put("/upload/chunked/{upload_id}")
+async def upload_chunk_endpoint(upload_id: str, request: Request, session_id: str, offset: int = 0):
+    """Write the raw request body at offset; chunks may arrive in parallel and out of order"""
+    try:
+        status = await upload_store.write_stream(upload_id, offset, request.stream(), owner=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return {"success": True, **status}
+
+@app.get("/upload/chunked/{upload_id}")
+async def chunked_upload_status_endpoint(upload_id: str, session_id: str):
+    """Report received and missing ranges so a client can resume"""
+    try:
+        upload = upload_store.get(upload_id, owner=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return {"success": True, **upload.status()}
+
+@app.post("/upload/chunked/{upload_id}/complete", response_model=UploadResponse)
+async def complete_chunked_upload_endpoint(upload_id: str, session_id: str = Body(..., embed=True)):
+    """Verify the upload, move it into the workspace and index it"""
+    try:
+        result = await asyncio.to_thread(upload_store.complete, upload_id, session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    
+    blob_store.submit(result["destination"], result["sha256"])
+    index_files(session_id, [result["destination"]])
+    
+    return UploadResponse(
+        success=True,
+        message=f"Successfully uploaded {os.path.basename(result['destination'])} (sha256 {result['sha256']})",
+        file_path=result["destination"],
+        size=result["size"],
+        session_id=session_id
+    )
+
+@app.delete("/upload/chunked/{upload_id}")
+async def abort_chunked_upload_endpoint(upload_id: str, session_id: str):
+    """Abandon an upload and delete its staged data"""
+    try:
+        upload_store.abort(upload_id, owner=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return {"success": True}
+
 @app.post("/generate_code", response_model=ChatResponse)
 async def generate_code_endpoint(request: CodeGenerationRequest):
     """Generate code based on a description"""
-    session_id, session = get_or_create_session(request.session_id)
+    session_id, session = await get_or_create_session_async(request.session_id)
     
     # Select model
     model_config = select_best_model("code_generation", request.model)
@@ -957,12 +2547,15 @@ Language: {request.language}
 @app.post("/rewritten_code", response_model=ChatResponse)
 async def rewrite_code_endpoint(request: CodeEditRequest):
     """Rewritten code based on instructions"""
-    session_id, session = get_or_create_session(request.session_id)
+    session_id, session = await get_or_create_session_async(request.session_id)
     
     # Read original code
     read_result = Tools.read_file(request.file_path, session["context"]["workspace_root"])
     if not read_result["success"]:
         return JSONResponse(status_code=400, content={"error": read_result["error"]})
+    if read_result.get("range", {}).get("truncated"):
+        # Writing back a preview would destroy the file
+        return JSONResponse(status_code=413, content={"error": "File is too large to rewrite in one request"})
     
     # Rewritten code
     assistant = CodeAssistant()
@@ -994,7 +2587,7 @@ async def rewrite_code_endpoint(request: CodeEditRequest):
 @app.post("/generate_project", response_model=ChatResponse)
 async def generate_project_endpoint(request: ProjectGenerationRequest):
     """Generate a project structure based on specifications"""
-    session_id, session = get_or_create_session(request.session_id)
+    session_id, session = await get_or_create_session_async(request.session_id)
     
     # Select model
     model_config = select_best_model("project_generation", request.model)
@@ -1054,7 +2647,7 @@ Format your response as a nested dictionary where keys are file/directory names
 @app.post("/search_code", response_model=Dict[str, Any])
 async def search_code_endpoint(request: SearchCodeRequest):
     """Search for code using semantic search"""
-    _, session = get_or_create_session(request.session_id)
+    _, session = await get_or_create_session_async(request.session_id)
     
     # Perform search
     search_result = search_code(request.session_id, request.query, request.max_results)
@@ -1070,23 +2663,110 @@ async def search_code_endpoint(request: SearchCodeRequest):
 @app.post("/api/execute")
 async def execute_command_endpoint(request: ExecuteCommandRequest):
     """Execute a command in the workspace"""
-    _, session_data = get_or_create_session(request.session_id)
+    _, session_data = await get_or_create_session_async(request.session_id)
     workspace = session_data["context"]["workspace_root"]
+    try:
+        resolve_command_limits(request.limits)
+    except CommandLimitError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Execute command
-    result = Tools.execute_command(
+    # Persistent shells and subprocesses wait on the command, so keep them off the event loop
+    result = await asyncio.to_thread(
+        Tools.execute_command,
         request.command,
         request.working_dir,
         workspace,
-        request.timeout
+        request.timeout,
+        request.persistent,
+        request.session_id,
+        request.limits
+    )
+    
+    return result
+
+@app.post("/api/apply_patch")
+async def apply_patch_endpoint(request: ApplyPatchRequest):
+    """Apply a unified diff or line-range edits atomically across files"""
+    _, session = await get_or_create_session_async(request.session_id)
+    workspace = session["context"]["workspace_root"]
+    
+    result = await asyncio.to_thread(
+        Tools.apply_patch,
+        workspace,
+        request.patch,
+        request.edits,
+        request.expected_hashes,
+        request.dry_run
     )
+    if not result["success"]:
+        return JSONResponse(status_code=result.get("status", 500), content=result)
+    return result
+
+@app.post("/api/execute_python")
+async def execute_python_endpoint(request: ExecutePythonRequest):
+    """Execute a Python snippet in the session's warm kernel"""
+    _, session_data = await get_or_create_session_async(request.session_id)
+    workspace = session_data["context"]["workspace_root"]
     
+    return await asyncio.to_thread(
+        Tools.execute_python,
+        request.code,
+        request.session_id,
+        workspace,
+        request.timeout,
+        request.reset
+    )
+
+@app.get("/api/kernels/stats")
+async def kernel_stats_endpoint():
+    """Report warm Python kernel usage on this node"""
+    return kernel_pool.stats()
+
+@app.post("/api/sessions/{session_id}/snapshot")
+async def snapshot_session_endpoint(session_id: str, evict: bool = False):
+    """Snapshot a session to a compressed archive, optionally parking it"""
+    result = await asyncio.to_thread(snapshot_session, session_id, evict)
+    if not result["success"]:
+        raise HTTPException(status_code=404, detail=result["error"])
     return result
 
+@app.post("/api/sessions/{session_id}/restore")
+async def restore_session_endpoint(session_id: str, lazy: bool = True):
+    """Restore a parked session; lazily (on first use) unless lazy=false"""
+    if session_id in sessions:
+        return {"success": True, "session_id": session_id, "restored": False, "message": "Session is already loaded"}
+    
+    path = session_snapshots.find_snapshot(SNAPSHOT_DIR, session_id)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"No snapshot for session {session_id}")
+    
+    if lazy:
+        metadata = await asyncio.to_thread(session_snapshots.read_metadata, path)
+        return {
+            "success": True,
+            "session_id": session_id,
+            "restored": False,
+            "snapshot_at": metadata.get("snapshot_at"),
+            "message": "Session will be restored on first access"
+        }
+    
+    result = await asyncio.to_thread(restore_session, session_id)
+    return {"restored": True, **result}
+
+@app.get("/api/blobs/stats")
+async def blob_store_stats_endpoint():
+    """Report how much workspace data is deduplicated by the blob store"""
+    return await asyncio.to_thread(blob_store.stats)
+
+@app.get("/api/github/mirrors")
+async def repository_mirror_stats_endpoint():
+    """Report repository mirror cache usage on this node"""
+    return repo_mirrors.stats()
+
 @app.post("/api/github/clone")
 async def clone_github_repository_endpoint(request: GitHubCloneRequest):
     """Clone a GitHub repository into the workspace"""
-    _, session_data = get_or_create_session(request.session_id)
+    _, session_data = await get_or_create_session_async(request.session_id)
     workspace = session_data["context"]["workspace_root"]
     
     # Clone the repository
@@ -1094,7 +2774,9 @@ async def clone_github_repository_endpoint(request: GitHubCloneRequest):
         request.repository_url,
         workspace,
         request.directory_name,
-        request.branch
+        request.branch,
+        request.depth,
+        request.filter_blobs
     )
     
     # Update session context with information about the cloned repository
@@ -1119,20 +2801,33 @@ async def clone_github_repository_endpoint(request: GitHubCloneRequest):
     return result
 
 @app.get("/workspace_info", response_model=WorkspaceInfo)
-async def workspace_info_endpoint(session_id: str):
+async def workspace_info_endpoint(
+    session_id: str,
+    directory: Optional[str] = None,
+    sort_by: str = "name",
+    reverse: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_LISTING_PAGE_SIZE,
+    classify: bool = False
+):
     """Get information about the current workspace"""
-    _, session = get_or_create_session(session_id)
+    _, session = await get_or_create_session_async(session_id)
     workspace = session["context"]["workspace_root"]
     
     # List files and directories
-    list_result = Tools.list_directory(workspace)
+    list_result = await asyncio.to_thread(
+        Tools.list_directory, directory or ".", workspace, sort_by, reverse, cursor, limit, classify
+    )
     if not list_result["success"]:
-        return JSONResponse(status_code=500, content={"error": list_result["error"]})
+        return JSONResponse(status_code=list_result.get("status", 500), content={"error": list_result["error"]})
     
     return WorkspaceInfo(
         current_directory=list_result["current_path"],
         available_files=list_result["files"],
-        directories=list_result["directories"]
+        directories=list_result["directories"],
+        total_files=list_result["total_files"],
+        total_directories=list_result["total_directories"],
+        next_cursor=list_result["next_cursor"]
     )
 
 @app.websocket("/ws")
@@ -1146,10 +2841,107 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         await websocket.close()
 
+@app.websocket("/ws/terminal/{session_id}")
+async def terminal_websocket_endpoint(websocket: WebSocket, session_id: str):
+    """Interactive PTY shell for a session, shared by every attached client"""
+    await websocket.accept()
+    _, session = await get_or_create_session_async(session_id)
+    
+    try:
+        shell = shell_manager.get_or_create(session_id, session["context"]["workspace_root"])
+    except RuntimeError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close()
+        return
+    
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    listener = lambda data: loop.call_soon_threadsafe(queue.put_nowait, data)
+    scrollback = shell.add_listener(listener)
+    
+    async def pump_output():
+        if scrollback:
+            await websocket.send_json({"type": "output", "data": scrollback.decode("utf-8", errors="replace")})
+        while True:
+            data = await queue.get()
+            if data is None:
+                await websocket.send_json({"type": "exit"})
+                break
+            await websocket.send_json({"type": "output", "data": data.decode("utf-8", errors="replace")})
+    
+    sender = asyncio.create_task(pump_output())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") == "input":
+                shell.write(message.get("data", ""))
+            elif message.get("type") == "resize":
+                shell.resize(int(message.get("rows", 24)), int(message.get("cols", 80)))
+            elif message.get("type") == "close":
+                shell_manager.close(session_id)
+                break
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Terminal websocket error for {session_id}: {str(e)}")
+    finally:
+        shell.remove_listener(listener)
+        sender.cancel()
+
+@app.delete("/api/terminal/{session_id}")
+async def close_terminal_endpoint(session_id: str):
+    """Terminate a session's persistent shell"""
+    return {"success": shell_manager.close(session_id), "session_id": session_id}
+
+@app.get("/api/terminal/stats")
+async def terminal_stats_endpoint():
+    """Report persistent shell usage on this node"""
+    return shell_manager.stats()
+
+@app.on_event("startup")
+async def warm_python_kernels():
+    """Start pre-warming Python kernels so the first snippet skips interpreter startup"""
+    kernel_pool.refill()
+
+@app.on_event("startup")
+async def start_shell_reaper():
+    """Periodically close idle persistent shells and abandoned uploads"""
+    async def reap():
+        while True:
+            await asyncio.sleep(60)
+            await asyncio.to_thread(shell_manager.reap_idle)
+            await asyncio.to_thread(upload_store.reap_expired)
+    asyncio.create_task(reap())
+
+@app.on_event("startup")
+async def start_blob_collector():
+    """Periodically delete blobs that have not been used for a while"""
+    async def collect():
+        while True:
+            await asyncio.sleep(BLOB_GC_INTERVAL)
+            result = await asyncio.to_thread(blob_store.collect)
+            if result["removed"]:
+                logger.info(f"Blob store GC removed {result['removed']} blobs ({result['freed_bytes']} bytes)")
+    asyncio.create_task(collect())
+
+@app.on_event("startup")
+async def start_session_evictor():
+    """Periodically park sessions that have gone cold"""
+    async def evict():
+        while True:
+            await asyncio.sleep(SESSION_EVICT_INTERVAL)
+            await asyncio.to_thread(evict_cold_sessions)
+    asyncio.create_task(evict())
+
+@app.on_event("shutdown")
+async def stop_workers():
+    shell_manager.close_all()
+    kernel_pool.close_all()
+
 # Helper functions
 async def _execute_tool_call(tool_call, session_id):
     """Execute a tool call"""
-    _, session = get_or_create_session(session_id)
+    _, session = await get_or_create_session_async(session_id)
     workspace = session["context"]["workspace_root"]
     
     tool_id = tool_call.id
@@ -1160,16 +2952,33 @@ async def _execute_tool_call(tool_call, session_id):
     tool_map = {
         "read_file": lambda: Tools.read_file(
             args["file_path"],
-            workspace
+            workspace,
+            args.get("offset"),
+            args.get("length"),
+            args.get("start_line"),
+            args.get("end_line"),
+            args.get("tail")
         ),
         "write_file": lambda: Tools.write_file(
             args["file_path"],
             args["content"],
             workspace
         ),
+        "apply_patch": lambda: Tools.apply_patch(
+            workspace,
+            args.get("patch"),
+            args.get("edits"),
+            args.get("expected_hashes"),
+            args.get("dry_run", False)
+        ),
         "list_directory": lambda: Tools.list_directory(
             args.get("directory", "."),
-            workspace
+            workspace,
+            args.get("sort_by", "name"),
+            args.get("reverse", False),
+            args.get("cursor"),
+            args.get("limit", DEFAULT_LISTING_PAGE_SIZE),
+            args.get("classify", False)
         ),
         "search_files": lambda: Tools.search_files(
             args["pattern"],
@@ -1180,7 +2989,17 @@ async def _execute_tool_call(tool_call, session_id):
             args["command"],
             args.get("working_dir"),
             workspace,
-            args.get("timeout", 30)
+            args.get("timeout", 30),
+            args.get("persistent", False),
+            session_id,
+            args.get("limits")
+        ),
+        "execute_python": lambda: Tools.execute_python(
+            args["code"],
+            session_id,
+            workspace,
+            args.get("timeout", 30),
+            args.get("reset", False)
         ),
         "create_project_structure": lambda: Tools.create_project_structure(
             args["structure"],
@@ -1200,13 +3019,16 @@ async def _execute_tool_call(tool_call, session_id):
             args["repository_url"], 
             workspace, 
             args.get("directory_name"),
-            args.get("branch")
+            args.get("branch"),
+            args.get("depth"),
+            args.get("filter_blobs", False)
         )
     }
     
     # Execute the tool
     try:
-        result = tool_map[tool_name]()
+        # Tools block on files, shells, kernels and the network, so none run on the event loop
+        result = await asyncio.to_thread(tool_map[tool_name])
         return {
             "tool": tool_name,
             "result": result,
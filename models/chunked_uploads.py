@@ -0,0 +1,333 @@
+"""Resumable chunked uploads shared by the assistant servers.
+
+Clients open an upload, PUT byte ranges at explicit offsets (in any order
+and in parallel), ask which ranges are still missing after a dropped
+connection, and finally complete the upload. Chunks stream straight into a
+preallocated temp file; the SHA-256 is advanced over the contiguous prefix
+as data lands, so completion only has to hash whatever arrived out of order.
+On completion the temp file is fsynced and atomically renamed into place.
+Every operation on an upload must name the session that created it.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+HASH_READ_SIZE = 1024 * 1024
+UPLOAD_EXPIRY_SECONDS = 24 * 3600
+
+class UploadError(Exception):
+    """Raised for invalid chunk requests; status is the HTTP status to report"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def add_range(ranges, start, end):
+    """Merge [start, end) into a sorted list of disjoint [start, end] pairs"""
+    merged = []
+    for s, e in ranges:
+        if e < start or s > end:
+            merged.append([s, e])
+        else:
+            start, end = min(s, start), max(e, end)
+    merged.append([start, end])
+    merged.sort()
+    return merged
+
+def missing_ranges(ranges, total_size):
+    missing = []
+    position = 0
+    for s, e in ranges:
+        if s > position:
+            missing.append([position, s])
+        position = max(position, e)
+    if total_size is not None and position < total_size:
+        missing.append([position, total_size])
+    return missing
+
+class ChunkedUpload:
+    def __init__(self, upload_id, temp_path, destination, total_size=None, expected_sha256=None, owner=None):
+        self.upload_id = upload_id
+        self.temp_path = temp_path
+        self.destination = destination
+        self.total_size = total_size
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.owner = owner
+        self.ranges = []
+        self.created = time.time()
+        self.updated = self.created
+        self.lock = threading.Lock()
+        # Hash of bytes [0, hashed_offset); not persisted, rebuilt from disk after a restart
+        self.hasher = hashlib.sha256()
+        self.hashed_offset = 0
+        self.active_writes = 0
+
+    def to_dict(self):
+        return {
+            "upload_id": self.upload_id,
+            "temp_path": self.temp_path,
+            "destination": self.destination,
+            "total_size": self.total_size,
+            "expected_sha256": self.expected_sha256,
+            "owner": self.owner,
+            "ranges": self.ranges,
+            "created": self.created,
+            "updated": self.updated
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        upload = cls(data["upload_id"], data["temp_path"], data["destination"],
+                     data.get("total_size"), data.get("expected_sha256"), data.get("owner"))
+        upload.ranges = [list(r) for r in data.get("ranges", [])]
+        upload.created = data.get("created", upload.created)
+        upload.updated = data.get("updated", upload.updated)
+        return upload
+
+    def received_bytes(self):
+        return sum(e - s for s, e in self.ranges)
+
+    def status(self):
+        return {
+            "upload_id": self.upload_id,
+            "destination": self.destination,
+            "total_size": self.total_size,
+            "received_bytes": self.received_bytes(),
+            "received_ranges": self.ranges,
+            "missing_ranges": missing_ranges(self.ranges, self.total_size),
+            # Sequential clients resume from here
+            "next_offset": self.ranges[0][1] if self.ranges and self.ranges[0][0] == 0 else 0
+        }
+
+class ChunkedUploadStore:
+    """Tracks in-progress uploads under one staging directory"""
+
+    def __init__(self, root, chunk_size=DEFAULT_CHUNK_SIZE, expiry_seconds=UPLOAD_EXPIRY_SECONDS):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.expiry_seconds = expiry_seconds
+        self.uploads = {}
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.root, f"{upload_id}.json")
+
+    def _load(self):
+        """Pick up uploads that were in progress before a restart"""
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name)) as f:
+                    upload = ChunkedUpload.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                continue
+            if os.path.exists(upload.temp_path):
+                self.uploads[upload.upload_id] = upload
+
+    def _save(self, upload):
+        meta_path = self._meta_path(upload.upload_id)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(upload.to_dict(), f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def create(self, destination, total_size=None, expected_sha256=None, owner=None):
+        if total_size is not None and total_size < 0:
+            raise UploadError("size must not be negative")
+        upload_id = uuid.uuid4().hex
+        temp_path = os.path.join(self.root, f"{upload_id}.part")
+        with open(temp_path, "wb") as f:
+            if total_size:
+                # Reserve the full size so parallel chunks can land anywhere
+                f.truncate(total_size)
+        upload = ChunkedUpload(upload_id, temp_path, destination, total_size, expected_sha256, owner)
+        with self.lock:
+            self.uploads[upload_id] = upload
+        self._save(upload)
+        return upload
+
+    def get(self, upload_id, owner):
+        upload = self.uploads.get(upload_id)
+        # Other sessions' uploads look exactly like missing ones
+        if upload is None or not owner or upload.owner != owner:
+            raise UploadError(f"Unknown upload: {upload_id}", status=404)
+        return upload
+
+    def _advance_hash(self, upload):
+        """Hash any bytes that became contiguous with the hashed prefix (caller holds the lock)"""
+        if not upload.ranges or upload.ranges[0][0] != 0:
+            return
+        end = upload.ranges[0][1]
+        if upload.hashed_offset >= end:
+            return
+        with open(upload.temp_path, "rb") as f:
+            f.seek(upload.hashed_offset)
+            while upload.hashed_offset < end:
+                data = f.read(min(HASH_READ_SIZE, end - upload.hashed_offset))
+                if not data:
+                    break
+                upload.hasher.update(data)
+                upload.hashed_offset += len(data)
+
+    def _advance_hash_locked(self, upload):
+        with upload.lock:
+            self._advance_hash(upload)
+
+    async def write_stream(self, upload_id, offset, stream, owner):
+        """Write an async byte stream at offset; returns the upload status"""
+        upload = self.get(upload_id, owner)
+        if offset < 0:
+            raise UploadError("offset must not be negative")
+
+        position = offset
+        fd = os.open(upload.temp_path, os.O_WRONLY)
+        with upload.lock:
+            upload.active_writes += 1
+            # Hash in-order data as it streams instead of re-reading it later
+            hash_inline = upload.hashed_offset == offset
+        try:
+            async for data in stream:
+                if not data:
+                    continue
+                if upload.total_size is not None and position + len(data) > upload.total_size:
+                    raise UploadError("chunk extends past the declared upload size", status=416)
+                os.pwrite(fd, data, position)
+                with upload.lock:
+                    if hash_inline and upload.hashed_offset == position:
+                        upload.hasher.update(data)
+                        upload.hashed_offset += len(data)
+                    else:
+                        hash_inline = False
+                position += len(data)
+        finally:
+            os.close(fd)
+            with upload.lock:
+                upload.active_writes -= 1
+                # Record whatever did land so a dropped connection can resume from there
+                if position > offset:
+                    upload.ranges = add_range(upload.ranges, offset, position)
+                    upload.updated = time.time()
+                    self._save(upload)
+
+        # Catching up on out-of-order chunks reads the file back; keep it off the event loop
+        await asyncio.to_thread(self._advance_hash_locked, upload)
+        status = upload.status()
+        status["chunk_bytes"] = position - offset
+        return status
+
+    def complete(self, upload_id, owner):
+        """Verify, fsync and move the finished file to its destination"""
+        upload = self.get(upload_id, owner)
+        with upload.lock:
+            if upload.active_writes:
+                raise UploadError("chunks are still being written", status=409)
+            size = upload.total_size
+            if size is None:
+                size = upload.ranges[-1][1] if upload.ranges else 0
+            if missing_ranges(upload.ranges, size):
+                raise UploadError("upload is incomplete", status=409)
+
+            self._advance_hash(upload)
+            digest = upload.hasher.hexdigest()
+            if upload.expected_sha256 and digest != upload.expected_sha256:
+                raise UploadError(f"SHA-256 mismatch: expected {upload.expected_sha256}, got {digest}", status=422)
+
+            with open(upload.temp_path, "r+b") as f:
+                f.truncate(size)
+                f.flush()
+                os.fsync(f.fileno())
+            os.makedirs(os.path.dirname(os.path.abspath(upload.destination)), exist_ok=True)
+            os.replace(upload.temp_path, upload.destination)
+            self._discard(upload)
+
+        return {"upload_id": upload_id, "destination": upload.destination, "size": size, "sha256": digest}
+
+    def abort(self, upload_id, owner):
+        self._abort(self.get(upload_id, owner))
+
+    def _abort(self, upload):
+        with upload.lock:
+            self._discard(upload)
+            try:
+                os.remove(upload.temp_path)
+            except OSError:
+                pass
+
+    def _discard(self, upload):
+        with self.lock:
+            self.uploads.pop(upload.upload_id, None)
+        try:
+            os.remove(self._meta_path(upload.upload_id))
+        except OSError:
+            pass
+
+    def reap_expired(self):
+        """Drop uploads nobody has touched for expiry_seconds"""
+        cutoff = time.time() - self.expiry_seconds
+        expired = [u for u in list(self.uploads.values())
+                   if u.updated < cutoff and not u.active_writes]
+        for upload in expired:
+            self._abort(upload)
+        return [upload.upload_id for upload in expired]
+
+def save_stream(source, destination, chunk_size=1024 * 1024, make_dirs=True):
+    """Blocking counterpart of save_upload_file for a readable file object.
+
+    Safe to run on worker threads; returns (size, sha256).
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    if make_dirs:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{os.path.basename(destination)}.{uuid.uuid4().hex[:8]}.part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                data = source.read(chunk_size)
+                if not data:
+                    break
+                hasher.update(data)
+                f.write(data)
+                size += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return size, hasher.hexdigest()
+
+async def save_upload_file(upload_file, destination, chunk_size=1024 * 1024):
+    """Stream a multipart UploadFile to destination through a temp file.
+
+    Returns (size, sha256). Memory use is bounded by chunk_size.
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{os.path.basename(destination)}.{uuid.uuid4().hex[:8]}.part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                data = await upload_file.read(chunk_size)
+                if not data:
+                    break
+                hasher.update(data)
+                f.write(data)
+                size += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return size, hasher.hexdigest()
@@ -0,0 +1,582 @@
+"""Static code metrics for workspace repositories.
+
+Source files are found with the workspace walker (so ignored, vendored and
+generated files are skipped) and analyzed one by one: line counts, comment
+lines, and the size and cyclomatic complexity of every function. Python is
+parsed with `ast`. Brace languages (JavaScript/TypeScript, Java, C/C++, C#,
+Go, Rust, ...) use a token heuristic: strings and comments are blanked out,
+function bodies are found by matching braces after a function-like header,
+and decision points (if, for, while, case, catch, &&, ||, ?) are counted
+inside them.
+
+Results are cached by content hash, and each file's stat is remembered, so
+a re-scan only reads files whose size or mtime changed, reads each of them
+once, and only analyzes content it has never seen. Large batches of changed
+files are hashed and analyzed on a process pool; workers cannot see the
+cache, so there every changed file is analyzed. A pool that breaks (a
+worker killed by the OOM killer, say) is dropped and the batch is redone
+in-process. Each scan is summarized into repository metrics. A snapshot is
+kept whenever the content changes, and trends compare against the previous
+snapshot. Request handlers use `latest`, which returns the last summary at
+once and leaves scanning to a background thread.
+"""
+import ast
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from workspace_walker import walk_workspace
+
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript",
+    ".java": "java", ".kt": "kotlin", ".scala": "scala", ".cs": "csharp",
+    ".c": "c", ".h": "c", ".cc": "cpp", ".cpp": "cpp", ".hpp": "cpp",
+    ".go": "go", ".rs": "rust", ".swift": "swift", ".php": "php"
+}
+TEST_PATH_PATTERN = re.compile(r"(^|/)(tests?|__tests__|spec)/|(^|/)test_[^/]*$|_test\.\w+$|\.(test|spec)\.\w+$")
+# Thresholds behind the code quality score
+COMPLEX_FUNCTION = 10
+LONG_FUNCTION = 60
+TARGET_COMMENT_RATIO = 0.1
+FUNCTION_SIZE_BINS = [1, 5, 10, 20, 40, 80, 160]
+COMPLEXITY_BINS = [1, 2, 5, 10, 20, 50]
+# Fewer new files than this are analyzed in-process; the pool's startup would dominate
+POOL_MIN_FILES = 64
+POOL_CHUNK_SIZE = 16
+HISTORY_LIMIT = 200
+# results.jsonl is rewritten once it holds this many times more lines than live results
+COMPACT_FACTOR = 2
+
+# Python
+
+PYTHON_DECISIONS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler,
+                    ast.Assert, ast.comprehension, ast.match_case)
+
+def python_decisions(node):
+    if isinstance(node, ast.BoolOp):
+        return len(node.values) - 1
+    if isinstance(node, ast.comprehension):
+        return 1 + len(node.ifs)
+    return 1 if isinstance(node, PYTHON_DECISIONS) else 0
+
+def python_functions(tree):
+    """[name, line, size, complexity] per function; nested functions are counted on their own"""
+    functions = []
+
+    def visit(node, counter):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                inner = [1]
+                visit(child, inner)
+                functions.append([child.name, child.lineno, child.end_lineno - child.lineno + 1, inner[0]])
+            else:
+                if counter is not None:
+                    counter[0] += python_decisions(child)
+                visit(child, counter)
+
+    visit(tree, None)
+    return functions
+
+def analyze_python(text):
+    tree = ast.parse(text)
+    lines = text.splitlines()
+    comments = sum(1 for line in lines if line.lstrip().startswith("#"))
+    blank = sum(1 for line in lines if not line.strip())
+    decisions = sum(python_decisions(node) for node in ast.walk(tree))
+    return {"lines": len(lines), "blank": blank, "comments": comments,
+            "complexity": 1 + decisions, "functions": python_functions(tree)}
+
+# Brace languages
+
+STRIP_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`', re.S)
+TOKEN_PATTERN = re.compile(r"[{};]|\b(?:if|for|foreach|while|case|catch|when|guard)\b|&&|\|\||\?(?![.?:;),\]])")
+KEYWORD_FUNCTION = re.compile(r"\b(?:function|func|fn|def)\b")
+NAME_BEFORE = re.compile(r"([A-Za-z_$][\w$]*)\s*$")
+CONTROL_WORDS = {"if", "for", "foreach", "while", "switch", "catch", "with", "return", "else", "do", "try",
+                 "finally", "synchronized", "using", "lock", "match", "loop", "select", "new", "typeof", "sizeof"}
+# After the closing parenthesis these mean a type declaration follows (e.g. JS without semicolons)
+DECLARATION_WORDS = re.compile(r"\b(?:class|interface|struct|enum|extends|implements|namespace|impl|trait|object)\b")
+HEADER_LOOKBACK = 300
+
+def _blank(match):
+    text = match.group()
+    # Strings stay as a placeholder so their lines still count as code
+    prefix = '""' if text[0] in "\"'`" else ""
+    return prefix + "\n" * text.count("\n")
+
+def function_header(header):
+    """Function name if the text before a "{" looks like a function header, else None"""
+    header = header.rstrip()
+    keyword = KEYWORD_FUNCTION.search(header)
+    if keyword:
+        name = re.match(r"\s*(?:\([^)]*\)\s*)?([A-Za-z_$][\w$]*)", header[keyword.end():])
+        return name.group(1) if name else "<anonymous>"
+    if header.endswith("=>"):
+        return "<anonymous>"
+    close = header.rfind(")")
+    trailing = header[close + 1:]
+    if close < 0 or any(c in trailing for c in "()=") or DECLARATION_WORDS.search(trailing):
+        return None
+    depth = 0
+    for i in range(close, -1, -1):
+        if header[i] == ")":
+            depth += 1
+        elif header[i] == "(":
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        return None
+    name = NAME_BEFORE.search(header[:i])
+    if not name or name.group(1) in CONTROL_WORDS:
+        return None
+    return name.group(1)
+
+def analyze_braces(text):
+    code = STRIP_PATTERN.sub(_blank, text)
+    original_lines = text.splitlines()
+    code_lines = code.splitlines()
+    blank = sum(1 for line in original_lines if not line.strip())
+    comments = sum(1 for line, stripped in zip(original_lines, code_lines) if line.strip() and not stripped.strip())
+    newlines = [m.start() for m in re.finditer("\n", code)]
+
+    functions = []
+    stack = []
+    boundary = 0
+    decisions = 0
+    for match in TOKEN_PATTERN.finditer(code):
+        token = match.group()
+        if token == "{":
+            name = function_header(code[max(boundary, match.start() - HEADER_LOOKBACK):match.start()])
+            line = bisect.bisect_left(newlines, match.start()) + 1
+            # [name, start line, decisions] for functions, None for other blocks
+            stack.append([name, line, 1] if name else None)
+            boundary = match.end()
+        elif token == "}":
+            if stack:
+                frame = stack.pop()
+                if frame is not None:
+                    end = bisect.bisect_left(newlines, match.start()) + 1
+                    functions.append([frame[0], frame[1], end - frame[1] + 1, frame[2]])
+            boundary = match.end()
+        elif token == ";":
+            boundary = match.end()
+        else:
+            decisions += 1
+            for frame in reversed(stack):
+                if frame is not None:
+                    frame[2] += 1
+                    break
+    return {"lines": len(original_lines), "blank": blank, "comments": comments,
+            "complexity": 1 + decisions, "functions": functions}
+
+def analyze_source(text, language):
+    """Line counts, complexity and functions for one file's text"""
+    if language == "python":
+        try:
+            return dict(analyze_python(text), parser="ast")
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    return dict(analyze_braces(text), parser="heuristic")
+
+def content_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def analyze_content(data, language):
+    return dict(analyze_source(data.decode("utf-8", "replace"), language), language=language)
+
+def analyze_file(job):
+    """Process-pool entry point: (path, language) -> (digest, result); (None, None) if unreadable"""
+    path, language = job
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None, None
+    return content_digest(data), analyze_content(data, language)
+
+# Coverage reports
+
+def read_coverage_report(root):
+    """Line coverage percent and report name from common report files, or None"""
+    candidates = [
+        ("coverage.xml", "cobertura"), ("coverage/cobertura-coverage.xml", "cobertura"),
+        ("coverage/coverage-summary.json", "istanbul"), ("coverage/lcov.info", "lcov"), ("lcov.info", "lcov")
+    ]
+    for name, kind in candidates:
+        path = os.path.join(root, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            if kind == "cobertura":
+                with open(path, "rb") as f:
+                    head = f.read(4096).decode("utf-8", "replace")
+                match = re.search(r'<coverage[^>]*\sline-rate="([\d.]+)"', head)
+                if match:
+                    return round(float(match.group(1)) * 100, 1), name
+            elif kind == "istanbul":
+                with open(path) as f:
+                    return round(float(json.load(f)["total"]["lines"]["pct"]), 1), name
+            else:
+                found = hit = 0
+                with open(path) as f:
+                    for line in f:
+                        if line.startswith("LF:"):
+                            found += int(line[3:])
+                        elif line.startswith("LH:"):
+                            hit += int(line[3:])
+                if found:
+                    return round(hit / found * 100, 1), name
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+    return None
+
+# Aggregation
+
+def summarize_files(files, coverage=None):
+    """Aggregate [(rel_path, result)] into repository metrics"""
+    sizes, complexities, hotspots = [], [], []
+    languages = {}
+    source_code = test_code = comments = lines = 0
+    for rel_path, result in files:
+        code = result["lines"] - result["blank"] - result["comments"]
+        lines += result["lines"]
+        comments += result["comments"]
+        if TEST_PATH_PATTERN.search(rel_path):
+            test_code += code
+        else:
+            source_code += code
+        language = languages.setdefault(result["language"], {"files": 0, "code": 0, "functions": 0})
+        language["files"] += 1
+        language["code"] += code
+        language["functions"] += len(result["functions"])
+        for name, line, size, complexity in result["functions"]:
+            sizes.append(size)
+            complexities.append(complexity)
+            hotspots.append((complexity, size, rel_path, name, line))
+
+    sizes = np.array(sizes, dtype=np.int64)
+    complexities = np.array(complexities, dtype=np.int64)
+    code_total = source_code + test_code
+    comment_ratio = comments / max(code_total + comments, 1)
+    complex_share = float((complexities > COMPLEX_FUNCTION).mean()) if len(complexities) else 0.0
+    long_share = float((sizes > LONG_FUNCTION).mean()) if len(sizes) else 0.0
+    # 100 for small, simple, documented functions; each shortfall costs its weight
+    quality = 100 * (1 - 0.5 * complex_share - 0.3 * long_share
+                     - 0.2 * max(0.0, TARGET_COMMENT_RATIO - comment_ratio) / TARGET_COMMENT_RATIO)
+
+    if coverage is not None:
+        test_coverage, coverage_source = coverage
+    else:
+        # No report: share of code that is test code, scaled so 1:1 tests to source reads as 100
+        test_coverage = round(min(100.0, 200 * test_code / max(code_total, 1)), 1)
+        coverage_source = "estimate"
+
+    def histogram(values, bins):
+        edges = bins + [np.inf]
+        counts = np.histogram(values, bins=edges)[0] if len(values) else np.zeros(len(bins), dtype=np.int64)
+        return {"bins": [f"{low}-{high - 1}" if high != np.inf else f"{low}+" for low, high in zip(edges[:-1], edges[1:])],
+                "counts": [int(count) for count in counts]}
+
+    hotspots.sort(reverse=True)
+    return {
+        "code_quality": round(quality, 1),
+        "test_coverage": test_coverage,
+        "coverage_source": coverage_source,
+        "files": len(files),
+        "lines": lines,
+        "code_lines": code_total,
+        "test_lines": test_code,
+        "comment_ratio": round(comment_ratio, 3),
+        "functions": int(len(sizes)),
+        "average_complexity": round(float(complexities.mean()), 2) if len(complexities) else 0.0,
+        "max_complexity": int(complexities.max()) if len(complexities) else 0,
+        "complex_functions": int((complexities > COMPLEX_FUNCTION).sum()),
+        "long_functions": int((sizes > LONG_FUNCTION).sum()),
+        "function_size": {
+            "median": float(np.median(sizes)) if len(sizes) else 0.0,
+            "p90": float(np.percentile(sizes, 90)) if len(sizes) else 0.0,
+            "histogram": histogram(sizes, FUNCTION_SIZE_BINS)
+        },
+        "complexity_histogram": histogram(complexities, COMPLEXITY_BINS),
+        "languages": languages,
+        "hotspots": [{"file": path, "function": name, "line": line, "complexity": complexity, "size": size}
+                     for complexity, size, path, name, line in hotspots[:10]]
+    }
+
+class MetricsEngine:
+    def __init__(self, cache_dir=None, workers=None, max_results=200_000, max_files=200_000, max_repositories=64):
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.max_results = max_results
+        self.max_files = max_files
+        self.max_repositories = max_repositories
+        self.results = OrderedDict()
+        self.result_lines = 0
+        # path -> ((size, mtime_ns), digest), least recently scanned first
+        self.file_digests = OrderedDict()
+        self.history = {}
+        # root -> (finished_at, summary) of its last scan
+        self.summaries = OrderedDict()
+        self.scanning = set()
+        self.pool = None
+        self.lock = threading.Lock()
+        # Serializes scans; only background threads and direct scan() callers wait on it
+        self.scan_lock = threading.Lock()
+        self.counters = {"scans": 0, "files_read": 0, "files_analyzed": 0, "files_reused": 0,
+                         "background_scans": 0, "compactions": 0, "pool_failures": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_results()
+
+    # Content cache, appended to a JSON lines file and compacted when it grows
+
+    def _results_path(self):
+        return os.path.join(self.cache_dir, "results.jsonl")
+
+    def _load_results(self):
+        try:
+            with open(self._results_path()) as f:
+                for line in f:
+                    self.result_lines += 1
+                    try:
+                        record = json.loads(line)
+                        self.results[record["digest"]] = record["result"]
+                    except (ValueError, KeyError):
+                        continue
+                    self.results.move_to_end(record["digest"])
+                    if len(self.results) > self.max_results:
+                        self.results.popitem(last=False)
+        except OSError:
+            pass
+        if self.result_lines > COMPACT_FACTOR * max(len(self.results), 1024):
+            self._compact_results()
+
+    def _compact_results(self):
+        """Rewrite results.jsonl with only the results still held in memory"""
+        path = self._results_path()
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                for digest, result in self.results.items():
+                    f.write(json.dumps({"digest": digest, "result": result}) + "\n")
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.result_lines = len(self.results)
+        with self.lock:
+            self.counters["compactions"] += 1
+
+    def _store_results(self, new_results):
+        self.results.update(new_results)
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        if not self.cache_dir or not new_results:
+            return
+        try:
+            with open(self._results_path(), "a") as f:
+                for digest, result in new_results.items():
+                    f.write(json.dumps({"digest": digest, "result": result}) + "\n")
+            self.result_lines += len(new_results)
+        except OSError:
+            pass
+        if self.result_lines > COMPACT_FACTOR * max(len(self.results), 1024):
+            self._compact_results()
+
+    def _get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                # Spawned workers do not inherit the server's threads and locks
+                self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            return self.pool
+
+    def _analyze(self, jobs):
+        """Read, hash and analyze (path, language) jobs; returns (digest, result) per job.
+
+        digest is None for unreadable files. In-process, content already in
+        the cache is not analyzed again and its result is None.
+        """
+        if len(jobs) >= POOL_MIN_FILES and self.workers >= 2:
+            pool = self._get_pool()
+            try:
+                return list(pool.map(analyze_file, jobs, chunksize=POOL_CHUNK_SIZE))
+            except BrokenProcessPool:
+                # A worker died; the next large batch starts a fresh pool
+                with self.lock:
+                    if self.pool is pool:
+                        self.pool = None
+                    self.counters["pool_failures"] += 1
+                pool.shutdown(wait=False, cancel_futures=True)
+        outputs = []
+        for path, language in jobs:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                outputs.append((None, None))
+                continue
+            digest = content_digest(data)
+            outputs.append((digest, None if digest in self.results else analyze_content(data, language)))
+        return outputs
+
+    # History
+
+    def _history_path(self, root):
+        return os.path.join(self.cache_dir, f"history-{hashlib.sha256(root.encode('utf-8')).hexdigest()[:24]}.json")
+
+    def _load_history(self, root):
+        if root not in self.history:
+            history = []
+            if self.cache_dir:
+                try:
+                    with open(self._history_path(root)) as f:
+                        history = json.load(f)
+                except (OSError, ValueError):
+                    history = []
+            self.history[root] = history
+        return self.history[root]
+
+    def _record(self, root, fingerprint, values):
+        """Store a snapshot when the content changed; return the snapshot to compare against"""
+        history = self._load_history(root)
+        if history and history[-1]["fingerprint"] == fingerprint:
+            return history[-2] if len(history) > 1 else None
+        previous = history[-1] if history else None
+        history.append({"timestamp": time.time(), "fingerprint": fingerprint, "metrics": values})
+        del history[:-HISTORY_LIMIT]
+        if self.cache_dir:
+            path = self._history_path(root)
+            temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(temp_path, "w") as f:
+                    json.dump(history, f)
+                os.replace(temp_path, path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        return previous
+
+    # Scanning
+
+    def scan(self, root):
+        """Analyze every source file under root, reusing cached results for unchanged content.
+
+        Returns the summary from summarize_files plus "previous" (the last
+        snapshot with different content, or None), "history" and "scan" stats.
+        """
+        started = time.perf_counter()
+        root = os.path.realpath(root)
+        with self.scan_lock:
+            # (rel_path, digest) per file; digest is None until a changed file is read
+            found, changed, jobs = [], [], []
+            seen = set()
+            for entry in walk_workspace(root, file_filter=lambda path, stats: os.path.splitext(path)[1].lower() in LANGUAGES):
+                language = LANGUAGES[os.path.splitext(entry.path)[1].lower()]
+                signature = (entry.stat.st_size, entry.stat.st_mtime_ns)
+                seen.add(entry.path)
+                known = self.file_digests.get(entry.path)
+                if known and known[0] == signature and known[1] in self.results:
+                    self.file_digests.move_to_end(entry.path)
+                    found.append((entry.rel_path, known[1]))
+                else:
+                    changed.append((len(found), entry.path, signature))
+                    jobs.append((entry.path, language))
+                    found.append((entry.rel_path, None))
+            self._prune_digests(root, seen)
+
+            new_results = {}
+            read = 0
+            for (index, path, signature), (digest, result) in zip(changed, self._analyze(jobs)):
+                if digest is None:
+                    self.file_digests.pop(path, None)
+                    continue
+                read += 1
+                self.file_digests[path] = (signature, digest)
+                self.file_digests.move_to_end(path)
+                found[index] = (found[index][0], digest)
+                if result is not None and digest not in self.results:
+                    new_results[digest] = result
+            self._store_results(new_results)
+            files = [(rel_path, digest) for rel_path, digest in found if digest is not None]
+            for _, digest in files:
+                if digest in self.results:
+                    self.results.move_to_end(digest)
+            results = [(rel_path, self.results[digest]) for rel_path, digest in files if digest in self.results]
+            summary = summarize_files(results, read_coverage_report(root))
+
+            fingerprint = hashlib.sha256("".join(sorted(f"{p}:{d}" for p, d in files)).encode("utf-8")).hexdigest()
+            tracked = {key: summary[key] for key in ("code_quality", "test_coverage", "code_lines", "functions",
+                                                     "average_complexity", "max_complexity", "comment_ratio")}
+            previous = self._record(root, fingerprint, tracked)
+
+        with self.lock:
+            self.counters["scans"] += 1
+            self.counters["files_read"] += read
+            self.counters["files_analyzed"] += len(new_results)
+            self.counters["files_reused"] += len(files) - len(new_results)
+        summary["previous"] = previous
+        summary["history"] = [{"timestamp": snapshot["timestamp"], **snapshot["metrics"]}
+                              for snapshot in self.history[root][-30:]]
+        summary["scan"] = {"files": len(files), "read": read, "analyzed": len(new_results),
+                           "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+        with self.lock:
+            self.summaries.pop(root, None)
+            self.summaries[root] = (time.time(), summary)
+            while len(self.summaries) > self.max_repositories:
+                self.summaries.popitem(last=False)
+        return summary
+
+    def _prune_digests(self, root, seen):
+        """Forget files under root that this scan no longer found, then cap the total"""
+        prefix = root.rstrip(os.sep) + os.sep
+        for path in [path for path in self.file_digests if path.startswith(prefix) and path not in seen]:
+            del self.file_digests[path]
+        while len(self.file_digests) > self.max_files:
+            self.file_digests.popitem(last=False)
+
+    def latest(self, root, max_age=30.0):
+        """Last summary for root without waiting for a scan.
+
+        Starts a background scan when root has no summary or it is older than
+        max_age seconds. Returns (summary, scanning); summary is None until
+        the first scan of root finishes.
+        """
+        root = os.path.realpath(root)
+        with self.lock:
+            entry = self.summaries.get(root)
+            if (entry is None or time.time() - entry[0] > max_age) and root not in self.scanning:
+                self.scanning.add(root)
+                self.counters["background_scans"] += 1
+                threading.Thread(target=self._background_scan, args=(root,), daemon=True).start()
+            scanning = root in self.scanning
+        return (entry[1] if entry else None), scanning
+
+    def _background_scan(self, root):
+        try:
+            self.scan(root)
+        except Exception as e:
+            print(f"Error scanning metrics for {root}: {str(e)}")
+        finally:
+            with self.lock:
+                self.scanning.discard(root)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "cached_results": len(self.results), "tracked_files": len(self.file_digests),
+                    "scanning": len(self.scanning), "workers": self.workers, "disk_enabled": bool(self.cache_dir)}
@@ -0,0 +1,85 @@
+"""Small launcher that runs one shell command under resource limits.
+
+The assistant server is a large process; anything forked from it inherits
+its memory high-water mark, which makes ru_maxrss useless. This script is
+started fresh, applies the limits in its own child and reports that
+child's exact resource usage as JSON on the file descriptor it is given.
+
+Usage: command_runner.py <spec-json> <report-fd>
+"""
+import json
+import os
+import resource
+import signal
+import sys
+
+def apply_limits(spec):
+    """Apply the non-zero limits; a limit of 0 is left off"""
+    limits = spec["limits"]
+    if spec.get("cgroup"):
+        with open(os.path.join(spec["cgroup"], "cgroup.procs"), "w") as f:
+            f.write("0")
+    if limits["cpu_seconds"]:
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu_seconds"], limits["cpu_seconds"] + 5))
+    if limits["memory_bytes"]:
+        resource.setrlimit(resource.RLIMIT_AS, (limits["memory_bytes"], limits["memory_bytes"]))
+    if limits["open_files"]:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limits["open_files"], limits["open_files"]))
+    # The cgroup's pids.max counts only this command's processes; RLIMIT_NPROC
+    # counts every process of the UID, so it is only a fallback
+    pids_controlled = spec.get("cgroup") and os.path.exists(os.path.join(spec["cgroup"], "pids.max"))
+    if limits["processes"] and not pids_controlled:
+        resource.setrlimit(resource.RLIMIT_NPROC, (limits["processes"], limits["processes"]))
+
+def main():
+    spec = json.loads(sys.argv[1])
+    report_fd = int(sys.argv[2])
+
+    child = {}
+
+    def terminate(signum, frame):
+        # SIGTERM from the server means timeout: kill the whole command tree
+        if child:
+            try:
+                os.killpg(child["pid"], signal.SIGKILL)
+            except OSError:
+                pass
+
+    signal.signal(signal.SIGTERM, terminate)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            # Own process group so the whole command tree can be killed at once
+            os.setpgid(0, 0)
+            apply_limits(spec)
+            os.execv("/bin/sh", ["/bin/sh", "-c", spec["command"]])
+        finally:
+            os._exit(127)
+    child["pid"] = pid
+
+    while True:
+        try:
+            _, status, usage = os.wait4(pid, 0)
+            break
+        except InterruptedError:
+            continue
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    report = {
+        "exit_code": exit_code,
+        "cpu_user_seconds": usage.ru_utime,
+        "cpu_system_seconds": usage.ru_stime,
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        "max_rss_bytes": usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+        "io_read_bytes": usage.ru_inblock * 512,
+        "io_write_bytes": usage.ru_oublock * 512,
+    }
+    with os.fdopen(report_fd, "w") as f:
+        f.write(json.dumps(report))
+
+    sys.exit(exit_code if exit_code >= 0 else 128 - exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Result cache for generated dashboards.
+
+Entries are keyed by a normalized project description plus the generation
+parameters, so trivially different inputs ("A chat app." vs "a  chat app")
+share one entry; punctuation inside the text is kept, so "C++" and "C" do
+not. Fresh entries are served directly. Entries past their TTL
+but inside the stale window are served at once while a background thread
+recomputes them (stale-while-revalidate). The memory tier is an LRU bounded
+by entry count. An optional disk tier keeps entries across restarts.
+Concurrent misses for one key are collapsed into a single computation,
+including streamed ones (stream()), whose followers replay the leader's result.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+
+DISK_PRUNE_EVERY = 32
+TRAILING_PUNCTUATION = ".,;:!?… "
+
+def normalize_description(text):
+    """Fold case, unicode forms, whitespace and trailing punctuation"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(text.split()).rstrip(TRAILING_PUNCTUATION)
+
+def make_key(*parts):
+    """Stable hex key for a normalized description and parameters"""
+    normalized = [normalize_description(part) if isinstance(part, str) else part for part in parts]
+    return hashlib.sha256(json.dumps(normalized, default=str).encode("utf-8")).hexdigest()
+
+class DashboardCache:
+    def __init__(self, max_entries=256, ttl=3600, stale_ttl=86400, disk_dir=None, max_disk_entries=4096):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Entries older than ttl but younger than stale_ttl are served while refreshing
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.refreshing = set()
+        self.disk_writes = 0
+        self.counters = {"hits": 0, "stale_hits": 0, "disk_hits": 0, "misses": 0,
+                         "refreshes": 0, "refresh_errors": 0, "evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    # Disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                record = json.load(f)
+            return record["stored"], record["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, stored, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"stored": stored, "value": value}, f, default=str)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.disk_writes += 1
+        if self.disk_writes % DISK_PRUNE_EVERY == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop expired files and the oldest ones beyond max_disk_entries"""
+        now = time.time()
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if now - mtime > self.stale_ttl:
+                os.remove(path)
+            else:
+                files.append((mtime, path))
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_disk_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Memory tier
+
+    def _remember(self, key, stored, value):
+        with self.lock:
+            self.entries[key] = (stored, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def lookup(self, key, refresh=None, cacheable=None):
+        """Return (value, state) with state "hit", "stale", "disk" or "miss".
+
+        A stale value is returned as-is; if refresh is given it is called
+        in the background to replace the entry.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        state = "hit"
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, *entry)
+                state = "disk"
+
+        if entry is None:
+            self._count("misses")
+            return None, "miss"
+        stored, value = entry
+        age = time.time() - stored
+        if age > self.stale_ttl:
+            self._count("misses")
+            return None, "miss"
+        if age > self.ttl:
+            self._count("stale_hits")
+            if refresh is not None:
+                self._refresh_in_background(key, refresh, cacheable)
+            return value, "stale"
+        self._count("disk_hits" if state == "disk" else "hits")
+        return value, state
+
+    def store(self, key, value):
+        stored = time.time()
+        self._remember(key, stored, value)
+        self._write_disk(key, stored, value)
+
+    def _refresh_in_background(self, key, compute, cacheable=None):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    self.store(key, value)
+                self._count("refreshes")
+            except Exception as e:
+                print(f"Dashboard cache refresh failed: {str(e)}")
+                self._count("refresh_errors")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True, name="dashboard-cache-refresh").start()
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return (value, state), computing and storing the value on a miss.
+
+        Values rejected by cacheable(value) are returned but not stored.
+        Concurrent misses for the same key wait for the first computation.
+        """
+        value, state = self._claim(key, compute, cacheable)
+        if state != "claimed":
+            return value, state
+        try:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.store(key, value)
+            return value, "miss"
+        finally:
+            self._release(key)
+
+    def stream(self, key, generate, cacheable=None):
+        """Return (items, state) for a list value that generate() yields piece by piece.
+
+        On a miss items is an iterator over generate() that stores the
+        collected list once it is exhausted, so callers can forward pieces as
+        they arrive. Concurrent misses for the same key wait for that run and
+        replay its stored result. Iterate the returned items promptly: other
+        requests for the key wait until they are exhausted or closed.
+        """
+        value, state = self._claim(key, lambda: list(generate()), cacheable)
+        if state != "claimed":
+            return value, state
+
+        def run():
+            items = []
+            try:
+                for item in generate():
+                    items.append(item)
+                    yield item
+                if cacheable is None or cacheable(items):
+                    self.store(key, items)
+            finally:
+                self._release(key)
+
+        return run(), "miss"
+
+    def _claim(self, key, compute, cacheable):
+        """Return a cached (value, state), or (None, "claimed") when the caller must compute key.
+
+        Waits while another caller computes the same key; if that computation
+        failed or was not cacheable, its followers compute their own.
+        """
+        while True:
+            value, state = self.lookup(key, refresh=compute, cacheable=cacheable)
+            if state != "miss":
+                return value, state
+            with self.lock:
+                waiter = self.inflight.get(key)
+                if waiter is None:
+                    self.inflight[key] = threading.Event()
+                    return None, "claimed"
+            waiter.wait()
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is None:
+                # The other computation failed or was not cacheable
+                return compute(), "miss"
+
+    def _release(self, key):
+        with self.lock:
+            self.inflight.pop(key).set()
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+        if self.disk_dir:
+            names = [f"{key}.json"] if key else [n for n in os.listdir(self.disk_dir) if n.endswith(".json")]
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            entries = len(self.entries)
+        served = counters["hits"] + counters["stale_hits"] + counters["disk_hits"]
+        lookups = served + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "disk_enabled": bool(self.disk_dir),
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0
+        }
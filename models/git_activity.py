@@ -0,0 +1,283 @@
+"""Commit activity analytics for workspace git repositories.
+
+`git log --numstat` is streamed from a subprocess and reduced to one row per
+commit: author timestamp, lines added and deleted, files touched, author
+index and merge / pull-request / issue-fix flags. Rows are kept as NumPy
+columns, in memory and optionally as an .npz file per repository, together
+with the commit they were built up to. Later calls only read commits after
+that one (or rebuild when history was rewritten), so a repository is read
+in full once and every other request is a rev-parse plus a few bincounts.
+Authors are only kept as a short hash of their e-mail address, so neither
+responses nor cache files carry addresses.
+"""
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+COLUMNS = ("timestamp", "additions", "deletions", "files", "author", "flags")
+COLUMN_TYPES = {"timestamp": np.int64, "additions": np.int64, "deletions": np.int64,
+                "files": np.int32, "author": np.int32, "flags": np.int8}
+MERGE, PULL_REQUEST, ISSUE_FIX = 1, 2, 4
+PULL_REQUEST_PATTERN = re.compile(rb"^Merge pull request #\d+|\(#\d+\)\s*$")
+ISSUE_FIX_PATTERN = re.compile(rb"\b(?:fix(?:e[sd])?|close[sd]?|resolve[sd]?)\s+#\d+", re.IGNORECASE)
+HEADER = b"\x1e"
+FIELD = b"\x1f"
+LOG_FORMAT = "--format=%x1e%H%x1f%at%x1f%P%x1f%aE%x1f%s"
+DAY_SECONDS = 86400
+# Bumped when the cached layout changes so older .npz files are ignored
+CACHE_VERSION = 2
+
+class ActivityError(Exception):
+    """Raised when a path is not a readable git repository"""
+
+def git_output(repo, *args, timeout=60):
+    result = subprocess.run(["git", *args], cwd=repo, capture_output=True, timeout=timeout)
+    if result.returncode != 0:
+        raise ActivityError(result.stderr.decode("utf-8", "replace").strip() or f"git {args[0]} failed")
+    return result.stdout.decode("utf-8", "replace").strip()
+
+def author_id(email):
+    """Stable pseudonymous identity for a commit author"""
+    return hashlib.sha256(email.strip().lower()).hexdigest()[:12]
+
+def empty_columns():
+    return {name: np.zeros(0, dtype=COLUMN_TYPES[name]) for name in COLUMNS}
+
+def read_log(repo, revision_range, authors, timeout=600):
+    """Stream `git log --numstat` for revision_range into new column arrays.
+
+    authors maps author ids (see author_id) to indices and is extended in
+    place with new authors.
+    """
+    rows = {name: [] for name in COLUMNS}
+    command = ["git", "log", "--numstat", "--no-renames", LOG_FORMAT, revision_range, "--"]
+    process = subprocess.Popen(command, cwd=repo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Kill git if it outlives the timeout; reading its pipe would block forever
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    additions = deletions = files = 0
+    started = False
+    try:
+        for line in process.stdout:
+            if line.startswith(HEADER):
+                if started:
+                    rows["additions"].append(additions)
+                    rows["deletions"].append(deletions)
+                    rows["files"].append(files)
+                _, timestamp, parents, email, subject = line[1:].rstrip(b"\n").split(FIELD, 4)
+                author = authors.setdefault(author_id(email), len(authors))
+                flags = MERGE if b" " in parents else 0
+                if PULL_REQUEST_PATTERN.search(subject):
+                    flags |= PULL_REQUEST
+                if ISSUE_FIX_PATTERN.search(subject):
+                    flags |= ISSUE_FIX
+                rows["timestamp"].append(int(timestamp))
+                rows["author"].append(author)
+                rows["flags"].append(flags)
+                additions = deletions = files = 0
+                started = True
+            elif line != b"\n":
+                added, deleted, _ = line.split(b"\t", 2)
+                # Binary files report "-" for both counts
+                if added != b"-":
+                    additions += int(added)
+                    deletions += int(deleted)
+                files += 1
+        if started:
+            rows["additions"].append(additions)
+            rows["deletions"].append(deletions)
+            rows["files"].append(files)
+        error = process.stderr.read()
+        if process.wait() != 0:
+            raise ActivityError(error.decode("utf-8", "replace").strip() or "git log failed")
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    return {name: np.array(rows[name], dtype=COLUMN_TYPES[name]) for name in COLUMNS}
+
+class ActivityCache:
+    def __init__(self, cache_dir=None, max_repositories=64):
+        self.cache_dir = cache_dir
+        self.max_repositories = max_repositories
+        self.repositories = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.counters = {"full_scans": 0, "incremental_scans": 0, "unchanged": 0, "commits_read": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _repo_lock(self, key):
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with np.load(self._disk_path(key), allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                columns = {name: data[name] for name in COLUMNS}
+            return {"head": meta["head"], "authors": meta["authors"], "columns": columns}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, key, entry):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp.npz"
+        meta = json.dumps({"head": entry["head"], "authors": entry["authors"]})
+        try:
+            np.savez(temp_path, meta=np.array(meta), **entry["columns"])
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.repositories.pop(key, None)
+            self.repositories[key] = entry
+            while len(self.repositories) > self.max_repositories:
+                self.repositories.pop(next(iter(self.repositories)))
+
+    def columns(self, repo):
+        """Return (columns, authors) for repo, reading only commits added since the last call"""
+        repo = os.path.realpath(repo)
+        key = hashlib.sha256(f"{CACHE_VERSION}:{repo}".encode("utf-8")).hexdigest()[:24]
+        with self._repo_lock(key):
+            head = git_output(repo, "rev-parse", "--verify", "--quiet", "HEAD^{commit}")
+            with self.lock:
+                entry = self.repositories.get(key)
+            if entry is None:
+                entry = self._load(key)
+            if entry is not None and entry["head"] == head:
+                self._count("unchanged")
+                self._remember(key, entry)
+                return entry["columns"], entry["authors"]
+
+            incremental = entry is not None and subprocess.run(
+                ["git", "merge-base", "--is-ancestor", entry["head"], head], cwd=repo,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+            if incremental:
+                authors = {author: i for i, author in enumerate(entry["authors"])}
+                new = read_log(repo, f"{entry['head']}..{head}", authors)
+                columns = {name: np.concatenate([entry["columns"][name], new[name]]) for name in COLUMNS}
+                self._count("incremental_scans")
+            else:
+                # First scan, or history was rewritten (rebase, force push)
+                authors = {}
+                columns = new = read_log(repo, head, authors)
+                self._count("full_scans")
+            self._count("commits_read", len(new["timestamp"]))
+
+            entry = {"head": head, "authors": list(authors), "columns": columns}
+            self._remember(key, entry)
+            self._save(key, entry)
+            return columns, entry["authors"]
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "repositories": len(self.repositories),
+                    "disk_enabled": bool(self.cache_dir)}
+
+def tag_timestamps(repo):
+    """Creation times of the repository's tags, used as deployment markers"""
+    output = git_output(repo, "for-each-ref", "--format=%(creatordate:unix)", "refs/tags")
+    return np.array([int(line) for line in output.split() if line.isdigit()], dtype=np.int64)
+
+def summarize_activity(columns, authors, tags=None, days=7, weeks=12, now=None):
+    """Aggregate commit columns into daily and weekly series (UTC days).
+
+    The daily series keeps the shape of the dashboard's activity chart:
+    commits, issues (commits closing an issue), pull_requests (merged pull
+    requests) and deployments (tags created) for each of the last `days` days.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    today = int(now.timestamp()) // DAY_SECONDS
+    timestamps = columns["timestamp"]
+    day = timestamps // DAY_SECONDS
+    flags = columns["flags"]
+
+    def per_day(mask=None, values=None, when=day):
+        offset = today - when
+        keep = (offset >= 0) & (offset < days)
+        if mask is not None:
+            keep &= mask
+        weights = None if values is None else values[keep]
+        counts = np.bincount(days - 1 - offset[keep], weights=weights, minlength=days)
+        return [int(value) for value in counts]
+
+    labels = [(now - timedelta(days=days - 1 - i)).strftime("%a") for i in range(days)]
+    commits = per_day()
+    churn = columns["additions"] + columns["deletions"]
+
+    # Day 0 of the epoch was a Thursday, so (day + 3) // 7 counts Monday-based weeks
+    this_week = (today + 3) // 7
+    week = (day + 3) // 7
+    offset = this_week - week
+    keep = (offset >= 0) & (offset < weeks)
+    slot = weeks - 1 - offset[keep]
+    week_authors = np.zeros(weeks, dtype=np.int64)
+    if keep.any():
+        pairs = np.unique(slot.astype(np.int64) * max(len(authors), 1) + columns["author"][keep])
+        week_authors = np.bincount(pairs // max(len(authors), 1), minlength=weeks)
+    week_starts = [datetime.fromtimestamp(((this_week - weeks + 1 + i) * 7 - 3) * DAY_SECONDS, timezone.utc).date().isoformat()
+                   for i in range(weeks)]
+
+    author_counts = np.bincount(columns["author"], minlength=len(authors)) if len(authors) else np.zeros(0, dtype=np.int64)
+    top = np.argsort(-author_counts, kind="stable")[:10]
+    weekday = [int(count) for count in np.bincount((day + 3) % 7, minlength=7)]
+    weekdays = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    weekend = [label in ("Sat", "Sun") for label in labels]
+
+    return {
+        "commits": commits,
+        "issues": per_day((flags & ISSUE_FIX) > 0),
+        "pull_requests": per_day((flags & PULL_REQUEST) > 0),
+        "deployments": per_day(when=(tags if tags is not None else np.zeros(0, dtype=np.int64)) // DAY_SECONDS),
+        "additions": per_day(values=columns["additions"]),
+        "deletions": per_day(values=columns["deletions"]),
+        "days": labels,
+        "weekly": {
+            "week_start": week_starts,
+            "commits": [int(v) for v in np.bincount(slot, minlength=weeks)],
+            "churn": [int(v) for v in np.bincount(slot, weights=churn[keep], minlength=weeks)],
+            "authors": [int(v) for v in week_authors]
+        },
+        "totals": {
+            "commits": int(len(timestamps)),
+            "authors": len(authors),
+            "additions": int(columns["additions"].sum()),
+            "deletions": int(columns["deletions"].sum()),
+            "merges": int(((flags & MERGE) > 0).sum()),
+            "first_commit": datetime.fromtimestamp(int(timestamps.min()), timezone.utc).isoformat() if len(timestamps) else None,
+            "last_commit": datetime.fromtimestamp(int(timestamps.max()), timezone.utc).isoformat() if len(timestamps) else None
+        },
+        "top_authors": [{"author": authors[i], "commits": int(author_counts[i])} for i in top if author_counts[i]],
+        "patterns": {
+            "weekday_activity": sum(c for c, w in zip(commits, weekend) if not w) / max(weekend.count(False), 1),
+            "weekend_activity": sum(c for c, w in zip(commits, weekend) if w) / max(weekend.count(True), 1),
+            "average_daily_commits": sum(commits) / days,
+            "busiest_day": weekdays[int(np.argmax(weekday))] if len(timestamps) else None
+        },
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
@@ -0,0 +1,152 @@
+"""Content-addressed cache for rendered dashboard images.
+
+Images are keyed by a digest of their render parameters, so the same
+parameters always map to the same URL and the bytes behind it never change;
+that lets the HTTP layer send long-lived, immutable cache headers. Encoded
+bytes live in a memory LRU bounded by total size, with an optional disk
+tier that is bounded the same way (least recently read files go first). The parameters for each digest are remembered as well, so an image
+evicted from every tier can be rendered again on demand.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+class ImageCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, max_specs=100_000, max_disk_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_specs = max_specs
+        self.max_disk_bytes = max_disk_bytes
+        self.images = OrderedDict()
+        self.specs = OrderedDict()
+        # digest -> size of its file, least recently used first
+        self.disk_files = OrderedDict()
+        self.size = 0
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "renders": 0, "evictions": 0, "disk_evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._index_disk()
+
+    def _index_disk(self):
+        """Pick up files from earlier runs, oldest access first, and enforce the budget"""
+        files = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name.endswith(".tmp"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                stats = os.stat(path)
+            except OSError:
+                continue
+            files.append((stats.st_atime, name, stats.st_size))
+        for _, name, size in sorted(files):
+            self.disk_files[name] = size
+            self.disk_size += size
+        self._prune_disk()
+
+    def _prune_disk(self):
+        with self.lock:
+            evicted = []
+            while self.disk_size > self.max_disk_bytes and self.disk_files:
+                digest, size = self.disk_files.popitem(last=False)
+                self.disk_size -= size
+                self.counters["disk_evictions"] += 1
+                evicted.append(digest)
+        for digest in evicted:
+            try:
+                os.remove(self._disk_path(digest))
+            except OSError:
+                pass
+
+    def _disk_path(self, digest):
+        return os.path.join(self.disk_dir, digest)
+
+    def _remember(self, digest, data):
+        with self.lock:
+            if digest in self.images:
+                self.images.move_to_end(digest)
+                return
+            self.images[digest] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.size -= len(evicted)
+                self.counters["evictions"] += 1
+
+    def register(self, digest, spec):
+        """Remember how to re-render digest"""
+        with self.lock:
+            self.specs[digest] = spec
+            self.specs.move_to_end(digest)
+            while len(self.specs) > self.max_specs:
+                self.specs.popitem(last=False)
+
+    def get(self, digest, render=None):
+        """Return the encoded bytes for digest, re-rendering from its spec if needed.
+
+        render(spec) must return the encoded bytes; None is returned for
+        unknown digests.
+        """
+        with self.lock:
+            data = self.images.get(digest)
+            if data is not None:
+                self.images.move_to_end(digest)
+                self.counters["hits"] += 1
+                return data
+            spec = self.specs.get(digest)
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(digest), "rb") as f:
+                    data = f.read()
+                self._remember(digest, data)
+                with self.lock:
+                    self.counters["disk_hits"] += 1
+                    if digest in self.disk_files:
+                        self.disk_files.move_to_end(digest)
+                return data
+            except OSError:
+                pass
+
+        if spec is None or render is None:
+            return None
+        return self.put(digest, render(spec))
+
+    def get_or_render(self, digest, spec, render):
+        self.register(digest, spec)
+        return self.get(digest, render)
+
+    def put(self, digest, data):
+        with self.lock:
+            self.counters["renders"] += 1
+        self._remember(digest, data)
+        if self.disk_dir:
+            path = self._disk_path(digest)
+            temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return data
+            with self.lock:
+                self.disk_size += len(data) - self.disk_files.pop(digest, 0)
+                self.disk_files[digest] = len(data)
+            self._prune_disk()
+        return data
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "images": len(self.images), "bytes": self.size,
+                    "max_bytes": self.max_bytes, "specs": len(self.specs),
+                    "disk_enabled": bool(self.disk_dir), "disk_files": len(self.disk_files),
+                    "disk_bytes": self.disk_size, "max_disk_bytes": self.max_disk_bytes}
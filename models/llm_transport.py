@@ -0,0 +1,127 @@
+"""Shared HTTP transport for LLM provider calls.
+
+One requests.Session with a sized connection pool is reused for every call,
+so concurrent dashboard sections share warm keep-alive connections instead
+of each paying for a new TCP and TLS handshake. Every request has connect
+and read timeouts. 429 and 5xx responses and connection errors are retried
+with exponential backoff and full jitter, honoring Retry-After, within an
+overall deadline so one call can never hold a worker indefinitely.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+class LLMTransport:
+    def __init__(self, pool_size=16, connect_timeout=5.0, read_timeout=60.0, max_retries=4,
+                 backoff_base=0.5, backoff_max=20.0, deadline=120.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.session = requests.Session()
+        # Retries are handled below so Retry-After and the deadline are respected
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0,
+                         "timeouts": 0, "retry_wait_seconds": 0.0}
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, url, deadline=None, **kwargs):
+        """POST with pooling, timeouts and retries; returns the final Response.
+
+        deadline (seconds) tightens the transport's own overall deadline for
+        this call. Raises requests exceptions (including HTTPError via
+        raise_for_status by the caller) once retries or the deadline are
+        exhausted.
+        """
+        self._count("requests")
+        timeout = kwargs.pop("timeout", (self.connect_timeout, self.read_timeout))
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        give_up_at = time.monotonic() + (self.deadline if deadline is None else min(deadline, self.deadline))
+        attempt = 0
+        while True:
+            self._count("attempts")
+            wait = None
+            # No attempt may run past the overall deadline
+            left = give_up_at - time.monotonic()
+            if left <= 0:
+                self._count("failures")
+                raise requests.exceptions.RetryError(f"Gave up on {url} after {attempt} attempts (deadline reached)")
+            try:
+                response = self.session.post(url, timeout=(min(connect_timeout, left), min(read_timeout, left)), **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    if response.status_code in RETRY_STATUSES:
+                        self._count("failures")
+                    return response
+                wait = parse_retry_after(response.headers.get("Retry-After"))
+                # Release the connection back to the pool before sleeping
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    self._count("timeouts")
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+
+            if wait is None:
+                wait = self.backoff(attempt)
+            if time.monotonic() + wait >= give_up_at:
+                self._count("failures")
+                raise requests.exceptions.RetryError(f"Gave up on {url} after {attempt + 1} attempts (deadline reached)")
+            self._count("retries")
+            self._count("retry_wait_seconds", wait)
+            time.sleep(wait)
+            attempt += 1
+
+    def connection_stats(self):
+        """New connections versus requests served, summed over the adapter's pools"""
+        opened = served = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            served += pool.num_requests
+        return {
+            "connections_opened": opened,
+            "requests_sent": served,
+            "connections_reused": max(served - opened, 0),
+            "reuse_ratio": round((served - opened) / served, 4) if served else 0.0
+        }
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        counters["retry_wait_seconds"] = round(counters["retry_wait_seconds"], 3)
+        return {**counters, **self.connection_stats()}
@@ -1,4 +1,4 @@
-from flask import Flask, request, render_template_string, jsonify
+from flask import Flask, request, render_template_string, jsonify, Response, stream_with_context, has_request_context
 from flask_cors import CORS
 import os
 import json
@@ -6,10 +6,20 @@ import requests
 import re
 import random
 from datetime import datetime, timedelta
-import base64
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
+from PIL import Image, ImageFont, features
+from dashboard_cache import DashboardCache, make_key
+from llm_transport import LLMTransport
+from image_cache import ImageCache
+from viz_raster import render_batch
+from schedule_sim import simulate_schedule, phase_duration
+from task_scheduler import schedule_tasks, SchedulingError
+from git_activity import ActivityCache, ActivityError, empty_columns, summarize_activity, tag_timestamps
+from code_metrics import MetricsEngine
+import time
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -25,6 +35,32 @@ CORS(app, resources={
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "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")
 UNSPLASH_API_KEY = os.environ.get("UNSPLASH_API_KEY", "your_unsplash_api_key")
 
+# Pooled keep-alive connections with timeouts and retries for every LLM call
+llm_transport = LLMTransport(
+    pool_size=int(os.environ.get("DASHBOARD_WORKERS", 16)),
+    connect_timeout=float(os.environ.get("LLM_CONNECT_TIMEOUT", 5)),
+    read_timeout=float(os.environ.get("LLM_READ_TIMEOUT", 60)),
+    max_retries=int(os.environ.get("LLM_MAX_RETRIES", 4)),
+    deadline=float(os.environ.get("LLM_DEADLINE", 45))
+)
+
+# Rendered visualizations are served from /viz/<digest>.<format>
+VIZ_RENDER_VERSION = 2
+VIZ_FORMAT = "webp" if features.check("webp") else "png"
+VIZ_WEBP_QUALITY = 80
+# Method 2 encodes about 2.5x faster than 4 for a few percent more bytes
+VIZ_WEBP_METHOD = 2
+VIZ_THUMBNAIL_WIDTH = 320
+VIZ_MAX_BATCH = 256
+# Prefix for visualization URLs; defaults to the host of the current request
+VIZ_BASE_URL = os.environ.get("VIZ_BASE_URL", "").rstrip("/")
+visualization_cache = ImageCache(
+    max_bytes=int(os.environ.get("VIZ_CACHE_BYTES", 64 * 1024 * 1024)),
+    max_disk_bytes=int(os.environ.get("VIZ_DISK_CACHE_BYTES", 512 * 1024 * 1024)),
+    disk_dir=os.environ.get("VIZ_CACHE_DIR") or (
+        os.path.join(os.environ["DASHBOARD_CACHE_DIR"], "viz") if os.environ.get("DASHBOARD_CACHE_DIR") else None)
+)
+
 # Default tech stack icons/logos as base64 to avoid external dependencies
 TECH_ICONS = {
     "python": "https://cdn.jsdelivr.net/gh/devicons/devicon/icons/python/python-original.svg",
@@ -71,8 +107,11 @@ TECH_ICONS = {
     "kotlin": "https://cdn.jsdelivr.net/gh/devicons/devicon/icons/kotlin/kotlin-original.svg",
 }
 
-def query_llm(prompt, specific_section=None):
-    """Query the Groq LLM API with a prompt for a specific dashboard section"""
+def query_llm(prompt, specific_section=None, deadline=None):
+    """Query the Groq LLM API with a prompt for a specific dashboard section.
+
+    deadline caps the seconds spent on the call, retries included.
+    """
     
     # Check if API key exists and is valid
     if not GROQ_API_KEY or GROQ_API_KEY == "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":
@@ -98,7 +137,8 @@ def query_llm(prompt, specific_section=None):
     }
     
     try:
-        response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=data)
+        response = llm_transport.post("https://api.groq.com/openai/v1/chat/completions", deadline=deadline,
+                                      headers=headers, json=data)
         response.raise_for_status()
         
         content = response.json()["choices"][0]["message"]["content"]
@@ -123,56 +163,166 @@ def query_llm(prompt, specific_section=None):
         print(f"Unexpected error: {str(e)}")
         raise
 
+# Dashboard sections are independent LLM calls, so they are dispatched together
+DASHBOARD_SECTIONS = [
+    {
+        "name": "overview",
+        "prompt": "Generate a project name and detailed description for this software project: '{description}'. Return as JSON with 'project_name' and 'description' fields.",
+        "fields": ["project_name", "description"]
+    },
+    {
+        "name": "tech_stack",
+        "prompt": "For a software project described as: '{description}', recommend the best technology stack. Group as frontend, backend, database, and devops categories in JSON format.",
+        "fields": ["tech_stack"]
+    },
+    {
+        "name": "phases",
+        "prompt": "For a software project described as: '{description}', create a comprehensive development plan with phases. Each phase should have a name, duration, description, and 3-5 key tasks with priorities. Return as JSON.",
+        "fields": ["phases"]
+    },
+    {
+        "name": "features",
+        "prompt": "For a software project described as: '{description}', list the top 5-7 features that should be implemented, with name, description and priority (High/Medium/Low) for each. Return as JSON.",
+        "fields": ["features"]
+    },
+    {
+        "name": "architecture",
+        "prompt": "For a software project described as: '{description}', recommend an architecture approach. Include a description and list of components. Return as JSON.",
+        "fields": ["architecture"]
+    },
+    {
+        "name": "testing",
+        "prompt": "For a software project described as: '{description}', recommend a testing strategy and types of tests to implement. Return as JSON.",
+        "fields": ["testing"]
+    },
+    {
+        "name": "deployment",
+        "prompt": "For a software project described as: '{description}', recommend a deployment strategy and environments. Return as JSON.",
+        "fields": ["deployment"]
+    }
+]
+SECTION_TIMEOUT_SECONDS = float(os.environ.get("DASHBOARD_SECTION_TIMEOUT", 25))
+# Per-section overrides, e.g. the long phases plan gets more time than the overview
+SECTION_TIMEOUTS = {"phases": SECTION_TIMEOUT_SECONDS * 1.5}
+DASHBOARD_WORKERS = int(os.environ.get("DASHBOARD_WORKERS", 16))
+
+# Shared across requests; each call gets its section's remaining time as the
+# transport deadline, so a timed-out call frees its worker shortly after the
+# request that dispatched it stops waiting
+llm_pool = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard-llm")
+
+# Generated dashboards are reused for repeated descriptions; set
+# DASHBOARD_CACHE_DIR to keep them across restarts
+dashboard_cache = DashboardCache(
+    max_entries=int(os.environ.get("DASHBOARD_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("DASHBOARD_CACHE_TTL", 3600)),
+    stale_ttl=float(os.environ.get("DASHBOARD_CACHE_STALE_TTL", 86400)),
+    disk_dir=os.environ.get("DASHBOARD_CACHE_DIR") or None
+)
+
+# Repositories cloned by the assistant live under the same workspace root
+WORKSPACE_ROOT = os.path.realpath(os.environ.get("WORKSPACE_ROOT", os.path.join(os.getcwd(), "workspace")))
+ACTIVITY_CACHE_DIR = os.environ.get("ACTIVITY_CACHE_DIR") or (
+    os.path.join(os.environ["DASHBOARD_CACHE_DIR"], "activity") if os.environ.get("DASHBOARD_CACHE_DIR") else None)
+activity_cache = ActivityCache(cache_dir=ACTIVITY_CACHE_DIR)
+METRICS_CACHE_DIR = os.environ.get("METRICS_CACHE_DIR") or (
+    os.path.join(os.environ["DASHBOARD_CACHE_DIR"], "metrics") if os.environ.get("DASHBOARD_CACHE_DIR") else None)
+metrics_engine = MetricsEngine(cache_dir=METRICS_CACHE_DIR, workers=int(os.environ.get("METRICS_WORKERS", 0)) or None)
+# Code metrics reported in the {value, trend, change} shape, mapped to their summary keys
+CODE_METRICS = {
+    "code_quality": "code_quality",
+    "test_coverage": "test_coverage",
+    "lines_of_code": "code_lines",
+    "functions": "functions",
+    "average_complexity": "average_complexity",
+    "max_complexity": "max_complexity"
+}
+
+def fetch_dashboard_section(section, description, deadline):
+    """Run one section query that gives up at deadline (perf_counter); returns (fields, seconds)"""
+    started = time.perf_counter()
+    # Time spent queued for a worker counts against the section
+    result = query_llm(section["prompt"].format(description=description), deadline=deadline - started)
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected a JSON object for {section['name']}, got {type(result).__name__}")
+    fields = {key: result.get(key) for key in section["fields"]}
+    return fields, time.perf_counter() - started
+
+def dispatch_dashboard_sections(description, sections=None):
+    """Submit every section query at once; returns {future: (name, started, deadline)}"""
+    started = time.perf_counter()
+    pending = {}
+    for section in sections or DASHBOARD_SECTIONS:
+        deadline = started + SECTION_TIMEOUTS.get(section["name"], SECTION_TIMEOUT_SECONDS)
+        future = llm_pool.submit(fetch_dashboard_section, section, description, deadline)
+        pending[future] = (section["name"], started, deadline)
+    return pending
+
+def iter_dashboard_sections(description, sections=None, pending=None):
+    """Dispatch every section at once and yield (name, fields or None, timing) as each settles.
+
+    Sections are yielded in completion order. One that fails or runs past its
+    timeout is yielded with fields=None so the caller can fall back for it alone.
+    Pass pending from dispatch_dashboard_sections to collect queries already in flight.
+    """
+    if pending is None:
+        pending = dispatch_dashboard_sections(description, sections)
+    pending = dict(pending)
+
+    while pending:
+        next_deadline = min(deadline for _, _, deadline in pending.values())
+        done, _ = wait(pending, timeout=max(0, next_deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+        for future in done:
+            name, started, _ = pending.pop(future)
+            try:
+                fields, seconds = future.result()
+                yield name, fields, {"status": "ok", "seconds": round(seconds, 3)}
+            except Exception as e:
+                print(f"Error in LLM section {name}: {str(e)}")
+                yield name, None, {"status": "error", "error": str(e),
+                                   "seconds": round(time.perf_counter() - started, 3)}
+
+        now = time.perf_counter()
+        for future, (name, started, deadline) in list(pending.items()):
+            if deadline <= now:
+                pending.pop(future)
+                future.cancel()
+                yield name, None, {"status": "timeout", "seconds": round(now - started, 3)}
+
 def generate_project_dashboard(description):
+    """Generate complete project dashboard, reusing a cached one for the same description"""
+    dashboard, state = dashboard_cache.get_or_compute(
+        make_key("plan", description), lambda: build_project_dashboard(description),
+        cacheable=lambda result: all(t["status"] == "ok" for t in result.get("section_timings", {}).values()))
+    return dict(dashboard, cache=state)
+
+def build_project_dashboard(description):
     """Generate complete project dashboard by making separate LLM queries for each section"""
-    
+    started = time.perf_counter()
+    complete_data = {}
+    timings = {}
     try:
-        # 1. Get project overview (name, description)
-        overview_prompt = f"Generate a project name and detailed description for this software project: '{description}'. Return as JSON with 'project_name' and 'description' fields."
-        overview_data = query_llm(overview_prompt)
-        
-        # 2. Get tech stack recommendations
-        tech_stack_prompt = f"For a software project described as: '{description}', recommend the best technology stack. Group as frontend, backend, database, and devops categories in JSON format."
-        tech_stack_data = query_llm(tech_stack_prompt)
-        
-        # 3. Get development phases
-        phases_prompt = f"For a software project described as: '{description}', create a comprehensive development plan with phases. Each phase should have a name, duration, description, and 3-5 key tasks with priorities. Return as JSON."
-        phases_data = query_llm(phases_prompt)
-        
-        # 4. Get features list
-        features_prompt = f"For a software project described as: '{description}', list the top 5-7 features that should be implemented, with name, description and priority (High/Medium/Low) for each. Return as JSON."
-        features_data = query_llm(features_prompt)
-        
-        # 5. Get architecture details
-        architecture_prompt = f"For a software project described as: '{description}', recommend an architecture approach. Include a description and list of components. Return as JSON."
-        architecture_data = query_llm(architecture_prompt)
-        
-        # 6. Get testing strategy
-        testing_prompt = f"For a software project described as: '{description}', recommend a testing strategy and types of tests to implement. Return as JSON."
-        testing_data = query_llm(testing_prompt)
-        
-        # 7. Get deployment plan
-        deployment_prompt = f"For a software project described as: '{description}', recommend a deployment strategy and environments. Return as JSON."
-        deployment_data = query_llm(deployment_prompt)
-        
-        # Combine all data into a single comprehensive response
-        complete_data = {
-            "project_name": overview_data.get("project_name", "New Project"),
-            "description": overview_data.get("description", description),
-            "tech_stack": tech_stack_data.get("tech_stack", {}),
-            "phases": phases_data.get("phases", []),
-            "features": features_data.get("features", []),
-            "architecture": architecture_data.get("architecture", {}),
-            "testing": testing_data.get("testing", {}),
-            "deployment": deployment_data.get("deployment", {})
-        }
-        
-        # Apply fallback values to ensure dashboard isn't empty
-        return apply_fallback_values(complete_data, description)
+        for name, fields, timing in iter_dashboard_sections(description):
+            timings[name] = timing
+            if fields:
+                complete_data.update(fields)
     except Exception as e:
         print(f"Error in LLM generation: {str(e)}")
-        # Return fallback values if LLM generation fails
-        return generate_fallback_dashboard(description)
+
+    if not any(timing["status"] == "ok" for timing in timings.values()):
+        # Nothing came back (e.g. no API key), so use the randomized defaults
+        dashboard = generate_fallback_dashboard(description)
+    else:
+        try:
+            # Fill only the sections that failed or timed out
+            dashboard = apply_fallback_values(complete_data, description)
+        except Exception as e:
+            print(f"Error applying fallback values: {str(e)}")
+            dashboard = generate_fallback_dashboard(description)
+
+    dashboard["section_timings"] = timings
+    dashboard["generation_seconds"] = round(time.perf_counter() - started, 3)
+    return dashboard
 
 def apply_fallback_values(data, description):
     """Add fallback/default values for any missing data points"""
@@ -837,6 +987,23 @@ ADVANCED_TEMPLATE = '''
                 </div>
             </div>
 
+            <!-- AI Project Plan -->
+            <div class="dashboard-card p-8">
+                <div class="flex justify-between items-center mb-6">
+                    <h2 class="text-2xl font-bold gradient-text">Project Plan</h2>
+                    <span id="plan-status" class="text-sm text-gray-400"></span>
+                </div>
+                <div id="plan-overview" class="mb-6"></div>
+                <div class="grid grid-cols-1 md:grid-cols-2 gap-6">
+                    <div id="plan-features" class="glass-effect p-4 rounded-lg hidden"></div>
+                    <div id="plan-architecture" class="glass-effect p-4 rounded-lg hidden"></div>
+                    <div id="plan-tech_stack" class="glass-effect p-4 rounded-lg hidden"></div>
+                    <div id="plan-phases" class="glass-effect p-4 rounded-lg hidden"></div>
+                    <div id="plan-testing" class="glass-effect p-4 rounded-lg hidden"></div>
+                    <div id="plan-deployment" class="glass-effect p-4 rounded-lg hidden"></div>
+                </div>
+            </div>
+
             <!-- Tech Stack -->
             <div class="dashboard-card p-8">
                 <h2 class="text-2xl font-bold mb-6 gradient-text">Technology Stack</h2>
@@ -873,6 +1040,11 @@ ADVANCED_TEMPLATE = '''
                         <div id="phase-distribution" class="h-64"></div>
                     </div>
                 </div>
+                <div class="mt-8">
+                    <h3 class="text-xl font-semibold mb-4">Team Plan</h3>
+                    <div id="gantt-summary" class="text-gray-300 text-sm mb-4"></div>
+                    <div id="gantt-chart"></div>
+                </div>
             </div>
 
             <!-- Development Phases -->
@@ -963,13 +1135,18 @@ ADVANCED_TEMPLATE = '''
                         <div id="risk-details" class="space-y-4"></div>
                     </div>
                 </div>
+                <div class="mt-8">
+                    <h3 class="text-xl font-semibold mb-4">Schedule Forecast</h3>
+                    <div id="schedule-summary" class="grid grid-cols-2 md:grid-cols-4 gap-4 mb-6"></div>
+                    <div id="schedule-histogram" class="h-64"></div>
+                </div>
             </div>
         </div>
     </div>
 
     <script>
         // Initialize charts
-        let timelineChart, phaseChart, activityChart, riskMatrix;
+        let timelineChart, phaseChart, activityChart, riskMatrix, scheduleChart, ganttChart;
         
         // Function to update progress rings
         function updateProgressRing(elementId, value) {
@@ -986,15 +1163,18 @@ ADVANCED_TEMPLATE = '''
             fetch('/metrics')
                 .then(response => response.json())
                 .then(data => {
-                    updateProgressRing('code-quality', data.code_quality);
-                    updateProgressRing('test-coverage', data.test_coverage);
-                    updateProgressRing('build-success', data.build_success);
-                    updateProgressRing('deployment-freq', data.deployment_frequency);
+                    // Each metric is {value, trend, change}; code metrics are null without a repository
+                    const value = metric => metric && typeof metric === 'object' ? metric.value : metric;
+                    const percent = metric => value(metric) === null || value(metric) === undefined ? '–' : `${Math.round(value(metric))}%`;
+                    updateProgressRing('code-quality', value(data.code_quality) || 0);
+                    updateProgressRing('test-coverage', value(data.test_coverage) || 0);
+                    updateProgressRing('build-success', value(data.build_success) || 0);
+                    updateProgressRing('deployment-freq', value(data.deployment_frequency) || 0);
                     
-                    document.getElementById('code-quality').textContent = `${data.code_quality}%`;
-                    document.getElementById('test-coverage').textContent = `${data.test_coverage}%`;
-                    document.getElementById('build-success').textContent = `${data.build_success}%`;
-                    document.getElementById('deployment-freq').textContent = data.deployment_frequency;
+                    document.getElementById('code-quality').textContent = percent(data.code_quality);
+                    document.getElementById('test-coverage').textContent = percent(data.test_coverage);
+                    document.getElementById('build-success').textContent = percent(data.build_success);
+                    document.getElementById('deployment-freq').textContent = value(data.deployment_frequency);
                 });
         }
         
@@ -1089,7 +1269,7 @@ ADVANCED_TEMPLATE = '''
             document.getElementById('dashboard').classList.add('hidden');
             
             try {
-                const response = await fetch('/generate', {
+                const response = await fetch('/generate/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
@@ -1102,19 +1282,36 @@ ADVANCED_TEMPLATE = '''
                     }),
                 });
                 
-                const data = await response.json();
-                
-                if (data.error) {
-                    alert('Error: ' + data.error);
+                if (!response.ok) {
+                    const data = await response.json();
+                    alert('Error: ' + (data.error || response.statusText));
                     document.getElementById('loading').classList.add('hidden');
                     return;
                 }
                 
-                renderDashboard(data);
+                resetPlan();
+                let shown = false;
+                await readEventStream(response, (event, payload) => {
+                    if (event === 'section') {
+                        if (!shown) {
+                            // Show the dashboard as soon as the first section lands
+                            document.getElementById('loading').classList.add('hidden');
+                            document.getElementById('dashboard').classList.remove('hidden');
+                            shown = true;
+                        }
+                        renderSection(payload);
+                    } else if (event === 'error') {
+                        console.error('Dashboard stream error:', payload.error);
+                    } else if (event === 'done') {
+                        document.getElementById('plan-status').textContent = `Generated in ${payload.total_seconds}s`;
+                    }
+                });
                 
-                // Hide loading, show dashboard
-                document.getElementById('loading').classList.add('hidden');
-                document.getElementById('dashboard').classList.remove('hidden');
+                if (!shown) {
+                    alert('An error occurred. Please try again.');
+                    document.getElementById('loading').classList.add('hidden');
+                    return;
+                }
                 
                 // Start real-time updates
                 setInterval(() => {
@@ -1133,6 +1330,109 @@ ADVANCED_TEMPLATE = '''
             }
         });
         
+        // Parse a text/event-stream response body, calling onEvent(event, data) per event
+        async function readEventStream(response, onEvent) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                    const raw = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let event = 'message';
+                    const dataLines = [];
+                    raw.split('\\n').forEach(line => {
+                        if (line.startsWith('event:')) event = line.slice(6).trim();
+                        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                    });
+                    if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\\n')));
+                }
+            }
+        }
+        
+        function renderSection(payload) {
+            const data = payload.data;
+            if (payload.group === 'plan') {
+                renderPlanSection(payload.section, data, payload.timing);
+                return;
+            }
+            switch (payload.section) {
+                case 'summary':
+                    document.getElementById('project-summary').innerHTML = data;
+                    break;
+                case 'visualization':
+                    document.getElementById('project-image').src = data;
+                    break;
+                case 'techStack':
+                    renderTechStack(data);
+                    break;
+                case 'phases':
+                    renderTimelineChart(data);
+                    renderPhaseDistribution(data);
+                    renderPhases(data);
+                    break;
+                case 'risks':
+                    renderRiskAssessment(data);
+                    break;
+                case 'schedule':
+                    renderSchedule(data);
+                    break;
+                case 'timelinePlan':
+                    renderGantt(data);
+                    break;
+            }
+        }
+        
+        function resetPlan() {
+            document.getElementById('plan-status').textContent = 'Generating plan...';
+            document.getElementById('plan-overview').innerHTML = '';
+            ['features', 'architecture', 'tech_stack', 'phases', 'testing', 'deployment'].forEach(name => {
+                const container = document.getElementById(`plan-${name}`);
+                container.innerHTML = '';
+                container.classList.add('hidden');
+            });
+        }
+        
+        function escapeHtml(value) {
+            return String(value).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+        }
+        
+        // Render arbitrary LLM JSON as nested lists
+        function renderValue(value) {
+            if (Array.isArray(value)) {
+                return `<ul class="list-disc list-inside space-y-1 text-gray-300 text-sm">${value.map(item => `<li>${renderValue(item)}</li>`).join('')}</ul>`;
+            }
+            if (value && typeof value === 'object') {
+                if (value.name) {
+                    const details = Object.entries(value).filter(([key]) => key !== 'name');
+                    return `<span class="font-medium">${escapeHtml(value.name)}</span>${details.length ? renderValue(Object.fromEntries(details)) : ''}`;
+                }
+                return Object.entries(value).map(([key, item]) =>
+                    `<div class="mt-1"><span class="text-gray-400">${escapeHtml(key)}:</span> ${renderValue(item)}</div>`).join('');
+            }
+            return escapeHtml(value ?? '');
+        }
+        
+        function renderPlanSection(name, data, timing) {
+            if (name === 'overview') {
+                document.getElementById('plan-overview').innerHTML = `
+                    <h3 class="text-xl font-semibold mb-2">${escapeHtml(data.project_name || '')}</h3>
+                    <p class="text-gray-300">${escapeHtml(data.description || '')}</p>
+                `;
+                return;
+            }
+            const container = document.getElementById(`plan-${name}`);
+            if (!container) return;
+            const title = name.replace('_', ' ').replace(/\\b\\w/g, c => c.toUpperCase());
+            const note = timing && timing.fallback ? '<span class="text-xs text-yellow-300 ml-2">default</span>' : '';
+            container.innerHTML = `<h3 class="text-lg font-semibold mb-3">${title}${note}</h3>${renderValue(data[name])}`;
+            container.classList.remove('hidden');
+        }
+        
         function renderDashboard(data) {
             // Project Summary
             document.getElementById('project-summary').innerHTML = data.summary;
@@ -1152,8 +1452,14 @@ ADVANCED_TEMPLATE = '''
             // Development Phases
             renderPhases(data.phases);
             
+            // Resource-levelled plan
+            renderGantt(data.timelinePlan);
+            
             // Risk Assessment
             renderRiskAssessment(data.risks);
+            
+            // Schedule Forecast
+            renderSchedule(data.schedule);
         }
         
         function renderTechStack(techStack) {
@@ -1226,6 +1532,84 @@ ADVANCED_TEMPLATE = '''
             }
         }
         
+        function renderGantt(plan) {
+            const summary = document.getElementById('gantt-summary');
+            if (!plan) {
+                summary.textContent = 'Team plan unavailable';
+                return;
+            }
+            const critical = plan.tasks.filter(task => task.critical).length;
+            summary.innerHTML = `
+                Finishes ${escapeHtml(plan.finish_date)} after ${plan.levelled_duration} weeks with this team
+                (${plan.duration} weeks with unlimited people). ${critical} of ${plan.tasks.length} tasks are on the critical path.
+            `;
+            const start = new Date(plan.start_date).getTime();
+            const week = plan.unit_days * 24 * 60 * 60 * 1000;
+            const options = {
+                series: [{
+                    name: 'Tasks',
+                    data: plan.tasks.map(task => ({
+                        x: task.name,
+                        y: [start + task.start * week, start + task.finish * week],
+                        fillColor: task.critical ? '#ef4444' : '#3b82f6',
+                        meta: task
+                    }))
+                }],
+                chart: {
+                    type: 'rangeBar',
+                    height: Math.max(250, plan.tasks.length * 22),
+                    toolbar: {
+                        show: false
+                    },
+                    background: 'transparent'
+                },
+                plotOptions: {
+                    bar: {
+                        horizontal: true,
+                        barHeight: '70%'
+                    }
+                },
+                dataLabels: {
+                    enabled: false
+                },
+                tooltip: {
+                    custom: ({ seriesIndex, dataPointIndex, w }) => {
+                        const task = w.config.series[seriesIndex].data[dataPointIndex].meta;
+                        return `<div class="p-2 text-sm">
+                            <div class="font-medium">${escapeHtml(task.name)}</div>
+                            <div>${escapeHtml(task.phase || task.role)}: ${task.start_date} to ${task.finish_date}</div>
+                            <div>Slack: ${task.slack} weeks</div>
+                        </div>`;
+                    }
+                },
+                xaxis: {
+                    type: 'datetime',
+                    labels: {
+                        style: {
+                            colors: '#ffffff'
+                        }
+                    }
+                },
+                yaxis: {
+                    labels: {
+                        style: {
+                            colors: '#ffffff'
+                        }
+                    }
+                },
+                grid: {
+                    borderColor: 'rgba(255, 255, 255, 0.1)'
+                }
+            };
+            
+            if (ganttChart) {
+                ganttChart.updateOptions(options);
+            } else {
+                ganttChart = new ApexCharts(document.querySelector("#gantt-chart"), options);
+                ganttChart.render();
+            }
+        }
+        
         function renderPhaseDistribution(phases) {
             const options = {
                 series: phases.map(phase => phase.duration),
@@ -1310,6 +1694,9 @@ ADVANCED_TEMPLATE = '''
                         }">${risk.level}</span>
                     </div>
                     <p class="text-gray-300 text-sm">${risk.mitigation}</p>
+                    ${risk.expected_delay !== undefined ? `
+                        <p class="text-gray-400 text-xs mt-2">Expected delay: ${risk.expected_delay} weeks (${Math.round(risk.delay_share * 100)}% of risk delay)</p>
+                    ` : ''}
                 `;
                 container.appendChild(div);
             });
@@ -1363,6 +1750,83 @@ ADVANCED_TEMPLATE = '''
                 riskMatrix.render();
             }
         }
+        
+        function renderSchedule(schedule) {
+            const summary = document.getElementById('schedule-summary');
+            if (!schedule) {
+                summary.innerHTML = '<p class="text-gray-400">Schedule simulation unavailable</p>';
+                return;
+            }
+            const stats = [
+                ['Planned', schedule.planned, schedule.dates.planned],
+                ['P50', schedule.p50, schedule.dates.p50],
+                ['P80', schedule.p80, schedule.dates.p80],
+                ['P95', schedule.p95, schedule.dates.p95]
+            ];
+            summary.innerHTML = stats.map(([label, weeks, date]) => `
+                <div class="glass-effect p-4 rounded-lg">
+                    <div class="text-gray-400 text-sm">${label}</div>
+                    <div class="text-xl font-semibold">${date}</div>
+                    <div class="text-gray-400 text-xs">${weeks} weeks</div>
+                </div>
+            `).join('') + `
+                <div class="col-span-2 md:col-span-4 text-gray-300 text-sm">
+                    ${Math.round(schedule.on_time_probability * 100)}% chance of finishing on plan across ${schedule.iterations.toLocaleString()} simulated scenarios.
+                    Most critical phase: ${schedule.phases.reduce((a, b) => b.criticality > a.criticality ? b : a).name}.
+                </div>
+            `;
+            
+            const edges = schedule.histogram.bin_edges;
+            const options = {
+                series: [{
+                    name: 'Scenarios',
+                    data: schedule.histogram.counts
+                }],
+                chart: {
+                    type: 'bar',
+                    height: 250,
+                    background: 'transparent',
+                    toolbar: { show: false }
+                },
+                plotOptions: {
+                    bar: { columnWidth: '95%' }
+                },
+                dataLabels: { enabled: false },
+                xaxis: {
+                    categories: schedule.histogram.counts.map((_, i) => ((edges[i] + edges[i + 1]) / 2).toFixed(1)),
+                    title: {
+                        text: 'Total duration (weeks)',
+                        style: {
+                            color: '#ffffff'
+                        }
+                    },
+                    labels: {
+                        rotate: 0,
+                        hideOverlappingLabels: true,
+                        style: {
+                            colors: '#ffffff'
+                        }
+                    }
+                },
+                yaxis: {
+                    labels: {
+                        style: {
+                            colors: '#ffffff'
+                        }
+                    }
+                },
+                grid: {
+                    borderColor: 'rgba(255, 255, 255, 0.1)'
+                }
+            };
+            
+            if (scheduleChart) {
+                scheduleChart.updateOptions(options);
+            } else {
+                scheduleChart = new ApexCharts(document.querySelector("#schedule-histogram"), options);
+                scheduleChart.render();
+            }
+        }
     </script>
 </body>
 </html>
@@ -1384,9 +1848,13 @@ def generate_dashboard():
         if not project_description:
             return jsonify({'error': 'Project description is required'}), 400
             
-        # Generate dashboard data
-        dashboard_data = generate_advanced_dashboard(project_description, team_size, timeline, complexity)
-        return jsonify(dashboard_data)
+        # Generate dashboard data, or reuse it for a repeated request
+        dashboard_data, cache_state = dashboard_cache.get_or_compute(
+            make_key("advanced", project_description, team_size, timeline, complexity),
+            lambda: generate_advanced_dashboard(project_description, team_size, timeline, complexity))
+        response = jsonify(dict(dashboard_data, visualization=visualization_url(dashboard_data.get('visualization'))))
+        response.headers['X-Dashboard-Cache'] = cache_state
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1406,6 +1874,12 @@ def generate_advanced_dashboard(project_description, team_size, timeline, comple
     # Generate risk assessment
     risks = generate_risk_assessment(complexity)
     
+    # Simulate the schedule under those risks
+    schedule = simulate_dashboard_schedule(phases, risks, complexity)
+    
+    # Level the phase tasks against the team
+    timeline_plan = generate_timeline_plan(phases, team_size)
+    
     # Generate project summary
     summary = generate_project_summary(project_description, team_size, timeline, complexity)
     
@@ -1414,51 +1888,225 @@ def generate_advanced_dashboard(project_description, team_size, timeline, comple
         "visualization": visualization,
         "techStack": tech_stack,
         "phases": phases,
-        "risks": risks
+        "risks": risks,
+        "schedule": schedule,
+        "timelinePlan": timeline_plan
     }
 
-def generate_project_visualization(description):
-    """Generate a dynamic project visualization image with varying elements"""
-    # Create a larger image with more elements
-    img = Image.new('RGB', (1200, 600), color=(17, 17, 17))
-    d = ImageDraw.Draw(img)
-    
+def simulate_dashboard_schedule(phases, risks, complexity):
+    """Run the Monte Carlo schedule and copy each risk's expected delay onto it"""
     try:
-        font = ImageFont.truetype("Arial", 60)
-        small_font = ImageFont.truetype("Arial", 30)
-    except:
-        font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
-    
-    # Extract project name from description
-    project_name = description.split()[0] if description else "Project"
-    
-    # Draw project name with gradient effect
-    for i in range(5):
-        d.text((600, 200), project_name, fill=(255-i*50, 255-i*50, 255-i*50), font=font, anchor="mm")
-    
-    # Add random tech stack visualization
-    tech_icons = ["⚡", "🔧", "🔨", "💻", "📱", "🌐", "🔒", "📊"]
-    for i in range(8):
-        x = random.randint(100, 1100)
-        y = random.randint(300, 500)
-        size = random.randint(20, 40)
-        d.text((x, y), random.choice(tech_icons), fill=(random.randint(100, 255), random.randint(100, 255), random.randint(100, 255)), font=small_font)
-    
-    # Add random connection lines
-    for _ in range(15):
-        x1 = random.randint(100, 1100)
-        y1 = random.randint(300, 500)
-        x2 = random.randint(100, 1100)
-        y2 = random.randint(300, 500)
-        d.line([(x1, y1), (x2, y2)], fill=(random.randint(50, 150), random.randint(50, 150), random.randint(50, 150)), width=2)
-    
-    # Convert to base64
+        schedule = simulate_schedule(phases, risks, complexity)
+    except Exception as e:
+        print(f"Error simulating schedule: {str(e)}")
+        return None
+    for risk, result in zip(risks, schedule["risks"]):
+        risk["expected_delay"] = result["expected_delay"]
+        risk["delay_share"] = result["delay_share"]
+        risk["affected_phases"] = result["affected_phases"]
+    return schedule
+
+def format_sse(event, payload):
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+def iter_advanced_dashboard_sections(project_description, team_size, timeline, complexity, include_plan=True):
+    """Yield (group, name, data, timing) for each dashboard section as soon as it is ready.
+
+    The LLM plan sections are dispatched first so they run while the local
+    sections are computed; each plan section that fails or times out is
+    replaced by its default from apply_fallback_values.
+    """
+    pending = dispatch_dashboard_sections(project_description) if include_plan else {}
+
+    # Later sections read earlier results; the schedule is simulated before
+    # the risks are sent so they carry their expected delays
+    built = {}
+    local_sections = [
+        ("summary", lambda: generate_project_summary(project_description, team_size, timeline, complexity)),
+        ("techStack", lambda: generate_tech_stack(team_size, complexity)),
+        ("phases", lambda: generate_development_phases(timeline, complexity)),
+        ("timelinePlan", lambda: generate_timeline_plan(built["phases"], team_size)),
+        ("schedule", lambda: simulate_dashboard_schedule(built["phases"], built.setdefault("risks", generate_risk_assessment(complexity)), complexity)),
+        ("risks", lambda: built["risks"]),
+        ("visualization", lambda: generate_project_visualization(project_description))
+    ]
+    for name, build in local_sections:
+        started = time.perf_counter()
+        data = built[name] = build()
+        yield "dashboard", name, data, {"status": "ok", "seconds": round(time.perf_counter() - started, 3)}
+
+    defaults = None
+    fields_by_section = {section["name"]: section["fields"] for section in DASHBOARD_SECTIONS}
+    for name, fields, timing in iter_dashboard_sections(project_description, pending=pending):
+        if not fields or not any(fields.values()):
+            if defaults is None:
+                defaults = apply_fallback_values({}, project_description)
+            fields = {key: defaults.get(key) for key in fields_by_section[name]}
+            timing["fallback"] = True
+        else:
+            # Fill gaps inside the section (e.g. a missing tech stack category)
+            try:
+                filled = apply_fallback_values(dict(fields), project_description)
+                fields = {key: filled.get(key) for key in fields_by_section[name]}
+            except Exception as e:
+                print(f"Error applying fallback values to {name}: {str(e)}")
+        yield "plan", name, fields, timing
+
+@app.route('/generate/stream', methods=['GET', 'POST'])
+def generate_dashboard_stream():
+    """Stream dashboard sections as server-sent events while they are generated"""
+    data = request.get_json(silent=True) or request.args
+    project_description = data.get('projectDescription', '')
+    team_size = data.get('teamSize', 'medium')
+    timeline = data.get('timeline', 'medium')
+    complexity = data.get('complexity', 'medium')
+    include_plan = str(data.get('includePlan', 'true')).lower() not in ('false', '0', 'no')
+
+    if not project_description:
+        return jsonify({'error': 'Project description is required'}), 400
+
+    cache_key = make_key("stream", project_description, team_size, timeline, complexity, include_plan)
+
+    def cacheable(sections):
+        return not any(timing.get("fallback") for _, _, _, timing in sections)
+
+    def events():
+        started = time.perf_counter()
+        timings = {}
+        cache_state = "miss"
+        try:
+            # A miss streams sections live; concurrent identical requests wait for it and replay
+            sections, cache_state = dashboard_cache.stream(
+                cache_key,
+                lambda: iter_advanced_dashboard_sections(project_description, team_size, timeline, complexity, include_plan),
+                cacheable=cacheable)
+            for group, name, payload, timing in sections:
+                timings[f"{group}.{name}"] = timing
+                if name == "visualization":
+                    payload = visualization_url(payload)
+                yield format_sse("section", {"group": group, "section": name, "data": payload, "timing": timing})
+        except Exception as e:
+            print(f"Error streaming dashboard: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+        yield format_sse("done", {"timings": timings, "cache": cache_state,
+                                  "total_seconds": round(time.perf_counter() - started, 3)})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """Load a TrueType font once per size, falling back to Pillow's default"""
+    for name in ("Arial", "arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def visualization_spec(description):
+    """Everything that determines a visualization; equal specs render identical images"""
+    return {
+        "project_name": description.split()[0] if description else "Project",
+        # Seeded from the normalized description so repeat requests get the same image
+        "seed": int(make_key(description)[:12], 16)
+    }
+
+def visualization_digest(spec):
+    return hashlib.sha256(json.dumps([VIZ_RENDER_VERSION, spec], sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+def visualization_path(digest):
+    return f"/viz/{digest}.{VIZ_FORMAT}"
+
+def visualization_url(path):
+    """Absolute URL for a /viz path.
+
+    Dashboards are cached (and refreshed off-request) with the bare path;
+    the origin is added per response so the frontend on another origin
+    always gets a loadable URL.
+    """
+    if not isinstance(path, str) or not path.startswith("/viz/"):
+        return path
+    base = VIZ_BASE_URL
+    if not base and has_request_context():
+        base = request.host_url.rstrip("/")
+    return f"{base}{path}"
+
+def render_visualizations(specs):
+    """Render specs as PIL images, batching those of the same size into one NumPy pass"""
+    images = [None] * len(specs)
+    by_size = {}
+    for position, spec in enumerate(specs):
+        by_size.setdefault((spec.get("width", 1200), spec.get("height", 600)), []).append(position)
+    for (width, height), positions in by_size.items():
+        title_font = load_font(max(int(60 * min(width / 1200, height / 600)), 8))
+        pixels = render_batch([specs[p] for p in positions], width, height, title_font)
+        for position, array in zip(positions, pixels):
+            images[position] = Image.fromarray(array)
+    return images
+
+def encode_image(img):
+    """Encode as WebP, or optimized PNG without WebP support"""
     buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    
-    return f"data:image/png;base64,{img_str}"
+    if VIZ_FORMAT == "webp":
+        img.save(buffered, format="WEBP", quality=VIZ_WEBP_QUALITY, method=VIZ_WEBP_METHOD)
+    else:
+        img.save(buffered, format="PNG", optimize=True)
+    return buffered.getvalue()
+
+def encode_visualization(spec):
+    return encode_image(render_visualizations([spec])[0])
+
+def generate_project_visualization(description):
+    """Render (or reuse) the project visualization and return its /viz path"""
+    spec = visualization_spec(description)
+    digest = visualization_digest(spec)
+    visualization_cache.get_or_render(digest, spec, encode_visualization)
+    return visualization_path(digest)
+
+@app.route('/viz/thumbnails', methods=['GET', 'POST'])
+def get_visualization_thumbnails():
+    """Return thumbnail URLs for many descriptions, rendering any missing ones in one batch"""
+    data = request.get_json(silent=True) or {}
+    descriptions = data.get('descriptions') or request.args.getlist('description')
+    try:
+        width = int(data.get('width') or request.args.get('width', VIZ_THUMBNAIL_WIDTH))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'width must be an integer'}), 400
+    if not descriptions or not isinstance(descriptions, list) or not all(isinstance(d, str) for d in descriptions):
+        return jsonify({'error': 'At least one description is required'}), 400
+    if not 16 <= width <= 1200 or len(descriptions) > VIZ_MAX_BATCH:
+        return jsonify({'error': f'width must be 16-1200 and at most {VIZ_MAX_BATCH} descriptions'}), 400
+
+    specs = [dict(visualization_spec(d), width=width, height=width // 2) for d in descriptions]
+    digests = [visualization_digest(spec) for spec in specs]
+    missing = {}
+    for spec, digest in zip(specs, digests):
+        visualization_cache.register(digest, spec)
+        if digest not in missing and visualization_cache.get(digest) is None:
+            missing[digest] = spec
+    if missing:
+        for digest, img in zip(missing, render_visualizations(list(missing.values()))):
+            visualization_cache.put(digest, encode_image(img))
+
+    return jsonify({
+        'thumbnails': [{'description': d, 'url': visualization_url(visualization_path(digest))} for d, digest in zip(descriptions, digests)],
+        'rendered': len(missing)
+    })
+
+@app.route('/viz/<digest>.<ext>')
+def get_visualization(digest, ext):
+    """Serve a rendered visualization; the URL is content-addressed, so it never changes"""
+    if ext != VIZ_FORMAT or not re.fullmatch(r"[0-9a-f]{32}", digest):
+        return jsonify({'error': 'Visualization not found'}), 404
+    headers = {'ETag': f'"{digest}"', 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if request.if_none_match.contains(digest):
+        return Response(status=304, headers=headers)
+    data = visualization_cache.get(digest, encode_visualization)
+    if data is None:
+        return jsonify({'error': 'Visualization not found'}), 404
+    return Response(data, mimetype=f'image/{VIZ_FORMAT}', headers=headers)
 
 def generate_tech_stack(team_size, complexity):
     """Generate a tech stack based on team size and complexity"""
@@ -1504,6 +2152,66 @@ def generate_tech_stack(team_size, complexity):
         "devops": random.sample(devops_options, num_techs)
     }
 
+# People per role by team size; phase durations are planned for a medium team
+TEAM_CAPACITY = {
+    "small": {"product": 1, "design": 1, "engineering": 2, "qa": 1, "ops": 1},
+    "medium": {"product": 1, "design": 2, "engineering": 5, "qa": 2, "ops": 1},
+    "large": {"product": 2, "design": 3, "engineering": 10, "qa": 4, "ops": 2}
+}
+PHASE_ROLES = {
+    "planning": "product",
+    "design": "design",
+    "development": "engineering",
+    "testing": "qa",
+    "deployment": "ops"
+}
+MAX_TIMELINE_TASKS = 50_000
+
+def build_phase_tasks(phases):
+    """Turn a flat phase list into a task graph.
+
+    Each phase's tasks split its planned effort evenly and depend on every
+    task of the previous phase; the phase's role comes from its name.
+    """
+    tasks = []
+    previous = []
+    for index, phase in enumerate(phases):
+        name = phase.get("name", f"Phase {index + 1}")
+        role = next((r for keyword, r in PHASE_ROLES.items() if keyword in name.lower()), "engineering")
+        items = phase.get("tasks") or [name]
+        effort = phase_duration(phase) * TEAM_CAPACITY["medium"].get(role, 1)
+        current = []
+        for number, item in enumerate(items):
+            task_id = f"{index + 1}.{number + 1}"
+            tasks.append({
+                "id": task_id,
+                "name": item.get("name", task_id) if isinstance(item, dict) else str(item),
+                "phase": name,
+                "role": role,
+                "duration": round(effort / len(items), 3),
+                "dependencies": previous
+            })
+            current.append(task_id)
+        previous = current
+    return tasks
+
+def generate_timeline_plan(phases, team_size):
+    """Critical path and levelled Gantt plan for the phases, or None if it cannot be built"""
+    tasks = build_phase_tasks(phases)
+    try:
+        plan = schedule_tasks(tasks, capacity=TEAM_CAPACITY.get(team_size, TEAM_CAPACITY["medium"]))
+    except SchedulingError as e:
+        print(f"Error scheduling phases: {str(e)}")
+        return None
+    phase_of = {task["id"]: task["phase"] for task in tasks}
+    spans = {}
+    for task in plan["tasks"]:
+        task["phase"] = phase_of[task["id"]]
+        start, finish = spans.get(task["phase"], (task["start"], task["finish"]))
+        spans[task["phase"]] = (min(start, task["start"]), max(finish, task["finish"]))
+    plan["phases"] = [{"name": name, "start": start, "finish": finish} for name, (start, finish) in spans.items()]
+    return plan
+
 def generate_development_phases(timeline, complexity):
     """Generate development phases based on timeline and complexity"""
     base_durations = {
@@ -1701,13 +2409,67 @@ def generate_project_summary(description, team_size, timeline, complexity):
     scalability while meeting the specific requirements of the project.</p>
     """
 
+@app.route('/cache/stats')
+def get_cache_stats():
+    """Report dashboard cache size and hit ratio"""
+    return jsonify(dict(dashboard_cache.stats(), visualizations=visualization_cache.stats()))
+
+@app.route('/transport/stats')
+def get_transport_stats():
+    """Report LLM request retries and connection reuse"""
+    return jsonify(llm_transport.stats())
+
+@app.route('/timeline', methods=['GET', 'POST'])
+def get_timeline():
+    """Critical path and resource-levelled plan for posted tasks, or for generated phases"""
+    data = request.get_json(silent=True) or request.args
+    tasks = data.get('tasks') if request.is_json else None
+    if tasks is not None:
+        if not isinstance(tasks, list) or len(tasks) > MAX_TIMELINE_TASKS:
+            return jsonify({'error': f'tasks must be a list of at most {MAX_TIMELINE_TASKS} items'}), 400
+        team_size = data.get('teamSize', 'medium')
+        capacity = data.get('capacity', TEAM_CAPACITY.get(team_size, TEAM_CAPACITY["medium"]))
+        try:
+            return jsonify(schedule_tasks(tasks, capacity=capacity))
+        except (SchedulingError, TypeError, ValueError, AttributeError, OverflowError) as e:
+            return jsonify({'error': str(e)}), 400
+
+    timeline = data.get('timeline', 'medium')
+    complexity = data.get('complexity', 'medium')
+    if timeline not in ('short', 'medium', 'long'):
+        return jsonify({'error': 'timeline must be short, medium or long'}), 400
+    phases = generate_development_phases(timeline, complexity)
+    return jsonify(generate_timeline_plan(phases, data.get('teamSize', 'medium')))
+
+def metric_trend(value, previous):
+    if value is None or previous is None:
+        return {'value': value, 'trend': 'stable', 'change': 0}
+    change = round(value - previous, 2)
+    return {'value': value, 'trend': 'up' if change > 0 else 'down' if change < 0 else 'stable', 'change': abs(change)}
+
 @app.route('/metrics')
 def get_metrics():
-    """Generate more dynamic and realistic metrics"""
-    # Generate base metrics with trends
+    """Code metrics for a workspace repository, with trends against its previous scan"""
+    session_id = request.args.get('session')
+    repo = request.args.get('repo')
+    path = None
+    if session_id:
+        path = find_workspace_repository(session_id, repo)
+        if path is None:
+            return jsonify({'error': 'Repository not found in workspace'}), 404
+
+    # Scans run in the background; until the first one finishes the code metrics are empty
+    summary, scanning = metrics_engine.latest(path) if path else (None, False)
+
+    previous = (summary or {}).get("previous") or {}
+    previous_values = previous.get("metrics", {})
+    trends = {
+        metric: metric_trend(summary[key] if summary else None, previous_values.get(key))
+        for metric, key in CODE_METRICS.items()
+    }
+
+    # Delivery and production metrics have no source in a workspace yet
     base_metrics = {
-        "code_quality": random.randint(75, 95),
-        "test_coverage": random.randint(80, 98),
         "build_success": random.randint(85, 100),
         "deployment_frequency": random.randint(1, 10),
         "lead_time": random.randint(1, 7),
@@ -1717,62 +2479,87 @@ def get_metrics():
         "error_rate": round(random.uniform(0.1, 2.0), 2),
         "response_time": round(random.uniform(100, 500), 2)
     }
-    
-    # Add trend indicators
-    trends = {}
     for metric in base_metrics:
         trend = random.choice(['up', 'down', 'stable'])
         value = base_metrics[metric]
         if trend == 'up':
-            value = min(value + random.randint(1, 5), 100 if metric in ['code_quality', 'test_coverage', 'build_success'] else value * 1.2)
+            value = min(value + random.randint(1, 5), 100 if metric == 'build_success' else value * 1.2)
         elif trend == 'down':
-            value = max(value - random.randint(1, 5), 0 if metric in ['code_quality', 'test_coverage', 'build_success'] else value * 0.8)
+            value = max(value - random.randint(1, 5), 0 if metric == 'build_success' else value * 0.8)
         trends[metric] = {
             'value': value,
             'trend': trend,
             'change': abs(value - base_metrics[metric])
         }
-    
+
+    if summary:
+        trends["code"] = {key: value for key, value in summary.items() if key != "previous"}
+    trends["scanning"] = scanning
+    trends["repository"] = os.path.relpath(path, os.path.join(WORKSPACE_ROOT, session_id)) if path else None
     return jsonify(trends)
 
+@app.route('/metrics/stats')
+def get_metrics_stats():
+    """Report metrics cache reuse"""
+    return jsonify(metrics_engine.stats())
+
+def find_workspace_repository(session_id, repo=None):
+    """Path of a git repository inside a session's workspace, or None.
+
+    repo names a directory inside the session; without it the session's most
+    recently changed repository is used.
+    """
+    if not session_id:
+        return None
+    session_root = os.path.realpath(os.path.join(WORKSPACE_ROOT, session_id))
+    base = os.path.realpath(os.path.join(session_root, repo)) if repo else session_root
+    if os.path.dirname(session_root) != WORKSPACE_ROOT or os.path.commonpath([base, session_root]) != session_root:
+        return None
+    if not os.path.isdir(base):
+        return None
+    if os.path.exists(os.path.join(base, ".git")):
+        return base
+    if repo:
+        return None
+    candidates = []
+    for name in os.listdir(base):
+        git_dir = os.path.join(base, name, ".git")
+        if os.path.exists(git_dir):
+            candidates.append((os.path.getmtime(git_dir), os.path.join(base, name)))
+    return max(candidates)[1] if candidates else None
+
 @app.route('/activity')
 def get_activity():
-    """Generate more realistic activity data with patterns"""
-    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    
-    # Generate base activity with weekly patterns
-    base_commits = [random.randint(5, 15) for _ in range(7)]
-    base_issues = [random.randint(2, 8) for _ in range(7)]
-    base_prs = [random.randint(1, 5) for _ in range(7)]
-    base_deployments = [random.randint(0, 2) for _ in range(7)]
-    
-    # Add daily variations
-    commits = [max(0, x + random.randint(-3, 3)) for x in base_commits]
-    issues = [max(0, x + random.randint(-2, 2)) for x in base_issues]
-    prs = [max(0, x + random.randint(-1, 1)) for x in base_prs]
-    deployments = [max(0, x + random.randint(-1, 1)) for x in base_deployments]
-    
-    # Add weekly patterns (more activity on weekdays)
-    for i in range(7):
-        if days[i] in ['Sat', 'Sun']:
-            commits[i] = max(0, commits[i] - random.randint(2, 4))
-            issues[i] = max(0, issues[i] - random.randint(1, 2))
-            prs[i] = max(0, prs[i] - random.randint(0, 1))
-            deployments[i] = max(0, deployments[i] - random.randint(0, 1))
-    
-    return jsonify({
-        "commits": commits,
-        "issues": issues,
-        "pull_requests": prs,
-        "deployments": deployments,
-        "days": days,
-        "patterns": {
-            "weekday_activity": sum(commits[:5]) / 5,
-            "weekend_activity": sum(commits[5:]) / 2,
-            "average_daily_commits": sum(commits) / 7,
-            "busiest_day": days[commits.index(max(commits))]
-        }
-    })
+    """Commit, issue, pull request and tag activity from a workspace repository's git history"""
+    try:
+        days = min(max(int(request.args.get('days', 7)), 1), 90)
+        weeks = min(max(int(request.args.get('weeks', 12)), 1), 104)
+    except ValueError:
+        return jsonify({'error': 'days and weeks must be integers'}), 400
+    session_id = request.args.get('session')
+    repo = request.args.get('repo')
+    if not session_id:
+        # Without a session there is no workspace to report on; keep the chart's shape
+        return jsonify(dict(summarize_activity(empty_columns(), [], days=days, weeks=weeks), repository=None))
+    path = find_workspace_repository(session_id, repo)
+    if path is None:
+        return jsonify({'error': 'Repository not found in workspace'}), 404
+
+    try:
+        columns, authors = activity_cache.columns(path)
+        activity = summarize_activity(columns, authors, tag_timestamps(path), days=days, weeks=weeks)
+    except ActivityError as e:
+        return jsonify({'error': f'Could not read git history: {str(e)}'}), 400
+    except Exception as e:
+        print(f"Error analyzing activity for {path}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    activity["repository"] = os.path.relpath(path, os.path.join(WORKSPACE_ROOT, session_id))
+    return jsonify(activity)
+
+@app.route('/activity/stats')
+def get_activity_stats():
+    """Report activity cache scans and reuse"""
+    return jsonify(activity_cache.stats())
 
 if __name__ == '__main__':
     app.run(debug=True, port=3000)
\ No newline at end of file
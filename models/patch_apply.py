@@ -0,0 +1,269 @@
+"""Unified-diff and line-range editing with atomic, all-or-nothing writes.
+
+Edits are first applied in memory for every file involved. Only when every
+hunk matches and every expected hash agrees are the new contents written:
+each to a temp file in the target's directory, fsynced, then renamed over
+the original. Right before the renames, under a lock per path, every file is
+checked again against the contents the edits were computed from, so a write
+that landed in between is reported instead of overwritten. If a rename fails
+part way, files already replaced are put back from hardlinked backups.
+"""
+import hashlib
+import os
+import re
+import threading
+import uuid
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# How far a hunk may have drifted from its stated position
+MAX_HUNK_OFFSET = 200
+
+path_locks = {}
+path_locks_guard = threading.Lock()
+
+class PatchError(Exception):
+    """Raised when a patch cannot be applied; status is the HTTP status to report"""
+
+    def __init__(self, message, status=400, path=None):
+        super().__init__(message)
+        self.status = status
+        self.path = path
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _strip_prefix(path):
+    path = path.split("\t")[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        return path[2:]
+    return path
+
+def parse_unified_diff(text):
+    """Split a (possibly multi-file) unified diff into file patches.
+
+    Returns a list of {"old_path", "new_path", "hunks"} where each hunk is
+    {"old_start", "lines"} and lines are (tag, text) pairs with tag in " -+".
+    Hunk bodies are read by the line counts in their @@ header, so removed
+    or added lines that look like "---"/"+++" headers stay part of the hunk,
+    and anything after the last hunk (blank lines, commentary) is ignored.
+    """
+    files = []
+    current = None
+    lines = text.splitlines(keepends=True)
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = {
+                "old_path": _strip_prefix(line[4:].rstrip("\r\n")),
+                "new_path": _strip_prefix(lines[i + 1][4:].rstrip("\r\n")),
+                "hunks": []
+            }
+            files.append(current)
+            i += 2
+            continue
+
+        match = HUNK_HEADER.match(line)
+        if not match:
+            # "diff --git", "index" and other lines between patches carry nothing we need
+            i += 1
+            continue
+        if current is None:
+            raise PatchError("Hunk found before any file header")
+        hunk = {
+            "old_start": int(match.group(1)),
+            "old_count": int(match.group(2)) if match.group(2) is not None else 1,
+            "new_count": int(match.group(4)) if match.group(4) is not None else 1,
+            "lines": []
+        }
+        current["hunks"].append(hunk)
+        number = len(current["hunks"])
+        old_left, new_left = hunk["old_count"], hunk["new_count"]
+        i += 1
+        while i < len(lines) and (old_left or new_left or lines[i].startswith("\\")):
+            line = lines[i]
+            i += 1
+            if line.startswith("\\"):
+                # "\ No newline at end of file" applies to the previous line
+                if hunk["lines"]:
+                    tag, previous = hunk["lines"][-1]
+                    hunk["lines"][-1] = (tag, previous.rstrip("\r\n"))
+                continue
+            if line in ("\n", "\r\n"):
+                # Some tools drop the leading space of empty context lines
+                tag, body = " ", line
+            else:
+                tag, body = line[:1], line[1:]
+            if tag == " " and old_left and new_left:
+                old_left -= 1
+                new_left -= 1
+            elif tag == "-" and old_left:
+                old_left -= 1
+            elif tag == "+" and new_left:
+                new_left -= 1
+            else:
+                raise PatchError(f"Hunk {number} of {current['new_path'] or current['old_path']} "
+                                 f"does not match its header line counts")
+            hunk["lines"].append((tag, body))
+        if old_left or new_left:
+            raise PatchError(f"Hunk {number} of {current['new_path'] or current['old_path']} is truncated")
+
+    if not files:
+        raise PatchError("No file headers found in patch")
+    return files
+
+def _matches(lines, start, expected):
+    if start < 0 or start + len(expected) > len(lines):
+        return False
+    return all(lines[start + k].rstrip("\r\n") == expected[k].rstrip("\r\n") for k in range(len(expected)))
+
+def apply_hunks(lines, hunks):
+    """Apply parsed hunks to a list of lines (with line endings); returns new lines"""
+    result = []
+    position = 0
+    for number, hunk in enumerate(hunks, 1):
+        old = [text for tag, text in hunk["lines"] if tag in (" ", "-")]
+        new = [text for tag, text in hunk["lines"] if tag in (" ", "+")]
+        expected_start = hunk["old_start"] - 1 if hunk["old_count"] else hunk["old_start"]
+
+        # Look for the context at the stated line first, then nearby
+        start = None
+        for delta in range(MAX_HUNK_OFFSET + 1):
+            for candidate in (expected_start + delta, expected_start - delta) if delta else (expected_start,):
+                if candidate >= position and _matches(lines, candidate, old):
+                    start = candidate
+                    break
+            if start is not None:
+                break
+        if start is None:
+            raise PatchError(f"Hunk {number} does not apply (expected near line {hunk['old_start']})", status=409)
+
+        result.extend(lines[position:start])
+        result.extend(new)
+        position = start + len(old)
+    result.extend(lines[position:])
+    return result
+
+def apply_line_edits(lines, edits):
+    """Replace 1-based inclusive line ranges; end_line = start_line - 1 inserts before start_line"""
+    ordered = sorted(edits, key=lambda e: (e["start_line"], e.get("end_line", e["start_line"])))
+    for previous, following in zip(ordered, ordered[1:]):
+        if following["start_line"] <= previous.get("end_line", previous["start_line"]):
+            raise PatchError("Line range edits overlap")
+
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    # Apply from the bottom up so earlier line numbers stay valid
+    for edit in reversed(ordered):
+        start = edit["start_line"]
+        end = edit.get("end_line", start)
+        if start < 1 or end < start - 1 or end > len(lines):
+            raise PatchError(f"Line range {start}-{end} is outside the file ({len(lines)} lines)", status=409)
+        content = edit.get("content", "")
+        replacement = content.splitlines(keepends=True)
+        # Keep a line terminator wherever the replaced range (or, for an
+        # insertion, the line before it) had one
+        terminated = end < len(lines) or (end >= 1 and lines[end - 1].endswith(("\n", "\r")))
+        if replacement and not replacement[-1].endswith(("\n", "\r")) and terminated:
+            replacement[-1] += newline
+        if replacement and start >= 2 and end == start - 1 and not lines[start - 2].endswith(("\n", "\r")):
+            # Inserting after a final line without a terminator
+            lines[start - 2] += newline
+        lines[start - 1:end] = replacement
+    return lines
+
+def _path_lock(path):
+    with path_locks_guard:
+        return path_locks.setdefault(path, threading.Lock())
+
+def _read_current(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def write_atomically(changes, originals=None):
+    """Commit {path: bytes or None (delete)} so either all files change or none do.
+
+    originals maps paths to the contents (None for a missing file) the
+    changes were computed from; if any file no longer matches when the
+    renames are about to happen, nothing is written and PatchError(409) is
+    raised.
+    """
+    locks = [_path_lock(path) for path in sorted(changes)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        if originals:
+            for path in changes:
+                if path in originals and _read_current(path) != originals[path]:
+                    raise PatchError(f"{os.path.basename(path)} changed while the patch was being applied",
+                                     status=409, path=path)
+        _commit(changes)
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def _commit(changes):
+    staged = []
+    try:
+        for path, data in changes.items():
+            if data is None:
+                staged.append((path, None))
+                continue
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            temp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex[:8]}.patch")
+            with open(temp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                # Keep the permission bits, but not a shared blob's read-only mode
+                os.chmod(temp_path, (os.stat(path).st_mode & 0o777) | 0o200)
+            staged.append((path, temp_path))
+    except Exception:
+        for _, temp_path in staged:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+
+    backups = []
+    try:
+        for path, temp_path in staged:
+            backup = None
+            if os.path.exists(path):
+                backup = f"{path}.{uuid.uuid4().hex[:8]}.orig"
+                os.link(path, backup)
+            backups.append((path, backup))
+            if temp_path is None:
+                os.remove(path)
+            else:
+                os.replace(temp_path, path)
+    except Exception:
+        # Put back everything already replaced
+        for path, backup in backups:
+            if backup:
+                os.replace(backup, path)
+            elif os.path.exists(path):
+                os.remove(path)
+        for _, temp_path in staged:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    for _, backup in backups:
+        if backup:
+            os.remove(backup)
+
+    # Make the renames themselves durable
+    for directory in {os.path.dirname(path) for path in changes}:
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,117 @@
+"""Warm Python worker used by the code assistant's execute_python tool.
+
+The parent process starts this script ahead of time so interpreter startup
+and heavy imports (numpy, pandas, sklearn, ...) are paid before a snippet
+arrives. Requests and responses are single JSON lines on stdin/stdout.
+"""
+import ast
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+
+MAX_OUTPUT_CHARS = 100_000
+
+def preload(modules):
+    """Import the configured modules, skipping any that are not installed"""
+    loaded = {}
+    for name in modules:
+        if not name:
+            continue
+        try:
+            alias = {"numpy": "np", "pandas": "pd"}.get(name, name.split(".")[0])
+            loaded[alias] = __import__(name)
+        except Exception:
+            pass
+    return loaded
+
+def truncate(text):
+    if len(text) > MAX_OUTPUT_CHARS:
+        return text[:MAX_OUTPUT_CHARS] + f"\n... [truncated {len(text) - MAX_OUTPUT_CHARS} characters]"
+    return text
+
+def run_snippet(code, namespace):
+    """Execute code like a notebook cell: the value of a trailing expression is returned"""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    result_repr = None
+    error = None
+    started = time.perf_counter()
+
+    try:
+        tree = ast.parse(code, filename="<snippet>", mode="exec")
+        last_expr = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last_expr = ast.Expression(tree.body.pop().value)
+
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exec(compile(tree, "<snippet>", "exec"), namespace)
+            if last_expr is not None:
+                value = eval(compile(last_expr, "<snippet>", "eval"), namespace)
+                if value is not None:
+                    result_repr = repr(value)
+    except BaseException as e:
+        if isinstance(e, SystemExit):
+            error = f"SystemExit: {e.code}"
+        else:
+            # Hide this worker's own frames from the traceback
+            tb = e.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename != "<snippet>":
+                tb = tb.tb_next
+            error = "".join(traceback.format_exception(type(e), e, tb))
+
+    return {
+        "success": error is None,
+        "stdout": truncate(stdout.getvalue()),
+        "stderr": truncate(stderr.getvalue()),
+        "result": truncate(result_repr) if result_repr is not None else None,
+        "error": error,
+        "exec_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+def main():
+    # Keep the protocol channels private so prints and input() from user code
+    # or child processes can never corrupt or consume them
+    requests = os.fdopen(os.dup(0), "r")
+    channel = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+
+    started = time.perf_counter()
+    modules = [m.strip() for m in os.environ.get("PYTHON_KERNEL_PRELOAD", "").split(",")]
+    preloaded = preload(modules)
+    base_namespace = {"__name__": "__main__", "__builtins__": __builtins__, **preloaded}
+    namespace = dict(base_namespace)
+
+    channel.write(json.dumps({
+        "ready": True,
+        "pid": os.getpid(),
+        "preloaded": sorted(preloaded),
+        "startup_ms": round((time.perf_counter() - started) * 1000, 3)
+    }) + "\n")
+
+    for line in requests:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        op = request.get("op")
+        if op == "init":
+            os.chdir(request["cwd"])
+            sys.path.insert(0, request["cwd"])
+            response = {"success": True}
+        elif op == "reset":
+            namespace = dict(base_namespace)
+            response = {"success": True}
+        elif op == "exec":
+            response = run_snippet(request.get("code", ""), namespace)
+        else:
+            response = {"success": False, "error": f"Unknown op: {op}"}
+
+        channel.write(json.dumps(response) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Monte Carlo schedule-risk simulation for dashboard phases.
+
+Every scenario draws each phase duration from a PERT (scaled beta)
+distribution around its planned duration. Each risk triggers with its
+probability, and a triggered risk delays the phases it affects by a
+triangular amount scaled by its impact. All scenarios are sampled at once
+as NumPy arrays (scenarios x phases), so 100k scenarios take well under
+100 ms. Phases run one after another, so a scenario's completion time
+is the sum of its phase durations.
+"""
+import re
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_ITERATIONS = 100_000
+HISTOGRAM_BINS = 30
+QUANTILE_POINTS = 4097
+# Pessimistic duration as a multiple of the plan, by project complexity
+PESSIMISTIC_FACTOR = {"low": 1.4, "medium": 1.6, "high": 2.0}
+OPTIMISTIC_FACTOR = 0.8
+# Risk probability/impact are 1-10 scores; a 10/10 risk triggers this often
+MAX_TRIGGER_PROBABILITY = 0.6
+# A 10/10 impact delays an affected phase by this fraction of its plan on average
+MAX_IMPACT_DELAY = 0.5
+STATUS_PROBABILITY_FACTOR = {"Mitigated": 0.5, "Monitoring": 0.75, "Active": 1.0}
+# Which phases a risk hits, matched against phase names; unmatched risks hit every phase
+RISK_PHASE_KEYWORDS = {
+    "scope": ("planning", "development"),
+    "technical": ("design", "development"),
+    "integration": ("development", "testing"),
+    "security": ("testing", "deployment"),
+    "performance": ("testing", "deployment")
+}
+
+@lru_cache(maxsize=64)
+def beta_quantiles(alpha, beta, points=QUANTILE_POINTS):
+    """Inverse CDF of Beta(alpha, beta) tabulated at evenly spaced probabilities"""
+    x = np.linspace(0, 1, points)
+    # Integrate the density on cell midpoints so alpha or beta below 1 stays finite
+    mid = (x[:-1] + x[1:]) / 2
+    density = mid ** (alpha - 1) * (1 - mid) ** (beta - 1)
+    cdf = np.concatenate([[0.0], np.cumsum(density)])
+    return np.interp(np.linspace(0, 1, points), cdf / cdf[-1], x)
+
+def pert_samples(rng, optimistic, likely, pessimistic, size):
+    """Draw (size, len(likely)) durations from PERT distributions.
+
+    Uniform draws are mapped through a tabulated inverse CDF by plain index
+    arithmetic, which is several times faster than Generator.beta; phases
+    with the same shape share one table.
+    """
+    span = np.maximum(pessimistic - optimistic, 1e-9)
+    alpha = np.round(1 + 4 * (likely - optimistic) / span, 6)
+    beta = np.round(1 + 4 * (pessimistic - likely) / span, 6)
+    # random() < 1, so index + 1 never runs past the table
+    position = rng.random((size, len(likely))) * (QUANTILE_POINTS - 1)
+    index = position.astype(np.int64)
+    position -= index
+    shapes = set(zip(alpha.tolist(), beta.tolist()))
+    if len(shapes) == 1:
+        table = beta_quantiles(*shapes.pop())
+        lower = table[index]
+        unit = lower + position * (table[index + 1] - lower)
+    else:
+        unit = np.empty_like(position)
+        for shape in shapes:
+            table = beta_quantiles(*shape)
+            columns = (alpha == shape[0]) & (beta == shape[1])
+            lower = table[index[:, columns]]
+            unit[:, columns] = lower + position[:, columns] * (table[index[:, columns] + 1] - lower)
+    return optimistic + unit * span
+
+def phase_duration(phase):
+    """Planned duration as a number from 3, 2.5 or "3 weeks"."""
+    duration = phase.get("duration", 0)
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    match = re.search(r"\d+(?:\.\d+)?", str(duration))
+    return float(match.group()) if match else 0.0
+
+def affected_phases(risk, phase_names):
+    """Boolean mask of the phases a risk delays"""
+    lowered = [name.lower() for name in phase_names]
+    if risk.get("phase"):
+        target = risk["phase"].lower()
+        mask = np.array([target in name for name in lowered])
+        if mask.any():
+            return mask
+    risk_name = risk.get("name", "").lower()
+    for keyword, targets in RISK_PHASE_KEYWORDS.items():
+        if keyword in risk_name:
+            mask = np.array([any(t in name for t in targets) for name in lowered])
+            if mask.any():
+                return mask
+    return np.ones(len(phase_names), dtype=bool)
+
+def simulate_schedule(phases, risks, complexity="medium", iterations=DEFAULT_ITERATIONS,
+                      start_date=None, seed=None, unit_days=7):
+    """Simulate phase durations (in weeks by default) and risk delays.
+
+    Returns completion percentiles and dates, per-phase criticality, per-risk
+    expected delay and a histogram of total durations.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    names = [phase.get("name", f"Phase {i + 1}") for i, phase in enumerate(phases)]
+    planned = np.array([phase_duration(phase) for phase in phases])
+    if not len(planned):
+        raise ValueError("At least one phase is required")
+
+    pessimistic = planned * PESSIMISTIC_FACTOR.get(complexity, PESSIMISTIC_FACTOR["medium"])
+    durations = pert_samples(rng, planned * OPTIMISTIC_FACTOR, planned, pessimistic, iterations)
+
+    risk_results = []
+    for risk in risks:
+        probability = min(float(risk.get("probability", 5)) / 10, 1.0) * MAX_TRIGGER_PROBABILITY
+        probability *= STATUS_PROBABILITY_FACTOR.get(risk.get("status"), 1.0)
+        mask = affected_phases(risk, names)
+        mean_delay = float(risk.get("impact", 5)) / 10 * MAX_IMPACT_DELAY * planned * mask
+        triggered = rng.random(iterations) < probability
+        count = int(triggered.sum())
+        if count:
+            # Triangular(0, mode, 2 * mode) has the requested mean
+            delay = rng.triangular(0, 1, 2, size=(count, 1)) * mean_delay
+            durations[triggered] += delay
+        risk_results.append({
+            "name": risk.get("name"),
+            "trigger_probability": round(probability, 3),
+            "affected_phases": [name for name, hit in zip(names, mask) if hit],
+            "expected_delay": round(float(probability * mean_delay.sum()), 2)
+        })
+
+    totals = durations.sum(axis=1)
+    p50, p80, p95 = np.percentile(totals, [50, 80, 95])
+    planned_total = float(planned.sum())
+
+    # Share of the variance in the finish date each phase accounts for
+    # (centering the totals alone is enough for the covariance)
+    centered_totals = totals - totals.mean()
+    total_variance = max(float(centered_totals @ centered_totals) / iterations, 1e-12)
+    contribution = (centered_totals @ durations) / iterations / total_variance
+    # A phase is critical in a scenario when it is that scenario's biggest overrun
+    overrun = durations - planned
+    critical_counts = np.bincount(overrun.argmax(axis=1), minlength=len(planned))
+
+    counts, edges = np.histogram(totals, bins=HISTOGRAM_BINS)
+    start = start_date or datetime.now().date()
+
+    def finish(units):
+        return (start + timedelta(days=float(units) * unit_days)).isoformat()
+
+    total_risk_delay = sum(r["expected_delay"] for r in risk_results) or 1.0
+    for result in risk_results:
+        result["delay_share"] = round(result["expected_delay"] / total_risk_delay, 3)
+
+    return {
+        "iterations": iterations,
+        "unit_days": unit_days,
+        "start_date": start.isoformat(),
+        "planned": round(planned_total, 2),
+        "mean": round(float(totals.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p80": round(float(p80), 2),
+        "p95": round(float(p95), 2),
+        "dates": {"planned": finish(planned_total), "p50": finish(p50), "p80": finish(p80), "p95": finish(p95)},
+        "on_time_probability": round(float((totals <= planned_total).mean()), 3),
+        "phases": [
+            {
+                "name": name,
+                "planned": round(float(planned[i]), 2),
+                "mean": round(float(durations[:, i].mean()), 2),
+                "p80": round(float(np.percentile(durations[:, i], 80)), 2),
+                "criticality": round(float(critical_counts[i] / iterations), 3),
+                "variance_share": round(float(contribution[i]), 3),
+                "overrun_probability": round(float((overrun[:, i] > 0).mean()), 3)
+            }
+            for i, name in enumerate(names)
+        ],
+        "risks": risk_results,
+        "histogram": {
+            "bin_edges": [round(float(edge), 2) for edge in edges],
+            "counts": counts.tolist()
+        },
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
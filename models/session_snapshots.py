@@ -0,0 +1,138 @@
+"""Compressed session snapshots for parking and reviving sessions.
+
+A snapshot is a single tar stream, compressed with zstd when the zstandard
+package is installed and gzip otherwise. The first member is session.json,
+so metadata can be read without decompressing the rest; the directories
+follow under fixed prefixes (workspace/, vectordb/).
+"""
+import gzip
+import io
+import json
+import os
+import shutil
+import tarfile
+import time
+import uuid
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+METADATA_NAME = "session.json"
+ZSTD_LEVEL = 3
+SNAPSHOT_EXTENSIONS = (".tar.zst", ".tar.gz")
+
+def snapshot_extension():
+    return ".tar.zst" if zstandard is not None else ".tar.gz"
+
+def _open_writer(path):
+    raw = open(path, "wb")
+    if path.endswith(".tar.zst"):
+        return raw, zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1).stream_writer(raw)
+    return raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+
+def _open_reader(path):
+    raw = open(path, "rb")
+    if path.endswith(".tar.zst"):
+        if zstandard is None:
+            raw.close()
+            raise RuntimeError("Restoring .tar.zst snapshots needs the zstandard package")
+        return raw, zstandard.ZstdDecompressor().stream_reader(raw)
+    return raw, gzip.GzipFile(fileobj=raw, mode="rb")
+
+def write_snapshot(path, metadata, directories):
+    """Write metadata plus {prefix: directory} into one compressed archive at path.
+
+    The archive is written to a temp file and renamed, so an existing
+    snapshot is never left half-overwritten. Returns the archive size.
+    """
+    # The temp name keeps the compression suffix _open_writer looks at
+    extension = ".tar.zst" if path.endswith(".tar.zst") else ".tar.gz"
+    temp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex[:8]}.tmp{extension}")
+    raw, stream = _open_writer(temp_path)
+    try:
+        with tarfile.open(fileobj=stream, mode="w|") as archive:
+            data = json.dumps(metadata, default=str).encode("utf-8")
+            info = tarfile.TarInfo(METADATA_NAME)
+            info.size = len(data)
+            info.mtime = time.time()
+            archive.addfile(info, io.BytesIO(data))
+            for prefix, directory in directories.items():
+                if os.path.isdir(directory):
+                    archive.add(directory, arcname=prefix, filter=_skip_partials)
+        stream.close()
+        raw.close()
+        os.replace(temp_path, path)
+    finally:
+        if not raw.closed:
+            raw.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return os.path.getsize(path)
+
+def _skip_partials(info):
+    # In-flight temp files from uploads and extraction are not worth keeping
+    if info.name.endswith((".part", ".blobtmp", ".cow")):
+        return None
+    return info
+
+def read_metadata(path):
+    """Read only the leading session.json member"""
+    raw, stream = _open_reader(path)
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as archive:
+            for member in archive:
+                if member.name == METADATA_NAME:
+                    return json.load(archive.extractfile(member))
+                break
+    finally:
+        raw.close()
+    raise ValueError(f"{path} has no {METADATA_NAME}")
+
+def extract_snapshot(path, targets, staging_dir):
+    """Restore {prefix: directory} from a snapshot and return its metadata.
+
+    Everything is extracted into a staging directory first and then renamed
+    into place, so a failed restore never leaves a half-populated workspace.
+    """
+    staging = os.path.join(staging_dir, f"restore-{uuid.uuid4().hex[:8]}")
+    os.makedirs(staging)
+    raw, stream = _open_reader(path)
+    metadata = None
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as archive:
+            for member in archive:
+                if member.name == METADATA_NAME:
+                    metadata = json.load(archive.extractfile(member))
+                    continue
+                try:
+                    # The "data" filter rejects absolute paths, traversal and unsafe links
+                    archive.extract(member, staging, filter="data")
+                except tarfile.FilterError:
+                    continue
+
+        for prefix, directory in targets.items():
+            source = os.path.join(staging, prefix)
+            if not os.path.isdir(source):
+                os.makedirs(directory, exist_ok=True)
+                continue
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+            os.makedirs(os.path.dirname(directory), exist_ok=True)
+            os.replace(source, directory)
+    finally:
+        raw.close()
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if metadata is None:
+        raise ValueError(f"{path} has no {METADATA_NAME}")
+    return metadata
+
+def find_snapshot(snapshot_dir, name):
+    """Return the snapshot path for name, whichever compression it was written with"""
+    for extension in SNAPSHOT_EXTENSIONS:
+        path = os.path.join(snapshot_dir, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
@@ -0,0 +1,219 @@
+"""Critical-path and resource-levelled scheduling for project tasks.
+
+Tasks are dicts with an id, a duration, the ids they depend on, and
+optionally a role and the number of workers they need. The critical path
+method (a forward and a backward pass in topological order) gives each task
+its earliest and latest start, its slack and the critical path, assuming
+unlimited people. A parallel list scheduler then levels the plan against
+team capacity per role: it steps from one finish event to the next and
+starts ready tasks in order of their latest allowed start, so critical
+work is staffed first. Both passes are O(tasks + dependencies) plus a heap, which keeps
+10k-task graphs well under a second.
+"""
+import heapq
+import math
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+
+DEFAULT_ROLE = "team"
+EPSILON = 1e-9
+
+class SchedulingError(Exception):
+    """Raised for task graphs that cannot be scheduled (unknown ids, cycles, bad numbers)"""
+
+def people_count(value, name):
+    """value as a positive whole number of people; SchedulingError otherwise (e.g. 0, 1.5, Infinity)"""
+    if (isinstance(value, bool) or not isinstance(value, (int, float))
+            or not math.isfinite(value) or value < 1 or value != int(value)):
+        raise SchedulingError(f"{name} must be a positive whole number, got {value!r}")
+    return int(value)
+
+def index_tasks(tasks):
+    """Resolve ids and dependencies to indices: (ids, durations, predecessors, successors)"""
+    ids = [str(task.get("id", i)) for i, task in enumerate(tasks)]
+    position = {}
+    for i, task_id in enumerate(ids):
+        if task_id in position:
+            raise SchedulingError(f"Duplicate task id: {task_id}")
+        position[task_id] = i
+    durations = [max(float(task.get("duration", 0) or 0), 0.0) for task in tasks]
+    for task_id, duration in zip(ids, durations):
+        if not math.isfinite(duration):
+            raise SchedulingError(f"Task {task_id} has a duration that is not a finite number")
+    predecessors = [[] for _ in tasks]
+    successors = [[] for _ in tasks]
+    for i, task in enumerate(tasks):
+        for dependency in task.get("dependencies") or []:
+            j = position.get(str(dependency))
+            if j is None:
+                raise SchedulingError(f"Task {ids[i]} depends on unknown task {dependency}")
+            if j not in predecessors[i]:
+                predecessors[i].append(j)
+                successors[j].append(i)
+    return ids, durations, predecessors, successors
+
+def topological_order(predecessors, successors):
+    """Kahn's algorithm; tasks caught in a cycle are left out of the order"""
+    remaining = [len(p) for p in predecessors]
+    queue = deque(i for i, count in enumerate(remaining) if count == 0)
+    order = []
+    while queue:
+        i = queue.popleft()
+        order.append(i)
+        for j in successors[i]:
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                queue.append(j)
+    return order
+
+def critical_path_times(order, durations, predecessors, successors):
+    """Forward and backward passes: (earliest_start, latest_start, makespan)"""
+    count = len(order)
+    earliest = [0.0] * count
+    for i in order:
+        start = 0.0
+        for j in predecessors[i]:
+            finish = earliest[j] + durations[j]
+            if finish > start:
+                start = finish
+        earliest[i] = start
+    makespan = max((earliest[i] + durations[i] for i in order), default=0.0)
+    latest = [0.0] * count
+    for i in reversed(order):
+        finish = makespan
+        for j in successors[i]:
+            if latest[j] < finish:
+                finish = latest[j]
+        latest[i] = finish - durations[i]
+    return earliest, latest, makespan
+
+def trace_critical_path(order, earliest, latest, durations, successors):
+    """One chain of zero-slack tasks from the project start to its finish"""
+    critical = [latest[i] - earliest[i] <= EPSILON for i in range(len(order))]
+    current = next((i for i in order if critical[i] and earliest[i] <= EPSILON), None)
+    path = []
+    while current is not None:
+        path.append(current)
+        finish = earliest[current] + durations[current]
+        current = next((j for j in successors[current]
+                        if critical[j] and abs(earliest[j] - finish) <= EPSILON), None)
+    return path
+
+def level_resources(durations, predecessors, successors, roles, demands, capacity, priority):
+    """Parallel list scheduling against per-role capacity; returns (starts, finishes).
+
+    Ready tasks wait in one heap per role, ordered by priority. A role keeps
+    starting its most urgent ready task while enough of its people are free;
+    when that task does not fit, the role waits for the next finish instead
+    of letting smaller tasks jump ahead, so large critical tasks are never
+    starved.
+    """
+    count = len(durations)
+    starts = [0.0] * count
+    finishes = [0.0] * count
+    remaining = [len(p) for p in predecessors]
+    free = dict(capacity)
+    ready = defaultdict(list)
+    for i in range(count):
+        if remaining[i] == 0:
+            heapq.heappush(ready[roles[i]], (priority[i], i))
+    events = []
+    now = 0.0
+    done = 0
+    while done < count:
+        for role, queue in ready.items():
+            while queue and demands[queue[0][1]] <= free[role]:
+                _, i = heapq.heappop(queue)
+                free[role] -= demands[i]
+                starts[i] = now
+                finishes[i] = now + durations[i]
+                heapq.heappush(events, (finishes[i], i))
+        if not events:
+            raise SchedulingError("Tasks left unscheduled; check task demands against capacity")
+        now = events[0][0]
+        while events and events[0][0] <= now + EPSILON:
+            _, i = heapq.heappop(events)
+            done += 1
+            free[roles[i]] += demands[i]
+            for j in successors[i]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    heapq.heappush(ready[roles[j]], (priority[j], j))
+    return starts, finishes
+
+def schedule_tasks(tasks, capacity=None, start_date=None, unit_days=7):
+    """Compute the critical path, slack and a resource-levelled plan.
+
+    capacity is a number of people available to every role, or a dict of
+    people per role (roles missing from it get one person); counts must be
+    positive whole numbers. None means unlimited, so the levelled plan equals the critical-path plan. Tasks
+    needing more workers than their role has are capped to the role size.
+    Durations are in weeks by default; unit_days converts them to dates.
+    """
+    started = time.perf_counter()
+    ids, durations, predecessors, successors = index_tasks(tasks)
+    order = topological_order(predecessors, successors)
+    if len(order) < len(tasks):
+        ordered = set(order)
+        cyclic = [ids[i] for i in range(len(tasks)) if i not in ordered]
+        raise SchedulingError(f"Dependency cycle among tasks: {', '.join(cyclic[:10])}"
+                              + (f" and {len(cyclic) - 10} more" if len(cyclic) > 10 else ""))
+    earliest, latest, makespan = critical_path_times(order, durations, predecessors, successors)
+    path = trace_critical_path(order, earliest, latest, durations, successors)
+
+    roles = [str(task.get("role") or DEFAULT_ROLE) for task in tasks]
+    demands = [people_count(task.get("workers") or 1, f"Workers of task {task_id}") for task, task_id in zip(tasks, ids)]
+    if capacity is None:
+        role_capacity = {role: float("inf") for role in roles}
+    elif isinstance(capacity, dict):
+        role_capacity = {role: people_count(capacity.get(role, 1), f"Capacity of role {role}") for role in roles}
+    else:
+        role_capacity = {role: people_count(capacity, "Capacity") for role in roles}
+    demands = [min(demand, role_capacity[role]) for demand, role in zip(demands, roles)]
+    # Earliest latest-start first, then longest duration, then input order
+    priority = [(latest[i], -durations[i], i) for i in range(len(tasks))]
+    starts, finishes = level_resources(durations, predecessors, successors, roles, demands, role_capacity, priority)
+    levelled_makespan = max(finishes, default=0.0)
+
+    start = start_date or datetime.now().date()
+
+    def to_date(units):
+        return (start + timedelta(days=units * unit_days)).isoformat()
+
+    utilization = {}
+    if capacity is not None and levelled_makespan > 0:
+        busy = defaultdict(float)
+        for duration, role, demand in zip(durations, roles, demands):
+            busy[role] += duration * demand
+        utilization = {role: round(busy[role] / (role_capacity[role] * levelled_makespan), 3) for role in busy}
+
+    return {
+        "start_date": start.isoformat(),
+        "unit_days": unit_days,
+        "duration": round(makespan, 3),
+        "levelled_duration": round(levelled_makespan, 3),
+        "finish_date": to_date(levelled_makespan),
+        "critical_path": [ids[i] for i in path],
+        "utilization": utilization,
+        "tasks": [
+            {
+                "id": ids[i],
+                "name": task.get("name", ids[i]),
+                "role": roles[i],
+                "workers": demands[i],
+                "duration": durations[i],
+                "dependencies": [ids[j] for j in predecessors[i]],
+                "earliest_start": round(earliest[i], 3),
+                "latest_start": round(latest[i], 3),
+                "slack": round(latest[i] - earliest[i], 3),
+                "critical": latest[i] - earliest[i] <= EPSILON,
+                "start": round(starts[i], 3),
+                "finish": round(finishes[i], 3),
+                "start_date": to_date(starts[i]),
+                "finish_date": to_date(finishes[i])
+            }
+            for i, task in enumerate(tasks)
+        ],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -12,7 +12,16 @@ from pathlib import Path
 import json
 import shutil
 import uuid
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from chunked_uploads import ChunkedUploadStore, UploadError, save_upload_file, save_stream
+from blob_store import BlobStore
+from archive_extract import ArchiveError, extract_request_stream
+from workspace_walker import DEFAULT_IGNORED_DIRS
 
 load_dotenv()
 
@@ -40,6 +49,8 @@ class ChatResponse(BaseModel):
     tool_calls: List[Dict[str, Any]] = []
     session_id: str
     context: Dict[str, Any] = {}
+    steps: List[Dict[str, Any]] = []
+    stop_reason: Optional[str] = None
     
 class WorkspaceInfo(BaseModel):
     current_directory: str
@@ -60,6 +71,19 @@ sessions = {}
 WORKSPACE_ROOT = os.path.join(os.getcwd(), "workspace")
 os.makedirs(WORKSPACE_ROOT, exist_ok=True)
 
+# Staging area for resumable chunked uploads
+UPLOAD_STAGING_DIR = os.path.join(os.getcwd(), "upload_staging")
+upload_store = ChunkedUploadStore(UPLOAD_STAGING_DIR)
+
+# Bounded pool for writing multi-file uploads to disk
+UPLOAD_WRITE_WORKERS = int(os.environ.get("UPLOAD_WRITE_WORKERS", 8))
+MAX_UPLOAD_FILES = int(os.environ.get("MAX_UPLOAD_FILES", 20000))
+upload_write_pool = ThreadPoolExecutor(max_workers=UPLOAD_WRITE_WORKERS, thread_name_prefix="upload-write")
+
+# Content-addressed store shared with the assistant server
+BLOB_STORE_DIR = os.path.join(os.getcwd(), "blob_store")
+blob_store = BlobStore(BLOB_STORE_DIR)
+
 # Session management
 def get_or_create_session(session_id: Optional[str] = None):
     """Get existing session or create a new one"""
@@ -81,6 +105,202 @@ def get_or_create_session(session_id: Optional[str] = None):
     
     return session_id, sessions[session_id]
 
+# Workspace summaries for the system prompt
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("SUMMARY_TOKEN_BUDGET", 400))
+SUMMARY_MAX_DEPTH = 4
+SUMMARY_FILES_PER_DIR = 8
+MAX_WORKSPACE_SUMMARIES = int(os.environ.get("MAX_WORKSPACE_SUMMARIES", 64))
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class WorkspaceSummary:
+    """Compact, cached tree of a session workspace, down to SUMMARY_MAX_DEPTH.
+    
+    Each directory's listing is cached with its mtime and only rescanned when
+    that mtime changes. File sizes are re-read on every refresh, because
+    in-place writes (from shell commands, the kernel or any tool) do not touch
+    directory mtimes. Directories below the summarized depth are never read;
+    totals that stop there are shown with a "+". Refreshing stats files, so
+    callers on the event loop run summary() in a worker thread.
+    """
+    
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        # path -> {"mtime", "files", "bytes", "names", "subdirs"}
+        self.nodes = {}
+        self.version = 0
+        self.rendered = {}
+    
+    def _scan(self, directory, mtime):
+        node = {"mtime": mtime, "files": 0, "bytes": 0, "names": [], "subdirs": []}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        node["subdirs"].append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        node["files"] += 1
+                        node["bytes"] += entry.stat(follow_symlinks=False).st_size
+                        node["names"].append(entry.name)
+                except OSError:
+                    continue
+        node["names"].sort()
+        node["subdirs"].sort()
+        return node
+    
+    @staticmethod
+    def _file_bytes(directory, names):
+        size = 0
+        for name in names:
+            try:
+                size += os.stat(os.path.join(directory, name), follow_symlinks=False).st_size
+            except OSError:
+                continue
+        return size
+    
+    def refresh(self):
+        """Bring the cached tree up to date; returns True if anything changed"""
+        changed = False
+        seen = set()
+        stack = [(self.root, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(directory)
+            node = self.nodes.get(directory)
+            if node is None or node["mtime"] != mtime:
+                try:
+                    node = self.nodes[directory] = self._scan(directory, mtime)
+                except OSError:
+                    continue
+                changed = True
+            else:
+                size = self._file_bytes(directory, node["names"])
+                if size != node["bytes"]:
+                    node["bytes"] = size
+                    changed = True
+            if depth < SUMMARY_MAX_DEPTH:
+                stack.extend((os.path.join(directory, name), depth + 1) for name in node["subdirs"]
+                             if name not in DEFAULT_IGNORED_DIRS)
+        
+        for directory in set(self.nodes) - seen:
+            del self.nodes[directory]
+            changed = True
+        
+        if changed:
+            self.version += 1
+            self.rendered.clear()
+        return changed
+    
+    def _totals(self, directory, totals):
+        """(files, bytes, partial) for a directory; partial when part of it was not walked"""
+        if directory in totals:
+            return totals[directory]
+        node = self.nodes.get(directory)
+        if node is None:
+            return (0, 0, True)
+        files, size, partial = node["files"], node["bytes"], False
+        for name in node["subdirs"]:
+            if name in DEFAULT_IGNORED_DIRS:
+                continue
+            sub_files, sub_size, sub_partial = self._totals(os.path.join(directory, name), totals)
+            files += sub_files
+            size += sub_size
+            partial = partial or sub_partial
+        totals[directory] = (files, size, partial)
+        return totals[directory]
+    
+    def _describe(self, directory, totals):
+        files, size, partial = self._totals(directory, totals)
+        more = "+" if partial else ""
+        return f"{files}{more} files, {format_size(size)}{more}"
+    
+    def _render(self, max_depth):
+        totals = {}
+        lines = []
+        
+        def walk(directory, depth):
+            node = self.nodes.get(directory)
+            if node is None:
+                return
+            indent = "  " * depth
+            for name in node["subdirs"]:
+                path = os.path.join(directory, name)
+                if name in DEFAULT_IGNORED_DIRS or path not in self.nodes:
+                    lines.append(f"{indent}{name}/ (not expanded)")
+                    continue
+                lines.append(f"{indent}{name}/ ({self._describe(path, totals)})")
+                if depth < max_depth:
+                    walk(path, depth + 1)
+            names = node["names"]
+            if names:
+                shown = ", ".join(names[:SUMMARY_FILES_PER_DIR])
+                more = f", +{len(names) - SUMMARY_FILES_PER_DIR} more" if len(names) > SUMMARY_FILES_PER_DIR else ""
+                lines.append(f"{indent}{shown}{more}")
+        
+        lines.append(f"./ ({self._describe(self.root, totals)})")
+        walk(self.root, 1)
+        return "\n".join(lines)
+    
+    def summary(self, token_budget=SUMMARY_TOKEN_BUDGET):
+        """Deepest rendering of the tree that fits the token budget (about 4 characters per token)"""
+        with self.lock:
+            return self._summary(token_budget)
+    
+    def _summary(self, token_budget):
+        self.refresh()
+        if token_budget in self.rendered:
+            return self.rendered[token_budget]
+        
+        text = self._render(1)
+        for depth in range(2, SUMMARY_MAX_DEPTH + 1):
+            deeper = self._render(depth)
+            if len(deeper) // 4 > token_budget or deeper == text:
+                break
+            text = deeper
+        if len(text) // 4 > token_budget:
+            text = text[:token_budget * 4].rsplit("\n", 1)[0] + "\n... (truncated)"
+        
+        self.rendered[token_budget] = text
+        return text
+
+# workspace root -> WorkspaceSummary, least recently used first
+workspace_summaries = OrderedDict()
+workspace_summaries_lock = threading.Lock()
+
+def get_workspace_summary(session):
+    """The session's cached WorkspaceSummary"""
+    root = session["context"]["workspace_root"]
+    with workspace_summaries_lock:
+        summary = workspace_summaries.get(root)
+        if summary is None:
+            # Summaries of sessions that are gone are dropped before adding one
+            live = {s["context"]["workspace_root"] for s in list(sessions.values())}
+            for stale in [r for r in workspace_summaries if r not in live]:
+                del workspace_summaries[stale]
+            summary = workspace_summaries[root] = WorkspaceSummary(root)
+            while len(workspace_summaries) > MAX_WORKSPACE_SUMMARIES:
+                workspace_summaries.popitem(last=False)
+        workspace_summaries.move_to_end(root)
+    return summary
+
+def close_session(session_id):
+    """Forget a session and its cached state; its workspace files are kept"""
+    session = sessions.pop(session_id, None)
+    if session is None:
+        return False
+    with workspace_summaries_lock:
+        workspace_summaries.pop(session["context"]["workspace_root"], None)
+    return True
+
 # Tool definitions
 class Tools:
     @staticmethod
@@ -118,6 +338,7 @@ class Tools:
             
             with open(file_path, 'w', encoding='utf-8') as file:
                 file.write(content)
+            
             return {"success": True, "message": f"Successfully wrote to {file_path}", "file_path": file_path}
         except Exception as e:
             return {"success": False, "error": f"Error writing to file: {str(e)}"}
@@ -139,16 +360,17 @@ class Tools:
             if not os.path.exists(directory):
                 return {"success": False, "error": f"Directory does not exist: {directory}"}
             
-            items = os.listdir(directory)
+            # scandir reports the entry type without a stat call per item
             directories = []
             files = []
-            
-            for item in items:
-                item_path = os.path.join(directory, item)
-                if os.path.isdir(item_path):
-                    directories.append(item)
-                else:
-                    files.append(item)
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        directories.append(entry.name)
+                    else:
+                        files.append(entry.name)
+            directories.sort()
+            files.sort()
             
             return {
                 "success": True, 
@@ -224,7 +446,7 @@ Be precise and maintain the style and structure of the original code where possi
         except Exception as e:
             return {"success": False, "error": f"Error modifying code: {str(e)}"}
     
-    def chat(self, messages, tools_info=None):
+    def chat(self, messages, tools_info=None, allow_tools=True):
         """Process chat messages with or without tool context."""
         system_message = """You are a helpful Code Assistant that can analyze and modify code.
         You have access to the following tools to help users work with their code:
@@ -244,7 +466,7 @@ Be precise and maintain the style and structure of the original code where possi
         
         # Add tool context if available
         if tools_info:
-            system_message += f"\n\nCurrent workspace information:\n{json.dumps(tools_info, indent=2)}"
+            system_message += f"\n\nCurrent workspace information:\n{tools_info}"
         
         try:
             all_messages = [{"role": "system", "content": system_message}] + messages
@@ -353,13 +575,14 @@ Be precise and maintain the style and structure of the original code where possi
                         }
                     }
                 ],
-                tool_choice="auto"
+                tool_choice="auto" if allow_tools else "none"
             )
             
             return {
                 "success": True, 
                 "response": response.choices[0].message.content or "",
-                "tool_calls": response.choices[0].message.tool_calls if hasattr(response.choices[0].message, 'tool_calls') and response.choices[0].message.tool_calls else []
+                "tool_calls": response.choices[0].message.tool_calls if hasattr(response.choices[0].message, 'tool_calls') and response.choices[0].message.tool_calls else [],
+                "tokens": response.usage.total_tokens if getattr(response, "usage", None) else 0
             }
         except Exception as e:
             return {"success": False, "error": f"Error in chat: {str(e)}"}
@@ -374,6 +597,87 @@ except Exception as e:
     print(f"Failed to initialize Code Assistant: {e}")
     assistant = None
 
+# Agent loop budgets
+AGENT_MAX_STEPS = int(os.environ.get("AGENT_MAX_STEPS", 6))
+AGENT_MAX_TOKENS = int(os.environ.get("AGENT_MAX_TOKENS", 60000))
+AGENT_MAX_SECONDS = float(os.environ.get("AGENT_MAX_SECONDS", 120))
+
+def execute_tool(function_name, arguments, session):
+    """Run one tool call; returns (result, context updates)"""
+    workspace_root = session["context"].get("workspace_root")
+    updates = {}
+    
+    if function_name == "read_file":
+        result = Tools.read_file(arguments.get("file_path", ""), workspace_root)
+        # Update file content in context
+        if result["success"]:
+            updates["last_read_file"] = arguments["file_path"]
+            updates["last_file_content"] = result["content"]
+    
+    elif function_name == "write_file":
+        result = Tools.write_file(arguments.get("file_path", ""), arguments.get("content", ""), workspace_root)
+        if result["success"]:
+            updates["last_modified_file"] = arguments["file_path"]
+    
+    elif function_name == "list_directory":
+        result = Tools.list_directory(arguments.get("directory", "."), workspace_root)
+        if result["success"]:
+            updates["current_directory"] = result["current_path"]
+    
+    elif function_name == "analyze_code":
+        result = assistant.analyze_code(arguments.get("code", ""))
+        if result["success"]:
+            updates["last_analysis"] = result["analysis"]
+    
+    elif function_name == "modify_code":
+        result = assistant.modify_code(
+            arguments.get("code", ""), 
+            arguments.get("instructions", ""),
+            arguments.get("file_path")
+        )
+        if result["success"]:
+            updates["last_modified_code"] = result["result"]
+    
+    else:
+        result = {"success": False, "error": f"Unknown tool: {function_name}"}
+    
+    return result, updates
+
+async def execute_tool_calls(calls, session):
+    """Run one turn's tool calls concurrently, keeping calls on the same file in order.
+    
+    Returns (call, arguments, result, updates, milliseconds) in the original order.
+    """
+    parsed = []
+    for call in calls:
+        try:
+            arguments = json.loads(call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            arguments = {}
+            print(f"Error parsing tool arguments: {e}")
+        parsed.append((call, arguments))
+    
+    # Calls that touch the same file form one sequential group; the rest run in parallel
+    groups = {}
+    for index, (call, arguments) in enumerate(parsed):
+        key = arguments.get("file_path") or f"call-{index}"
+        groups.setdefault(key, []).append(index)
+    
+    outcomes = [None] * len(parsed)
+    
+    def run_group(indexes):
+        for index in indexes:
+            call, arguments = parsed[index]
+            started = time.perf_counter()
+            try:
+                result, updates = execute_tool(call.function.name, arguments, session)
+            except Exception as e:
+                result, updates = {"success": False, "error": f"Tool {call.function.name} failed: {str(e)}"}, {}
+            outcomes[index] = (call, arguments, result, updates, round((time.perf_counter() - started) * 1000, 1))
+    
+    await asyncio.gather(*(asyncio.to_thread(run_group, indexes) for indexes in groups.values()))
+    return outcomes
+
 # API Routes
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
@@ -387,101 +691,100 @@ async def chat_endpoint(request: ChatRequest):
         # Add user message to history
         session["messages"].append({"role": "user", "content": request.message})
         
-        # Get workspace info for context
-        workspace_info = Tools.list_directory(
-            session["context"].get("current_directory", WORKSPACE_ROOT),
-            session["context"].get("workspace_root")
-        )
+        def chat_step(allow_tools):
+            # Runs in a worker thread: the workspace summary stats every file it lists
+            return assistant.chat(session["messages"], workspace_info(), allow_tools)
         
-        # Process the message
-        chat_result = assistant.chat(session["messages"], workspace_info)
-        
-        if not chat_result["success"]:
-            raise HTTPException(status_code=500, detail=chat_result["error"])
+        def workspace_info():
+            # Compact workspace tree for context, rebuilt only when files change
+            workspace_root = session["context"].get("workspace_root")
+            current_directory = session["context"].get("current_directory", workspace_root)
+            return (
+                f"Current directory: {os.path.relpath(current_directory, workspace_root)}\n"
+                f"{get_workspace_summary(session).summary()}"
+            )
         
-        # Process any tool calls
+        started = time.perf_counter()
+        tokens_used = 0
         tool_calls_results = []
+        steps = []
+        stop_reason = None
+        response_content = ""
         
-        if chat_result.get("tool_calls"):
-            for call in chat_result["tool_calls"]:
-                function_name = call.function.name
-                try:
-                    arguments = json.loads(call.function.arguments)
-                except json.JSONDecodeError as e:
-                    arguments = {}
-                    print(f"Error parsing tool arguments: {e}")
-                
-                # Execute the appropriate tool
-                if function_name == "read_file":
-                    result = Tools.read_file(
-                        arguments.get("file_path", ""),
-                        session["context"].get("workspace_root")
-                    )
-                    # Update file content in context
-                    if result["success"]:
-                        session["context"]["last_read_file"] = arguments["file_path"]
-                        session["context"]["last_file_content"] = result["content"]
-                
-                elif function_name == "write_file":
-                    result = Tools.write_file(
-                        arguments.get("file_path", ""),
-                        arguments.get("content", ""),
-                        session["context"].get("workspace_root")
-                    )
-                    if result["success"]:
-                        session["context"]["last_modified_file"] = arguments["file_path"]
-                
-                elif function_name == "list_directory":
-                    directory = arguments.get("directory", ".")
-                    result = Tools.list_directory(
-                        directory,
-                        session["context"].get("workspace_root")
-                    )
-                    if result["success"]:
-                        session["context"]["current_directory"] = result["current_path"]
-                
-                elif function_name == "analyze_code":
-                    result = assistant.analyze_code(arguments.get("code", ""))
-                    if result["success"]:
-                        session["context"]["last_analysis"] = result["analysis"]
-                
-                elif function_name == "modify_code":
-                    result = assistant.modify_code(
-                        arguments.get("code", ""), 
-                        arguments.get("instructions", ""),
-                        arguments.get("file_path")
-                    )
-                    if result["success"]:
-                        session["context"]["last_modified_code"] = result["result"]
-                
-                else:
-                    result = {"success": False, "error": f"Unknown tool: {function_name}"}
+        # Call the model, run the tools it asks for, and repeat until it answers or a budget runs out
+        for step in range(1, AGENT_MAX_STEPS + 2):
+            remaining = AGENT_MAX_SECONDS - (time.perf_counter() - started)
+            if remaining <= 0:
+                stop_reason = "time_budget"
+                break
+            if tokens_used >= AGENT_MAX_TOKENS:
+                stop_reason = "token_budget"
+                break
+            
+            # The last permitted step must answer instead of calling more tools
+            allow_tools = step <= AGENT_MAX_STEPS
+            llm_started = time.perf_counter()
+            try:
+                chat_result = await asyncio.wait_for(
+                    asyncio.to_thread(chat_step, allow_tools),
+                    timeout=remaining
+                )
+            except asyncio.TimeoutError:
+                stop_reason = "time_budget"
+                break
+            llm_ms = round((time.perf_counter() - llm_started) * 1000, 1)
+            
+            if not chat_result["success"]:
+                raise HTTPException(status_code=500, detail=chat_result["error"])
+            tokens_used += chat_result.get("tokens", 0)
+            response_content = chat_result["response"]
+            step_info = {"step": step, "llm_ms": llm_ms, "tokens": chat_result.get("tokens", 0), "tools": []}
+            steps.append(step_info)
+            
+            calls = chat_result.get("tool_calls") or []
+            if not calls or not allow_tools:
+                # Tool calls on the final step are ignored; the budget is spent
+                stop_reason = "completed" if allow_tools else "step_budget"
+                break
+            
+            # The assistant turn that requested the tools must precede their results
+            session["messages"].append({
+                "role": "assistant",
+                "content": response_content,
+                "tool_calls": [
+                    {"id": call.id, "type": "function",
+                     "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                    for call in calls
+                ]
+            })
+            
+            tools_started = time.perf_counter()
+            outcomes = await execute_tool_calls(calls, session)
+            step_info["tools_ms"] = round((time.perf_counter() - tools_started) * 1000, 1)
+            
+            for call, arguments, result, updates, tool_ms in outcomes:
+                session["context"].update(updates)
+                step_info["tools"].append({"tool": call.function.name, "ms": tool_ms, "success": result.get("success", False)})
                 
                 # Add result to the list
                 tool_calls_results.append({
-                    "tool": function_name,
+                    "tool": call.function.name,
                     "arguments": arguments,
-                    "result": result
+                    "result": result,
+                    "step": step
                 })
                 
                 # Add tool response to the conversation
-                tool_message = {
+                session["messages"].append({
                     "role": "tool",
                     "tool_call_id": call.id,
-                    "name": function_name,
+                    "name": call.function.name,
                     "content": json.dumps(result)
-                }
-                session["messages"].append(tool_message)
-        
-        # Get final response with tool results incorporated
-        if tool_calls_results:
-            # Get a final response that takes into account the tool results
-            final_result = assistant.chat(session["messages"], workspace_info)
-            if not final_result["success"]:
-                raise HTTPException(status_code=500, detail=final_result["error"])
-            response_content = final_result["response"]
-        else:
-            response_content = chat_result["response"]
+                })
+        
+        stop_reason = stop_reason or "step_budget"
+        if stop_reason != "completed" and not response_content:
+            response_content = f"Stopped after {len(steps)} steps ({stop_reason.replace('_', ' ')} reached) before finishing."
         
         # Add assistant response to history
         session["messages"].append({"role": "assistant", "content": response_content})
@@ -491,9 +794,13 @@ async def chat_endpoint(request: ChatRequest):
             response=response_content,
             tool_calls=tool_calls_results,
             session_id=session_id,
-            context=session["context"]
+            context=session["context"],
+            steps=steps,
+            stop_reason=stop_reason
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -550,10 +857,9 @@ async def upload_file(
         # Ensure directory exists
         os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
         
-        # Save the file
-        contents = await file.read()
-        with open(destination, "wb") as f:
-            f.write(contents)
+        # Stream the file to disk without buffering it in memory
+        size, digest = await save_upload_file(file, destination)
+        blob_store.submit(destination, digest)
         
         # Update session context
         relative_path = os.path.relpath(destination, session_workspace)
@@ -563,24 +869,96 @@ async def upload_file(
             success=True,
             message=f"File uploaded successfully",
             file_path=destination,
-            size=len(contents),
+            size=size,
             session_id=session_id
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-@app.post("/upload/files/{session_id}", response_model=List[UploadResponse])
-async def upload_multiple_files(
+@app.post("/upload/chunked/{session_id}")
+async def create_chunked_upload(
     session_id: str,
-    files: List[UploadFile] = File(...),
-    directory: Optional[str] = Form(None)
+    path: str = Form(...),
+    size: Optional[int] = Form(None),
+    sha256: Optional[str] = Form(None)
 ):
+    """Start a resumable upload; chunks are then PUT at explicit offsets."""
+    session_id, session = get_or_create_session(session_id)
+    session_workspace = session["context"].get("workspace_root")
+    
+    destination = os.path.abspath(os.path.join(session_workspace, path))
+    if not destination.startswith(session_workspace + os.sep):
+        raise HTTPException(status_code=403, detail="Cannot upload outside of workspace")
+    
+    try:
+        upload = upload_store.create(destination, size, sha256, owner=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    
+    return {"upload_id": upload.upload_id, "chunk_size": upload_store.chunk_size, **upload.status()}
+
+@app.put("/upload/chunked/{session_id}/{upload_id}")
+async def upload_chunk(session_id: str, upload_id: str, request: Request, offset: int = 0):
+    """Write the raw request body at offset."""
+    try:
+        return await upload_store.write_stream(upload_id, offset, request.stream(), owner=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+
+@app.get("/upload/chunked/{session_id}/{upload_id}")
+async def chunked_upload_status(session_id: str, upload_id: str):
+    """Report received and missing ranges so a client can resume."""
+    try:
+        return upload_store.get(upload_id, owner=session_id).status()
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+
+@app.post("/upload/chunked/{session_id}/{upload_id}/complete", response_model=UploadResponse)
+async def complete_chunked_upload(session_id: str, upload_id: str):
+    """Verify the upload and move it into the workspace."""
+    session_id, session = get_or_create_session(session_id)
+    session_workspace = session["context"].get("workspace_root")
+    
+    try:
+        result = await asyncio.to_thread(upload_store.complete, upload_id, session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    
+    blob_store.submit(result["destination"], result["sha256"])
+    session["context"]["last_uploaded_file"] = os.path.relpath(result["destination"], session_workspace)
+    
+    return UploadResponse(
+        success=True,
+        message=f"File uploaded successfully (sha256 {result['sha256']})",
+        file_path=result["destination"],
+        size=result["size"],
+        session_id=session_id
+    )
+
+@app.delete("/upload/chunked/{session_id}/{upload_id}")
+async def abort_chunked_upload(session_id: str, upload_id: str):
+    """Abandon an upload and delete its staged data."""
+    try:
+        upload_store.abort(upload_id, owner=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return {"success": True}
+
+@app.post("/upload/files/{session_id}", response_model=List[UploadResponse])
+async def upload_multiple_files(session_id: str, request: Request):
     """Upload multiple files, maintaining folder structure."""
     # Get or create the session
     session_id, session = get_or_create_session(session_id)
     session_workspace = session["context"].get("workspace_root")
     
+    # Parsed here rather than via File(...) to lift Starlette's 1000-part default
+    form = await request.form(max_files=MAX_UPLOAD_FILES, max_fields=MAX_UPLOAD_FILES)
+    files = [f for f in form.getlist("files") if hasattr(f, "filename")]
+    directory = form.get("directory")
+    if not files:
+        raise HTTPException(status_code=422, detail="No files were uploaded")
+    
     # Determine target directory
     if directory:
         target_dir = os.path.join(session_workspace, directory)
@@ -589,36 +967,50 @@ async def upload_multiple_files(
     
     # Create target directory if it doesn't exist
     os.makedirs(target_dir, exist_ok=True)
+    target_root = os.path.abspath(target_dir)
     
-    results = []
+    # Resolve every destination first so directories can be created in one pass
+    destinations = []
     for file in files:
-        try:
-            # Extract path info from filename if it contains path separators
-            filepath = file.filename.replace('\\', '/')
-            
-            # Determine destination path
-            destination = os.path.join(target_dir, filepath)
-            
-            # Ensure parent directory exists
-            os.makedirs(os.path.dirname(destination), exist_ok=True)
-            
-            # Save the file
-            contents = await file.read()
-            with open(destination, "wb") as f:
-                f.write(contents)
-            
+        # Extract path info from filename if it contains path separators
+        filepath = file.filename.replace('\\', '/')
+        destination = os.path.abspath(os.path.join(target_dir, filepath))
+        if not destination.startswith(target_root + os.sep):
+            destination = None
+        destinations.append(destination)
+    
+    for directory in sorted({os.path.dirname(d) for d in destinations if d}):
+        os.makedirs(directory, exist_ok=True)
+    
+    def write_one(file, destination):
+        # The multipart parser already spooled the part; copy it without loading it whole
+        size, digest = save_stream(file.file, destination, make_dirs=False)
+        blob_store.submit(destination, digest)
+        return size
+    
+    loop = asyncio.get_running_loop()
+    writes = [
+        loop.run_in_executor(upload_write_pool, write_one, file, destination) if destination else None
+        for file, destination in zip(files, destinations)
+    ]
+    outcomes = await asyncio.gather(*(w for w in writes if w), return_exceptions=True)
+    outcomes = iter(outcomes)
+    
+    results = []
+    for file, destination, write in zip(files, destinations, writes):
+        outcome = next(outcomes) if write else ValueError("path is outside of the workspace")
+        if isinstance(outcome, BaseException):
             results.append(UploadResponse(
-                success=True,
-                message=f"File uploaded successfully",
-                file_path=destination,
-                size=len(contents),
+                success=False,
+                message=f"Failed to upload {file.filename}: {str(outcome)}",
                 session_id=session_id
             ))
-        
-        except Exception as e:
+        else:
             results.append(UploadResponse(
-                success=False,
-                message=f"Failed to upload {file.filename}: {str(e)}",
+                success=True,
+                message=f"File uploaded successfully",
+                file_path=destination,
+                size=outcome,
                 session_id=session_id
             ))
     
@@ -627,6 +1019,38 @@ async def upload_multiple_files(
     
     return results
 
+@app.post("/upload/archive/{session_id}")
+async def upload_archive(
+    session_id: str,
+    request: Request,
+    directory: Optional[str] = None,
+    filename: Optional[str] = None
+):
+    """Extract a zip/tar/tar.gz/tar.zst request body into the workspace as it streams in."""
+    session_id, session = get_or_create_session(session_id)
+    session_workspace = session["context"].get("workspace_root")
+    
+    target_dir = os.path.abspath(os.path.join(session_workspace, directory or ""))
+    if target_dir != session_workspace and not target_dir.startswith(session_workspace + os.sep):
+        raise HTTPException(status_code=403, detail="Cannot extract outside of workspace")
+    os.makedirs(target_dir, exist_ok=True)
+    
+    extracted = []
+    
+    def on_file(path, size, digest):
+        blob_store.submit(path, digest)
+        extracted.append(os.path.relpath(path, session_workspace))
+    
+    try:
+        result = await extract_request_stream(request.stream(), target_dir, filename, on_file, UPLOAD_STAGING_DIR)
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Update session context with the extracted files
+    session["context"]["uploaded_files"] = extracted
+    
+    return {"success": True, "directory": target_dir, **result}
+
 @app.post("/create/folder/{session_id}")
 async def create_folder(
     session_id: str,
@@ -702,6 +1126,13 @@ async def get_session_info(session_id: str):
         "message_count": len(sessions[session_id]["messages"])
     }
 
+@app.delete("/sessions/{session_id}")
+async def close_session_endpoint(session_id: str):
+    """Close a session, dropping its history and cached workspace summary."""
+    if not close_session(session_id):
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+    return {"success": True, "session_id": session_id}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -0,0 +1,60 @@
+"""Regression tests for unified diff parsing and line edits in patch_apply."""
+import pytest
+
+from patch_apply import PatchError, apply_hunks, apply_line_edits, parse_unified_diff
+
+ORIGINAL = "alpha\n-- old\nomega\n"
+
+def apply(diff, text):
+    (file_patch,) = parse_unified_diff(diff)
+    return "".join(apply_hunks(text.splitlines(keepends=True), file_patch["hunks"]))
+
+def test_trailing_blank_line_after_hunk_is_not_context():
+    diff = (
+        "--- a/notes.txt\n"
+        "+++ b/notes.txt\n"
+        "@@ -1,3 +1,3 @@\n"
+        " alpha\n"
+        "-beta\n"
+        "+BETA\n"
+        " gamma\n"
+        "\n"
+    )
+    assert apply(diff, "alpha\nbeta\ngamma\n") == "alpha\nBETA\ngamma\n"
+
+def test_removed_and_added_lines_that_look_like_file_headers():
+    diff = (
+        "--- a/notes.txt\n"
+        "+++ b/notes.txt\n"
+        "@@ -1,3 +1,3 @@\n"
+        " alpha\n"
+        "--- old\n"
+        "+++ new\n"
+        " omega\n"
+    )
+    files = parse_unified_diff(diff)
+    assert len(files) == 1
+    assert files[0]["hunks"][0]["lines"] == [(" ", "alpha\n"), ("-", "-- old\n"), ("+", "++ new\n"), (" ", "omega\n")]
+    assert apply(diff, ORIGINAL) == "alpha\n++ new\nomega\n"
+
+def test_no_newline_marker_after_last_line():
+    diff = (
+        "--- a/notes.txt\n"
+        "+++ b/notes.txt\n"
+        "@@ -1,2 +1,2 @@\n"
+        " alpha\n"
+        "-beta\n"
+        "\\ No newline at end of file\n"
+        "+BETA\n"
+        "\\ No newline at end of file\n"
+    )
+    assert apply(diff, "alpha\nbeta") == "alpha\nBETA"
+
+def test_truncated_hunk_is_rejected():
+    diff = "--- a/notes.txt\n+++ b/notes.txt\n@@ -1,3 +1,3 @@\n alpha\n-beta\n"
+    with pytest.raises(PatchError):
+        parse_unified_diff(diff)
+
+def test_replacing_last_line_keeps_final_newline():
+    lines = apply_line_edits(["a\n", "b\n", "c\n"], [{"start_line": 3, "end_line": 3, "content": "C"}])
+    assert "".join(lines) == "a\nb\nC\n"
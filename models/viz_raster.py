@@ -0,0 +1,224 @@
+"""Vectorized NumPy rasterizer for dashboard visualizations.
+
+A whole batch of images is drawn at once. The background gradients are
+broadcast from per-image tints. Every line segment of every image is
+rasterized together with exact per-pixel coverage (anti-aliased,
+Wu-style) and composited only where it covers pixels. Node glows are
+Gaussian stamps added with one unbuffered add per channel. The line glow
+is a separable box blur built from cumulative sums. Background and glow
+are computed at half resolution and scaled up once. Only the title text
+goes through PIL, once per distinct name and size.
+"""
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+NODE_COUNT = 8
+LINE_COUNT = 15
+BACKGROUND = np.array([17, 17, 17], dtype=np.float32) / 255
+# Fractions of the canvas the nodes are scattered over, as in the original layout
+NODE_AREA = (100 / 1200, 1100 / 1200, 300 / 600, 500 / 600)
+TITLE_CENTER = (0.5, 1 / 3)
+GLOW_DOWNSAMPLE = 2
+
+def layout(seeds):
+    """Node positions (N, K, 2) in unit coordinates plus line endpoints and colors"""
+    count = len(seeds)
+    nodes = np.empty((count, NODE_COUNT, 2), dtype=np.float32)
+    node_colors = np.empty((count, NODE_COUNT, 3), dtype=np.float32)
+    lines = np.empty((count, LINE_COUNT, 2), dtype=np.int64)
+    line_colors = np.empty((count, LINE_COUNT, 3), dtype=np.float32)
+    tints = np.empty((count, 3), dtype=np.float32)
+    x0, x1, y0, y1 = NODE_AREA
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        nodes[i, :, 0] = rng.uniform(x0, x1, NODE_COUNT)
+        nodes[i, :, 1] = rng.uniform(y0, y1, NODE_COUNT)
+        node_colors[i] = rng.integers(100, 256, (NODE_COUNT, 3)) / 255
+        # Each line joins two distinct nodes
+        start = rng.integers(0, NODE_COUNT, LINE_COUNT)
+        lines[i, :, 0] = start
+        lines[i, :, 1] = (start + rng.integers(1, NODE_COUNT, LINE_COUNT)) % NODE_COUNT
+        line_colors[i] = rng.integers(50, 151, (LINE_COUNT, 3)) / 255
+        tints[i] = rng.uniform(0.05, 0.25, 3)
+    return nodes, node_colors, lines, line_colors, tints
+
+def background(tints, height, width):
+    """Vertical gradient plus a tinted radial glow behind the title, as (N, 3, H, W)"""
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    vertical = 1 - 0.5 * y
+    aspect = np.float32(width / height)
+    radius = np.sqrt(((x - np.float32(TITLE_CENTER[0])) * aspect) ** 2 + (y - np.float32(TITLE_CENTER[1])) ** 2)
+    radial = np.exp(-(radius / np.float32(0.6)) ** 2)
+    return (BACKGROUND[None, :, None, None] * vertical[None, None]
+            + tints[:, :, None, None] * radial[None, None])
+
+def accumulate(layer, image_index, px, py, weights, colors):
+    """Add weighted colors into a (N, 3, H, W) layer; out-of-canvas samples are dropped"""
+    count, _, height, width = layer.shape
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height) & (weights > 0)
+    image_index, px, py, weights, colors = image_index[inside], px[inside], py[inside], weights[inside], colors[inside]
+    plane = height * width
+    pixel = py * width + px
+    flat = layer.reshape(-1)
+    for channel in range(3):
+        np.add.at(flat, (image_index * 3 + channel) * plane + pixel, weights * colors[:, channel])
+
+def composite_lines(canvas, image_index, px, py, weights, colors):
+    """Alpha-composite anti-aliased line samples over canvas, touching only covered pixels.
+
+    Overlapping lines are averaged by color and their coverage summed, so
+    crossings stay as bright as either line instead of adding up.
+    """
+    count, _, height, width = canvas.shape
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height) & (weights > 0)
+    image_index, px, py, weights, colors = image_index[inside], px[inside], py[inside], weights[inside], colors[inside]
+    plane = height * width
+    key = image_index * plane + py * width + px
+    touched, slot = np.unique(key, return_inverse=True)
+    coverage = np.bincount(slot, weights, minlength=len(touched))
+    alpha = np.minimum(coverage, 1)
+    # color_sum / coverage is the line color, so color_sum * (alpha / coverage) is its premultiplied form
+    premultiply = alpha / np.maximum(coverage, 1e-6)
+    image, pixel = np.divmod(touched, plane)
+    flat = canvas.reshape(-1)
+    for channel in range(3):
+        color = np.bincount(slot, weights * colors[:, channel], minlength=len(touched))
+        index = (image * 3 + channel) * plane + pixel
+        flat[index] = flat[index] * (1 - alpha) + color * premultiply
+
+def line_coverage(starts, ends, line_width):
+    """Anti-aliased coverage of thick segments, one sample per pixel along the major axis.
+
+    Like Wu's algorithm, each step along the major axis covers a short run of
+    pixels across the minor axis; each pixel's weight is its exact overlap
+    with the line's cross-section. Returns (segment index, px, py, weight).
+    """
+    direction = ends - starts
+    steep = np.abs(direction[:, 1]) > np.abs(direction[:, 0])
+    # Work in (major, minor) coordinates so every segment is "shallow"
+    major0 = np.where(steep, starts[:, 1], starts[:, 0])
+    minor0 = np.where(steep, starts[:, 0], starts[:, 1])
+    major_delta = np.where(steep, direction[:, 1], direction[:, 0])
+    minor_delta = np.where(steep, direction[:, 0], direction[:, 1])
+    length = np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-6)
+    slope = minor_delta / np.where(major_delta == 0, 1, major_delta)
+    # Half-thickness measured along the minor axis grows as the line tilts
+    half = line_width / 2 * length / np.maximum(np.abs(major_delta), 1e-6)
+
+    first = np.floor(np.minimum(major0, major0 + major_delta)).astype(np.int64)
+    steps = np.floor(np.abs(major_delta)).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(starts)), steps)
+    major = np.repeat(first, steps) + (np.arange(int(steps.sum())) - np.repeat(np.cumsum(steps) - steps, steps))
+    center = minor0[segment] + slope[segment] * (major + 0.5 - major0[segment])
+    low = center - half[segment]
+    high = center + half[segment]
+
+    span = int(np.ceil(2 * half.max())) + 1
+    minor = np.floor(low).astype(np.int64)[:, None] + np.arange(span)[None, :]
+    weight = np.clip(np.minimum(minor + 1, high[:, None]) - np.maximum(minor, low[:, None]), 0, 1)
+    major = np.broadcast_to(major[:, None], minor.shape)
+    steep_sample = steep[segment][:, None]
+    px = np.where(steep_sample, minor, major).ravel()
+    py = np.where(steep_sample, major, minor).ravel()
+    return np.repeat(segment, span), px, py, weight.ravel().astype(np.float32)
+
+def box_blur(layer, radius, axis):
+    """Mean over a (2 * radius + 1) window along axis, using cumulative sums"""
+    if radius < 1:
+        return layer
+    pad = [(0, 0)] * layer.ndim
+    pad[axis] = (radius + 1, radius)
+    summed = np.cumsum(np.pad(layer, pad), axis=axis, dtype=np.float32)
+    window = 2 * radius + 1
+    upper = [slice(None)] * layer.ndim
+    lower = [slice(None)] * layer.ndim
+    upper[axis] = slice(window, None)
+    lower[axis] = slice(None, -window)
+    return (summed[tuple(upper)] - summed[tuple(lower)]) / np.float32(window)
+
+def upsample(layer, factor, height, width):
+    """Nearest-neighbour upscale of a (N, C, h, w) layer, cropped to height x width"""
+    if factor == 1:
+        return layer
+    return np.ascontiguousarray(layer.repeat(factor, axis=2)[:, :, :height].repeat(factor, axis=3)[:, :, :, :width])
+
+@lru_cache(maxsize=64)
+def kernel_offsets(radius):
+    offsets = np.arange(-radius, radius + 1, dtype=np.int64)
+    grid_y, grid_x = np.meshgrid(offsets, offsets, indexing="ij")
+    return grid_x.ravel(), grid_y.ravel()
+
+@lru_cache(maxsize=512)
+def title_mask(text, font, height, width):
+    """Alpha mask of the title centered on the canvas, cropped to its bounding box.
+
+    Returns (top, left, mask) or None for an empty title; cached per text and font.
+    """
+    mask = Image.new("L", (width, height), 0)
+    ImageDraw.Draw(mask).text((width * TITLE_CENTER[0], height * TITLE_CENTER[1]), text, fill=255, font=font, anchor="mm")
+    box = mask.getbbox()
+    if box is None:
+        return None
+    left, top, right, bottom = box
+    return top, left, np.asarray(mask.crop(box), dtype=np.float32) / 255
+
+def render_batch(specs, width=1200, height=600, title_font=None):
+    """Render one visualization per spec ({"project_name", "seed"}) as a uint8 (N, H, W, 3) array"""
+    count = len(specs)
+    if not count:
+        return np.zeros((0, height, width, 3), dtype=np.uint8)
+    scale = min(width / 1200, height / 600)
+    nodes, node_colors, lines, line_colors, tints = layout([spec["seed"] for spec in specs])
+    points = nodes * np.array([width, height], dtype=np.float32)
+
+    # Every line of every image in one pass
+    batch_index = np.repeat(np.arange(count), LINE_COUNT)
+    starts = points[batch_index, lines[..., 0].ravel()]
+    ends = points[batch_index, lines[..., 1].ravel()]
+    segment, px, py, weight = line_coverage(starts, ends, max(2 * scale, 1.0))
+    image_index = batch_index[segment]
+    segment_colors = line_colors.reshape(-1, 3)[segment]
+
+    # The background and the soft light around the lines have no fine detail,
+    # so both are built at reduced resolution and scaled up once
+    factor = GLOW_DOWNSAMPLE
+    low_height, low_width = -(-height // factor), -(-width // factor)
+    glow_source = np.zeros((count, 3, low_height, low_width), dtype=np.float32)
+    accumulate(glow_source, image_index, px // factor, py // factor, np.minimum(weight, 1) / factor ** 2, segment_colors)
+    radius = max(int(round(6 * scale)) // factor, 1)
+    low = background(tints, low_height, low_width)
+    low += np.float32(0.8) * box_blur(box_blur(glow_source, radius, 3), radius, 2)
+    canvas = upsample(low, factor, height, width)
+
+    composite_lines(canvas, image_index, px, py, weight, segment_colors)
+
+    # Glowing nodes in place of the tech glyphs, added as light
+    radius = max(int(round(18 * scale)), 2)
+    kx, ky = kernel_offsets(radius)
+    flat_points = points.reshape(-1, 2)
+    px = np.floor(flat_points[:, 0]).astype(np.int64)[:, None] + kx[None, :]
+    py = np.floor(flat_points[:, 1]).astype(np.int64)[:, None] + ky[None, :]
+    distance = (px + 0.5 - flat_points[:, :1]) ** 2 + (py + 0.5 - flat_points[:, 1:]) ** 2
+    weight = np.exp(-distance / np.float32(2 * (radius / 2.5) ** 2)).astype(np.float32)
+    accumulate(canvas, np.repeat(np.arange(count), NODE_COUNT * len(kx)), px.ravel(), py.ravel(),
+               weight.ravel(), np.repeat(node_colors.reshape(-1, 3), len(kx), axis=0))
+
+    # Project name with a top-to-bottom white-to-grey gradient
+    if title_font is not None:
+        shade = np.linspace(1.0, 0.55, height, dtype=np.float32)
+        for i, spec in enumerate(specs):
+            title = title_mask(spec["project_name"], title_font, height, width)
+            if title is None:
+                continue
+            top, left, mask = title
+            region = canvas[i, :, top:top + mask.shape[0], left:left + mask.shape[1]]
+            region *= 1 - mask
+            region += shade[top:top + mask.shape[0], None] * mask
+
+    np.clip(canvas, 0, 1, out=canvas)
+    canvas *= 255
+    canvas += 0.5
+    return np.ascontiguousarray(canvas.astype(np.uint8).transpose(0, 2, 3, 1))
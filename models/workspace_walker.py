@@ -0,0 +1,264 @@
+"""Ignore-aware, parallel file walker for session workspaces.
+
+Used by indexing and file search so neither descends into VCS metadata,
+dependency folders, build output or generated bundles. Honors .gitignore
+and .ignore files at every level, and fans directory scans out across a
+thread pool while yielding results as they arrive. filter_paths applies the
+same rules to an explicit list of files.
+"""
+import os
+import re
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+
+# Directories that are never worth walking into
+DEFAULT_IGNORED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "venv", ".venv", "env",
+    "__pycache__", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox",
+    "dist", "build", ".next", ".nuxt", ".cache", ".parcel-cache", "target", "coverage",
+    ".gradle", ".idea", ".terraform", "site-packages", ".eggs",
+}
+
+IGNORE_FILES = (".gitignore", ".ignore")
+
+# File names that are generated no matter what they contain
+GENERATED_NAME_PATTERNS = (
+    "*.min.js", "*.min.css", "*.map", "*.bundle.js", "*.chunk.js",
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Cargo.lock",
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.generated.*",
+)
+GENERATED_MARKERS = (b"@generated", b"DO NOT EDIT", b"auto-generated", b"autogenerated")
+# Content sniffing is limited to types that are commonly minified or generated
+SNIFFED_EXTENSIONS = {".js", ".mjs", ".cjs", ".css", ".json", ".html", ".svg", ".py", ".go", ".ts"}
+
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 8
+
+@dataclass
+class WalkEntry:
+    path: str
+    rel_path: str
+    stat: os.stat_result
+
+def _compile_ignore_pattern(pattern):
+    """Translate one gitignore pattern into (regex, negated, dir_only)"""
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    if pattern.startswith("\\"):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # A slash anywhere but the end anchors the pattern to the ignore file's directory
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                regex += "[" + pattern[i + 1:end].replace("\\", "\\\\") + "]"
+                i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(f"^{prefix}{regex}$"), negated, dir_only
+
+class IgnoreRules:
+    """Patterns from one ignore file, matched against paths relative to its directory"""
+
+    def __init__(self, base_rel, patterns):
+        self.base_rel = base_rel
+        self.rules = [_compile_ignore_pattern(p) for p in patterns]
+
+    @classmethod
+    def load(cls, directory, base_rel):
+        patterns = []
+        for name in IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8", errors="ignore") as f:
+                    for line in f:
+                        line = line.rstrip("\n").rstrip()
+                        if line and not line.startswith("#"):
+                            patterns.append(line)
+            except OSError:
+                continue
+        return cls(base_rel, patterns) if patterns else None
+
+    def match(self, rel_path, is_dir):
+        """Return True/False if a rule decides the path, None if none applies"""
+        if self.base_rel:
+            if not rel_path.startswith(self.base_rel + "/"):
+                return None
+            rel_path = rel_path[len(self.base_rel) + 1:]
+        decision = None
+        for regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                decision = not negated
+        return decision
+
+def is_ignored(rel_path, is_dir, rule_chain):
+    """Apply ignore files from the root down; the deepest matching rule wins"""
+    ignored = False
+    for rules in rule_chain:
+        decision = rules.match(rel_path, is_dir)
+        if decision is not None:
+            ignored = decision
+    return ignored
+
+def is_generated_file(path, name=None):
+    """Detect lockfiles, bundles, minified assets and files marked as generated"""
+    name = name or os.path.basename(path)
+    if any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_NAME_PATTERNS):
+        return True
+    if os.path.splitext(name)[1].lower() not in SNIFFED_EXTENSIONS:
+        return False
+    try:
+        with open(path, "rb") as f:
+            head = f.read(4096)
+    except OSError:
+        return False
+    if any(marker in head[:1024] for marker in GENERATED_MARKERS):
+        return True
+    # Minified code has very long lines
+    lines = head.split(b"\n")
+    if len(head) >= 1024 and (max(len(line) for line in lines) > 1000 or len(head) / len(lines) > 300):
+        return True
+    return False
+
+def _accept_file(path, name, stats, max_file_size, skip_generated, file_filter):
+    if max_file_size is not None and stats.st_size > max_file_size:
+        return False
+    if skip_generated and is_generated_file(path, name):
+        return False
+    if file_filter and not file_filter(path, stats):
+        return False
+    return True
+
+def filter_paths(root, paths, max_file_size=DEFAULT_MAX_FILE_SIZE, skip_generated=True, file_filter=None,
+                 ignored_dirs=DEFAULT_IGNORED_DIRS, include_hidden=True):
+    """Yield a WalkEntry for each of paths that walk_workspace(root) would have yielded.
+
+    Paths outside root, missing files and files in ignored directories are
+    dropped. Ignore files are read once per directory.
+    """
+    root = os.path.abspath(root)
+    chains = {}
+
+    def rule_chain(rel_dir):
+        if rel_dir not in chains:
+            chain = rule_chain(rel_dir.rpartition("/")[0]) if rel_dir else ()
+            local_rules = IgnoreRules.load(os.path.join(root, rel_dir), rel_dir)
+            chains[rel_dir] = chain + (local_rules,) if local_rules else chain
+        return chains[rel_dir]
+
+    for path in paths:
+        path = os.path.abspath(path)
+        if not path.startswith(root + os.sep):
+            continue
+        rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+        parts = rel_path.split("/")
+        name = parts[-1]
+        if not include_hidden and any(part.startswith(".") for part in parts):
+            continue
+        if name in IGNORE_FILES or any(part in ignored_dirs for part in parts[:-1]):
+            continue
+        # A directory excluded by an ignore file excludes everything below it
+        rel_dir = ""
+        excluded = False
+        for part in parts[:-1]:
+            chain = rule_chain(rel_dir)
+            rel_dir = f"{rel_dir}/{part}" if rel_dir else part
+            if is_ignored(rel_dir, True, chain):
+                excluded = True
+                break
+        if excluded or is_ignored(rel_path, False, rule_chain(rel_dir)):
+            continue
+        try:
+            if not os.path.isfile(path):
+                continue
+            stats = os.stat(path)
+            if not _accept_file(path, name, stats, max_file_size, skip_generated, file_filter):
+                continue
+        except OSError:
+            continue
+        yield WalkEntry(path, rel_path, stats)
+
+def walk_workspace(root, max_file_size=DEFAULT_MAX_FILE_SIZE, skip_generated=True, file_filter=None,
+                   ignored_dirs=DEFAULT_IGNORED_DIRS, include_hidden=True, workers=DEFAULT_WORKERS):
+    """Yield a WalkEntry for every file under root that survives the ignore rules.
+
+    Directory scans run concurrently; files are yielded as each directory
+    finishes, so ordering is not deterministic. file_filter(path, stat) runs
+    in the worker threads and can reject files cheaply before they are yielded.
+    """
+    root = os.path.abspath(root)
+
+    def scan(directory, rel_dir, rule_chain):
+        local_rules = IgnoreRules.load(directory, rel_dir)
+        if local_rules:
+            rule_chain = rule_chain + (local_rules,)
+
+        files, subdirs = [], []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return files, subdirs
+
+        for entry in entries:
+            name = entry.name
+            if not include_hidden and name.startswith("."):
+                continue
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if name in ignored_dirs or is_ignored(rel_path, True, rule_chain):
+                        continue
+                    subdirs.append((entry.path, rel_path, rule_chain))
+                elif entry.is_file():
+                    if name in IGNORE_FILES or is_ignored(rel_path, False, rule_chain):
+                        continue
+                    stats = entry.stat()
+                    if not _accept_file(entry.path, name, stats, max_file_size, skip_generated, file_filter):
+                        continue
+                    files.append(WalkEntry(entry.path, rel_path, stats))
+            except OSError:
+                continue
+        return files, subdirs
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(scan, root, "", ())}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    for directory, rel_dir, rule_chain in subdirs:
+                        pending.add(pool.submit(scan, directory, rel_dir, rule_chain))
+                    yield from files
+        finally:
+            # The consumer may stop early; don't start scans nobody will read
+            for future in pending:
+                future.cancel()